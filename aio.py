@@ -0,0 +1,113 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from analyse import get_longest_run_streak_all_habits
+from db import (get_pool, add_habit, add_completion_dates, get_completion_dates, edit_habit, delete_habit,
+                get_streak_cache, get_cached_longest_run_streak)
+from habit import get_current_habits
+
+
+class AsyncHabitStore:
+    """
+    Asyncio facade over the habit store.
+
+    The blocking sqlite calls run on a dedicated thread pool, each worker thread with its
+    own connection from a ConnectionPool, so the event loop never waits for the database.
+
+    Concurrent identical reads are coalesced: while a read is running, every other caller
+    asking for the same thing awaits the same result instead of issuing another query. A
+    read started after a write has finished never joins a read started before it.
+    """
+
+    def __init__(self, path="main.db", max_workers=4, **pragmas):
+        """
+        :param path: path of the database file, migrated when the store is created.
+        :param max_workers: number of threads (and connections) running the queries.
+        :param pragmas: pragmas overriding pool.DEFAULT_PRAGMAS.
+        """
+        self.pool = get_pool(path, **pragmas)
+        self._executor = ThreadPoolExecutor(max_workers, thread_name_prefix="habit-db")
+        self._reads = {}
+        # Number of reads sent to the database and reads answered by one already running
+        self.queries = 0
+        self.coalesced = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def close(self):
+        """Wait for the running calls, then stop the worker threads and close their connections."""
+        await asyncio.get_running_loop().run_in_executor(None, self._executor.shutdown)
+        self.pool.close()
+
+    def _run(self, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._executor, partial(func, self.pool, *args, **kwargs))
+
+    async def _read(self, func, *args):
+        key = (func, args)
+        future = self._reads.get(key)
+        if future is None:
+            future = self._reads[key] = self._run(func, *args)
+            future.add_done_callback(lambda done: self._reads.pop(key) if self._reads.get(key) is done else None)
+            self.queries += 1
+        else:
+            self.coalesced += 1
+        # A cancelled caller must not cancel the query the other callers are waiting for
+        return await asyncio.shield(future)
+
+    async def _write(self, func, *args, **kwargs):
+        try:
+            return await self._run(func, *args, **kwargs)
+        finally:
+            # Reads issued from now on have to see the write
+            self._reads.clear()
+
+    async def add_habit(self, habit_data):
+        """See db.add_habit."""
+        return await self._write(add_habit, habit_data)
+
+    async def add_completion_dates(self, name, completion_dates):
+        """See db.add_completion_dates."""
+        return await self._write(add_completion_dates, name, completion_dates)
+
+    async def edit_habit(self, name, new_name=None, new_periodicity=None):
+        """See db.edit_habit."""
+        return await self._write(edit_habit, name, new_name=new_name, new_periodicity=new_periodicity)
+
+    async def delete_habit(self, name):
+        """See db.delete_habit."""
+        return await self._write(delete_habit, name)
+
+    async def get_completion_dates(self, name):
+        """See db.get_completion_dates. Callers of a coalesced read share the returned list."""
+        return await self._read(get_completion_dates, name)
+
+    async def get_current_habits(self):
+        """
+        See habit.get_current_habits.
+
+        The habits use the store's connection pool; call their blocking methods through
+        the store rather than from the event loop.
+        """
+        return await self._read(get_current_habits)
+
+    async def get_streak(self, name):
+        """
+        Get the cached streaks of a habit.
+
+        :return: a tuple (longest_run_streak, current_run_streak, last_completion), see
+                 db.get_streak_cache, or None if the habit doesn't exist.
+        """
+        return await self._read(get_streak_cache, name)
+
+    async def get_longest_run_streak_all_habits(self):
+        """See analyse.get_longest_run_streak_all_habits."""
+        return await self._read(get_longest_run_streak_all_habits)
+
+    async def get_longest_run_streak_by_periodicity(self, periodicity):
+        """See Habit.get_longest_run_streak_by_periodicity."""
+        return await self._read(get_cached_longest_run_streak, periodicity)
@@ -1,41 +1,28 @@
-from db import get_db, get_habit_data, get_habits_by_periodicity, get_completion_dates
-from habit import Habit
-import sqlite3
+from habit import Habit, load_habits
+from storage import get_storage
+from streaks import batch_streaks
+from tracing import timed
 
 
 def analyse_habit_data(db_con, habit):
     """
     Analyze the events in the habit.
 
-    :param db_con: an initialized sqlite3 database connection
+    :param db_con: an initialized sqlite3 database connection or a StorageBackend
     :param habit: name of the habit present in the DB
     :return: length of data in the habit, longest streak, or names of habits depending on conditions
     """
-    data = get_habit_data(db_con, habit)
+    data = get_storage(db_con).get_habit_data(habit)
     return len(data)
 
 
 def get_current_habits(db_con):
-    # Ensure db is a valid SQLite connection
-    if not isinstance(db_con, sqlite3.Connection):
-        raise TypeError("Expected a sqlite3.Connection object")
+    # Ensure db is a valid SQLite connection or storage backend, raises TypeError otherwise
+    storage = get_storage(db_con)
 
     try:
-        # Fetch current habits from the database
-        cur = db_con.cursor()
-        cur.execute("SELECT name, periodicity FROM habit")  # Fetch habit names and periodicity
-        habits_data = cur.fetchall()
-
-        # Convert the fetched data into a list of habits
-        current_habits = []
-        for name, periodicity in habits_data:
-            # Fetch completion dates for the habit
-            completion_dates = get_completion_dates(db_con, name)
-
-            # Assuming you have a Habit class to represent habits
-            habit = Habit(name, periodicity, db_con)
-            habit.completion_dates = completion_dates  # Attach completion dates to the habit
-            current_habits.append(habit)
+        # Fetch current habits and their completion dates from the database in one query
+        current_habits = load_habits(storage)
 
         # Analyze the habits
         analyze_habits(current_habits)
@@ -51,10 +38,10 @@ def analyze_habit_streak(db_con, habit):
     """
     Analyze and print the longest streak for a specific habit.
 
-    :param db_con: An initialized sqlite3 database connection
+    :param db_con: An initialized sqlite3 database connection or a StorageBackend
     :param habit: The name of the habit to analyze
     """
-    completion_dates, periodicity = get_habit_data(db_con, habit)
+    completion_dates, periodicity = get_storage(db_con).get_habit_data(habit)
 
     if completion_dates:
         if periodicity == 'daily':
@@ -83,12 +70,11 @@ def analyze_habits_by_periodicity(db_con, periodicity):
     :param periodicity: The periodicity to filter habits
     """
 
-    # Ensure db is a valid SQLite connection
-    if not isinstance(db_con, sqlite3.Connection):
-        raise TypeError("Expected db_con to be sqlite3.Connection object")
+    # Ensure db is a valid SQLite connection or storage backend, raises TypeError otherwise
+    storage = get_storage(db_con)
 
         # Call the function to get habits by periodicity
-    habits = get_habits_by_periodicity(db_con, periodicity)
+    habits = storage.get_habits_by_periodicity(periodicity)
 
     # Print the results
     print(f"Habits with periodicity {periodicity}:")
@@ -96,7 +82,7 @@ def analyze_habits_by_periodicity(db_con, periodicity):
         print(f"- {habit}")
 
     # Close the database connection
-    db_con.close()
+    storage.close()
 
 
 def get_longest_run_streak(data):
@@ -107,18 +93,21 @@ def get_longest_run_streak(data):
     """
     if not all(isinstance(habit, Habit) for habit in data):
         raise ValueError("All items in data must be Habit objects.")
-    return max((habit.get_longest_run_streak() for habit in data), default=0)
+    # All habits are computed in one batch (vectorized when NumPy is installed)
+    return max((longest for longest, current in batch_streaks(data)), default=0)
 
 
-def get_longest_run_streak_all_habits(db_con):
-    # Retrieve all habits from the database
-    current_habits = get_current_habits(db_con)  # Ensure this function is defined to fetch habits
-
-    if not current_habits:
-        return 0  # Return 0 if no habits are found
-
-    # Calculate the longest run streak for each habit
-    longest_streaks = [habit.get_longest_run_streak() for habit in current_habits]
+@timed
+def get_longest_run_streak_all_habits(db_con, from_completions=False):
+    """
+    Get the longest run streak across all habits in the database.
 
-    # Return the maximum streak found
-    return max(longest_streaks, default=0)  # Use default=0 to handle empty list
+    :param db_con: an initialized sqlite3 database connection or a StorageBackend
+    :param from_completions: recompute the streaks from the completions inside SQLite
+                             instead of reading the streak cache
+    :return: the longest streak in all habits, 0 if there are no habits
+    """
+    if from_completions:
+        return get_storage(db_con).compute_longest_run_streak()[0]
+    # The streak of every habit is cached in the habit table by add_completion_dates
+    return get_storage(db_con).get_cached_longest_run_streak()
@@ -0,0 +1,75 @@
+"""
+Benchmark the same Habit workload on the in-memory and the SQLite storage backend.
+
+Each backend gets the same habits, checks them in one day at a time as the CLI does,
+then reads them back: load every habit, the streak cache and the longest run streak by
+periodicity. MemoryBackend shows the cost of the Habit layer alone, the difference to
+SQLiteBackend is what the database adds.
+
+Run from the project root:
+
+    python -m benchmarks.bench_backends --habits 200 --days 365
+"""
+import argparse
+import contextlib
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from db import get_db
+from habit import Habit, get_current_habits
+from storage import MemoryBackend, SQLiteBackend
+
+
+def check_ins(storage, habit_count, days):
+    habits = [Habit(f"Habit {i}", "Daily" if i % 3 else "Weekly", storage) for i in range(habit_count)]
+    for habit in habits:
+        habit.store(storage)
+    start = date(2025, 1, 1)
+    for d in range(days):
+        day = start + timedelta(days=d)
+        for i, habit in enumerate(habits):
+            # Every habit skips a different day of the week, so the streaks vary
+            if (d + i) % 7:
+                habit.store_completion_dates([day])
+
+
+def reads(storage):
+    habits = get_current_habits(storage)
+    for habit in habits:
+        storage.get_streak_cache(habit.name)
+    return (Habit.get_longest_run_streak_by_periodicity(storage, "Daily"),
+            Habit.get_longest_run_streak_by_periodicity(storage, "Weekly"))
+
+
+def timed_run(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365, help="days of check-ins per habit")
+    args = parser.parse_args(argv)
+
+    print(f"{'backend':>8} {'check-ins (s)':>14} {'reads (ms)':>11}")
+    with tempfile.TemporaryDirectory() as tmp:
+        backends = {"memory": MemoryBackend(),
+                    "sqlite": SQLiteBackend(get_db(os.path.join(tmp, "backends.db")))}
+        results = []
+        for label, storage in backends.items():
+            # Habit.store prints a line per habit
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                writes, _ = timed_run(check_ins, storage, args.habits, args.days)
+            elapsed, result = timed_run(reads, storage)
+            results.append(result)
+            storage.close()
+            print(f"{label:>8} {writes:>14.2f} {elapsed * 1000:>11.1f}")
+        assert all(result == results[0] for result in results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark multi-threaded reads and writes through a shared connection and a pool.
+
+Every thread runs the same mix of requests for a fixed time: mostly reads of a random
+habit's completion dates and streaks, plus check-ins. The shared connection is the only
+option without a pool: one sqlite3 connection in rollback journal mode, serialized by a lock.
+The pool gives each thread its own WAL connection.
+
+Run from the project root:
+
+    python -m benchmarks.bench_concurrency --threads 1 2 4 8 --seconds 3
+"""
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+from db import (add_completion_dates, add_completions_bulk, add_habits_bulk, get_completion_dates, get_db,
+                get_pool, get_streak_cache)
+
+
+class LockedConnection:
+    """One connection shared by all threads, each call serialized by a lock."""
+
+    def __init__(self, path):
+        self.db_connect = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+
+    def call(self, func, *args):
+        with self.lock:
+            return func(self.db_connect, *args)
+
+    def close(self):
+        self.db_connect.close()
+
+
+class Pooled:
+    def __init__(self, path):
+        self.pool = get_pool(path)
+
+    def call(self, func, *args):
+        return func(self.pool, *args)
+
+    def close(self):
+        self.pool.close()
+
+
+def build_database(path, habit_count, days):
+    db_connect = get_db(path)
+    add_habits_bulk(db_connect, ((f"Habit {i}", "Daily") for i in range(habit_count)))
+    start = date(2025, 1, 1)
+    add_completions_bulk(db_connect, ((f"Habit {i}", start + timedelta(days=d))
+                                      for i in range(habit_count) for d in range(days)))
+    db_connect.close()
+
+
+def run(store, thread_count, seconds, habit_count, days, write_ratio):
+    counts = [0] * thread_count
+    stop = time.perf_counter() + seconds
+
+    def work(index):
+        rng = random.Random(index)
+        next_day = date(2025, 1, 1) + timedelta(days=days + index * 100_000)
+        while time.perf_counter() < stop:
+            name = f"Habit {rng.randrange(habit_count)}"
+            if rng.random() < write_ratio:
+                store.call(add_completion_dates, name, [next_day])
+                next_day += timedelta(days=1)
+            else:
+                store.call(get_completion_dates, name)
+                store.call(get_streak_cache, name)
+            counts[index] += 1
+
+    threads = [threading.Thread(target=work, args=(index,)) for index in range(thread_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts) / seconds
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--seconds", type=float, default=3)
+    parser.add_argument("--habits", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365, help="completions per habit")
+    parser.add_argument("--write-ratio", type=float, default=0.1, help="share of requests that are check-ins")
+    args = parser.parse_args(argv)
+
+    print(f"{'threads':>8} {'shared connection (req/s)':>26} {'pool (req/s)':>13} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for thread_count in args.threads:
+            results = []
+            for store_type in (LockedConnection, Pooled):
+                path = os.path.join(tmp, f"{store_type.__name__}-{thread_count}.db")
+                build_database(path, args.habits, args.days)
+                store = store_type(path)
+                results.append(run(store, thread_count, args.seconds, args.habits, args.days, args.write_ratio))
+                store.close()
+            shared, pooled = results
+            print(f"{thread_count:>8} {shared:>26.0f} {pooled:>13.0f} {pooled / shared:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
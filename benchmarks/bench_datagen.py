@@ -0,0 +1,37 @@
+"""
+Benchmark generating a synthetic dataset straight into a new database.
+
+datagen.populate writes every habit with its completions, streak cache and bitmap in one
+transaction; the rate is reported in completions per second.
+
+Run from the project root:
+
+    python -m benchmarks.bench_datagen --habits 46000 --days 365
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from datagen import populate
+from db import get_db
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=46000, help="about 10M completions at the defaults")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--out-of-order", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connect = get_db(os.path.join(tmp, "generated.db"))
+        start = time.perf_counter()
+        habits, completions = populate(db_connect, habits=args.habits, days=args.days, out_of_order=args.out_of_order)
+        elapsed = time.perf_counter() - start
+        db_connect.close()
+    print(f"{habits} habits, {completions} completions in {elapsed:.1f} s ({completions / elapsed:,.0f} per second)")
+
+
+if __name__ == "__main__":
+    main()
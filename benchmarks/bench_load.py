@@ -0,0 +1,71 @@
+"""
+Benchmark loading every habit with its completion dates.
+
+Compares the old pattern of one query per habit against habit.load_habits, which
+fetches everything in a single query, for a growing number of habits.
+
+Run from the project root:
+
+    python -m benchmarks.bench_load --habits 100 1000 10000 --days 30
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from db import get_db, get_completion_dates
+from habit import Habit, load_habits
+
+
+def build_database(path, habit_count, days):
+    """Create a database with habit_count habits, each completed on every one of the last days."""
+    db_connect = get_db(path)
+    start = datetime(2025, 1, 1)
+    dates = [(start + timedelta(days=d)).toordinal() for d in range(days)]
+    db_connect.executemany("INSERT INTO habit (name, periodicity) VALUES (?, ?)",
+                           ((f"Habit {i}", "Daily" if i % 2 else "Weekly") for i in range(habit_count)))
+    db_connect.executemany("INSERT INTO completion (habit_id, completed_on) VALUES (?, ?)",
+                           ((habit_id, date) for habit_id in range(1, habit_count + 1) for date in dates))
+    db_connect.commit()
+    return db_connect
+
+
+def load_per_habit(db_connect):
+    """The old N+1 loader: one query for the habits, then one query per habit."""
+    habits = []
+    for name, periodicity in db_connect.execute("SELECT name, periodicity FROM habit").fetchall():
+        habit = Habit(name, periodicity, db_connect)
+        habit.completion_dates = get_completion_dates(db_connect, name)
+        habits.append(habit)
+    return habits
+
+
+def time_call(func, db_connect, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(db_connect)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--days", type=int, default=30, help="completions per habit")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'habits':>8} {'completions':>12} {'per habit (s)':>14} {'single query (s)':>17} {'speedup':>8}")
+    for habit_count in args.habits:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_connect = build_database(os.path.join(tmp, "bench.db"), habit_count, args.days)
+            old = time_call(load_per_habit, db_connect, args.repeat)
+            new = time_call(load_habits, db_connect, args.repeat)
+            db_connect.close()
+        print(f"{habit_count:>8} {habit_count * args.days:>12} {old:>14.4f} {new:>17.4f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+Benchmark the memory used per habit by load_habits.
+
+Compares the compact Habit (__slots__, shared periodicity, completions in an array of day
+ordinals) against the previous representation: an instance __dict__, a periodicity string
+per habit and a list of datetime objects.
+
+Run from the project root:
+
+    python -m benchmarks.bench_memory --habits 10000 --days 365
+"""
+import argparse
+import gc
+import os
+import tempfile
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.bench_load import build_database
+from habit import load_habits
+
+
+class DictHabit:
+    """The habit representation before __slots__."""
+
+    def __init__(self, name, periodicity, db, completion_dates):
+        self.db = db
+        self.name = name
+        self.periodicity = periodicity
+        self.completion_dates = completion_dates
+
+
+def load_dict_habits(db_connect):
+    """Load the habits the way load_habits did before, one datetime per completion."""
+    parsed_dates = {}
+    habits = []
+    for name, periodicity, completion_days in db_connect.execute(
+            """SELECT h.name, h.periodicity,
+                 (SELECT group_concat(completed_on) FROM
+                   (SELECT completed_on FROM completion WHERE habit_id = h.id ORDER BY completed_on))
+               FROM habit h ORDER BY h.id"""):
+        dates = []
+        for day in completion_days.split(',') if completion_days else []:
+            date_obj = parsed_dates.get(day)
+            if date_obj is None:
+                date_obj = parsed_dates[day] = datetime.fromordinal(int(day))
+            dates.append(date_obj)
+        habits.append(DictHabit(name, periodicity, db_connect, dates))
+    return habits
+
+
+def measure(load, db_connect):
+    """Return the bytes still allocated after loading, i.e. held by the loaded habits."""
+    gc.collect()
+    tracemalloc.start()
+    habits = load(db_connect)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return size, len(habits)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365, help="completions per habit")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connect = build_database(os.path.join(tmp, "bench.db"), args.habits, args.days)
+        old, count = measure(load_dict_habits, db_connect)
+        new, _ = measure(load_habits, db_connect)
+        db_connect.close()
+
+    print(f"{args.habits} habits with {args.days} completions each")
+    print(f"{'representation':>18} {'bytes per habit':>16}")
+    print(f"{'__dict__ + list':>18} {old / count:>16.0f}")
+    print(f"{'__slots__ + array':>18} {new / count:>16.0f}")
+    print(f"{'reduction':>18} {old / new:>15.1f}x")
+
+
+if __name__ == "__main__":
+    main()
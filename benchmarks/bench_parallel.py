@@ -0,0 +1,56 @@
+"""
+Benchmark the parallel streak report against the number of worker processes.
+
+Every habit gets a random history with gaps; the report recomputes the streaks of all
+habits from their completions. With one worker the id ranges are computed in the main
+process, so the first row is the serial baseline.
+
+Run from the project root:
+
+    python -m benchmarks.bench_parallel --habits 100000 --days 100 --workers 1 2 4 8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from db import add_completions_bulk, add_habits_bulk, get_db
+from parallel import streak_report
+
+
+def build_database(path, habit_count, days, seed=16):
+    rng = random.Random(seed)
+    db_connect = get_db(path)
+    add_habits_bulk(db_connect, ((f"Habit {i}", "Daily" if i % 3 else "Weekly") for i in range(habit_count)))
+    start = date(2025, 1, 1)
+    dates = [start + timedelta(days=d) for d in range(days)]
+    add_completions_bulk(db_connect, ((f"Habit {i}", day) for i in range(habit_count)
+                                      for day in dates if rng.random() < 0.8))
+    db_connect.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=100, help="days of history per habit")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args(argv)
+
+    print(f"{os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'seconds':>8} {'speedup':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "parallel.db")
+        build_database(path, args.habits, args.days)
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            streak_report(path, workers=workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"{workers:>8} {elapsed:>8.2f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
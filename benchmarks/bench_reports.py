@@ -0,0 +1,67 @@
+"""
+Benchmark a month of completions per day, from the rollups and from the full histories.
+
+Without the rollups a report pulls every habit's completion dates through
+get_completion_dates and buckets them in Python, which grows with the history length.
+reports.completions_per_period reads one rollup row per day.
+
+Run from the project root:
+
+    python -m benchmarks.bench_reports --habits 1000 --days 90 365 1460
+"""
+import argparse
+import os
+import tempfile
+import time
+from collections import Counter
+from datetime import date, timedelta
+
+from datagen import populate
+from db import get_completion_dates, get_db
+from reports import completions_per_period
+
+END = date(2025, 5, 1)
+
+
+def report_from_completions(db_connect, start, end):
+    """The completions per day from start to end, counted from every habit's completion dates."""
+    counts = Counter()
+    for (name,) in db_connect.execute("SELECT name FROM habit").fetchall():
+        counts.update(value.date() for value in get_completion_dates(db_connect, name)
+                      if start <= value.date() <= end)
+    return [counts[start + timedelta(days=day)] for day in range((end - start).days + 1)]
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=1000)
+    parser.add_argument("--days", type=int, nargs="+", default=[90, 365, 1460], help="history lengths")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    start, end = END - timedelta(days=30), END - timedelta(days=1)
+    print(f"{'days':>6} {'completions':>12} {'full histories (ms)':>20} {'rollups (ms)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for days in args.days:
+            db_connect = get_db(os.path.join(tmp, f"reports-{days}.db"))
+            completions = populate(db_connect, habits=args.habits, days=days, end=END)[1]
+            rolled_up = [count.completions for count in completions_per_period(db_connect, "day", start, end)]
+            assert rolled_up == report_from_completions(db_connect, start, end)
+
+            full = best_of(lambda: report_from_completions(db_connect, start, end), args.repeat)
+            rollups = best_of(lambda: completions_per_period(db_connect, "day", start, end), args.repeat)
+            print(f"{days:>6} {completions:>12} {full * 1000:>20.1f} {rollups * 1000:>13.2f}")
+            db_connect.close()
+
+
+if __name__ == "__main__":
+    main()
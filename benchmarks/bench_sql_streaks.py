@@ -0,0 +1,67 @@
+"""
+Benchmark the SQL streak engine against computing the streaks in Python.
+
+All three recompute the longest and current run streak of every habit from the
+completion table: the Python loop and NumPy load every completion with load_habits
+first, the SQL engine (db.compute_streaks) returns one row per habit.
+
+Run from the project root:
+
+    python -m benchmarks.bench_sql_streaks --habits 2000 --days 600
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from db import add_completions_bulk, add_habits_bulk, compute_streaks, get_db
+from habit import load_habits
+from streaks import batch_streaks, has_numpy
+
+
+def build_database(path, habit_count, days, seed=19):
+    rng = random.Random(seed)
+    db_connect = get_db(path)
+    add_habits_bulk(db_connect, ((f"Habit {i}", "Daily" if i % 3 else "Weekly") for i in range(habit_count)))
+    start = date(2024, 1, 1)
+    dates = [start + timedelta(days=d) for d in range(days)]
+    add_completions_bulk(db_connect, ((f"Habit {i}", day) for i in range(habit_count)
+                                      for day in dates if rng.random() < 0.85))
+    return db_connect
+
+
+def timed_run(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=600, help="days of history per habit, 85%% completed")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connect = build_database(os.path.join(tmp, "streaks.db"), args.habits, args.days)
+        completions = db_connect.execute("SELECT COUNT(*) FROM completion").fetchone()[0]
+        print(f"{args.habits} habits, {completions} completions")
+
+        engines = {"Python loop": lambda: batch_streaks(load_habits(db_connect), use_numpy=False)}
+        if has_numpy():
+            engines["NumPy"] = lambda: batch_streaks(load_habits(db_connect), use_numpy=True)
+        engines["SQL window functions"] = lambda: list(compute_streaks(db_connect).values())
+
+        results = []
+        for label, engine in engines.items():
+            elapsed, result = timed_run(engine)
+            results.append(result)
+            print(f"{label:>22}: {elapsed:6.2f} s")
+        assert all(result == results[0] for result in results)
+        db_connect.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+Benchmark the time from opening the database to the first query.
+
+Compares get_db on an up-to-date database, which only reads PRAGMA user_version,
+against running every schema check and clean-up step on each start as get_db did
+before migrations were versioned.
+
+Run from the project root:
+
+    python -m benchmarks.bench_startup --habits 5 1000 --repeat 50
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+
+from db import get_db, migration_clean_habits, migration_create_schema
+
+
+def open_checking_everything(path):
+    """The old start-up: check and clean the schema on every connection."""
+    db_connect = sqlite3.connect(path)
+    migration_create_schema(db_connect)
+    migration_clean_habits(db_connect)
+    return db_connect
+
+
+def time_startup(open_db, path, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        db_connect = open_db(path)
+        db_connect.execute("SELECT COUNT(*) FROM habit").fetchone()
+        best = min(best, time.perf_counter() - start)
+        db_connect.close()
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, nargs="+", default=[5, 1000])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    print(f"{'habits':>8} {'every start (ms)':>17} {'versioned (ms)':>15} {'speedup':>8}")
+    for habit_count in args.habits:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            db_connect = get_db(path)
+            db_connect.executemany("INSERT INTO habit (name, periodicity) VALUES (?, 'Daily')",
+                                   ((f"Habit {i}",) for i in range(habit_count)))
+            db_connect.commit()
+            db_connect.close()
+
+            old = time_startup(open_checking_everything, path, args.repeat)
+            new = time_startup(get_db, path, args.repeat)
+        print(f"{habit_count:>8} {old * 1000:>17.3f} {new * 1000:>15.3f} {old / new:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark the live streak query against walking the full completion histories.
+
+The history walk loads every habit with get_current_habits and recomputes its current
+run from the completion dates, as a reminder job had to before. get_streak_status reads
+the streak cache in one query and get_at_risk_habits seeks the habits due today.
+
+Run from the project root:
+
+    python -m benchmarks.bench_status --habits 1000 10000 --days 365
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from db import add_completions_bulk, add_habits_bulk, get_at_risk_habits, get_db, get_streak_status
+from habit import get_current_habits
+from streaks import batch_streaks
+
+
+def build_database(path, habit_count, days):
+    db_connect = get_db(path)
+    add_habits_bulk(db_connect, ((f"Habit {i}", "Daily" if i % 3 else "Weekly") for i in range(habit_count)))
+    start = date(2025, 1, 1)
+    # Every habit skips a different day of the week, so the streaks vary
+    add_completions_bulk(db_connect, ((f"Habit {i}", start + timedelta(days=d))
+                                      for i in range(habit_count) for d in range(days) if (d + i) % 7))
+    return db_connect, start + timedelta(days=days)
+
+
+def best_of(func, repeat=3):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--days", type=int, default=365, help="days of history per habit")
+    args = parser.parse_args(argv)
+
+    print(f"{'habits':>8} {'history walk (ms)':>18} {'streak status (ms)':>19} {'at risk (ms)':>13}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for habit_count in args.habits:
+            db_connect, today = build_database(os.path.join(tmp, f"status-{habit_count}.db"), habit_count, args.days)
+            walk = best_of(lambda: batch_streaks(get_current_habits(db_connect)))
+            status = best_of(lambda: get_streak_status(db_connect, today))
+            at_risk = best_of(lambda: get_at_risk_habits(db_connect, today))
+            db_connect.close()
+            print(f"{habit_count:>8} {walk * 1000:>18.1f} {status * 1000:>19.1f} {at_risk * 1000:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Benchmark completions stored as ISO strings against INTEGER day ordinals.
+
+Builds the same history twice, once in the schema-3 layout with ISO strings and once
+migrated to day ordinals by get_db, and reports the file size and the time to read every
+completion back as datetime objects.
+
+Run from the project root:
+
+    python -m benchmarks.bench_storage --habits 1000 --days 365
+"""
+import argparse
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from db import get_db
+from habit import load_habits
+
+
+def build_iso_database(path, habit_count, days):
+    """Create a database in the layout used before day ordinals, at schema version 3."""
+    db_connect = sqlite3.connect(path)
+    db_connect.execute("""CREATE TABLE habit(
+      id INTEGER PRIMARY KEY,
+      name TEXT NOT NULL UNIQUE,
+      periodicity TEXT,
+      longest_run_streak INTEGER DEFAULT 0,
+      current_run_streak INTEGER DEFAULT 0,
+      last_completion TEXT)""")
+    db_connect.execute("""CREATE TABLE completion(
+      habit_id INTEGER NOT NULL,
+      completed_on TEXT NOT NULL,
+      PRIMARY KEY (habit_id, completed_on),
+      FOREIGN KEY(habit_id) REFERENCES habit(id) ON DELETE CASCADE) WITHOUT ROWID""")
+    start = datetime(2025, 1, 1)
+    dates = [(start + timedelta(days=d)).isoformat() for d in range(days)]
+    db_connect.executemany("INSERT INTO habit (name, periodicity) VALUES (?, 'Daily')",
+                           ((f"Habit {i}",) for i in range(habit_count)))
+    db_connect.executemany("INSERT INTO completion VALUES (?, ?)",
+                           ((habit_id, date) for habit_id in range(1, habit_count + 1) for date in dates))
+    db_connect.execute("PRAGMA user_version = 3")
+    db_connect.commit()
+    db_connect.execute("VACUUM")
+    db_connect.close()
+
+
+def read_all(db_connect, convert):
+    start = time.perf_counter()
+    rows = db_connect.execute("SELECT completed_on FROM completion").fetchall()
+    [convert(value) for (value,) in rows]
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365, help="completions per habit")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        build_iso_database(path, args.habits, args.days)
+        iso_size = os.path.getsize(path)
+        db_connect = sqlite3.connect(path)
+        iso_read = read_all(db_connect, lambda value: datetime.fromisoformat(value.strip()))
+        db_connect.close()
+
+        db_connect = get_db(path)  # Migrates the completions to day ordinals
+        db_connect.execute("VACUUM")
+        ordinal_size = os.path.getsize(path)
+        ordinal_read = read_all(db_connect, datetime.fromordinal)
+        start = time.perf_counter()
+        load_habits(db_connect)
+        load = time.perf_counter() - start
+        db_connect.close()
+
+    print(f"{args.habits * args.days} completions for {args.habits} habits over {args.days} days")
+    print(f"{'storage':>12} {'file (MB)':>10} {'read all (s)':>13}")
+    print(f"{'ISO string':>12} {iso_size / 1e6:>10.2f} {iso_read:>13.3f}")
+    print(f"{'day ordinal':>12} {ordinal_size / 1e6:>10.2f} {ordinal_read:>13.3f}")
+    print(f"load_habits on day ordinals: {load:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
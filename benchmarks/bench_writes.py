@@ -0,0 +1,85 @@
+"""
+Benchmark writing completions row by row against the batched write API.
+
+The per-row path calls add_completion_dates once per check-in, committing each time,
+as Habit.store_completion_dates used to. The batched path streams every
+(habit, date) pair through add_completions_bulk.
+
+Run from the project root:
+
+    python -m benchmarks.bench_writes --habits 10000 --days 365
+"""
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+
+from db import DEFAULT_CHUNK_SIZE, add_completion_dates, add_completions_bulk, add_habits_bulk, get_db
+
+
+def check_ins(habit_count, days, order="day"):
+    """
+    Yield one (habit_name, date) pair per habit and day.
+
+    With order "day" all habits are checked in day by day, as they arrive in production;
+    with order "habit" the full history of one habit follows the other, as in an export.
+    """
+    start = date(2025, 1, 1)
+    dates = [start + timedelta(days=day) for day in range(days)]
+    names = [f"Habit {i}" for i in range(habit_count)]
+    if order == "habit":
+        return ((name, current) for name in names for current in dates)
+    return ((name, current) for current in dates for name in names)
+
+
+def habits(habit_count):
+    return ((f"Habit {i}", "Daily" if i % 2 else "Weekly") for i in range(habit_count))
+
+
+def write_per_row(db_connect, habit_count, days, order):
+    for habit_name, current in check_ins(habit_count, days, order):
+        add_completion_dates(db_connect, habit_name, [current])
+
+
+def write_bulk(db_connect, habit_count, days, order, chunk_size):
+    add_completions_bulk(db_connect, check_ins(habit_count, days, order), chunk_size=chunk_size)
+
+
+def run(write, habit_count, days, *args):
+    with tempfile.TemporaryDirectory() as tmp:
+        db_connect = get_db(os.path.join(tmp, "bench.db"))
+        add_habits_bulk(db_connect, habits(habit_count))
+        start = time.perf_counter()
+        write(db_connect, habit_count, days, *args)
+        elapsed = time.perf_counter() - start
+        db_connect.close()
+    return elapsed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--habits", type=int, default=10000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--order", choices=["day", "habit"], default="day",
+                        help="stream check-ins day by day (default) or habit by habit")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--per-row-limit", type=int, default=20_000,
+                        help="number of rows to time the per-row path on, it is extrapolated from there")
+    args = parser.parse_args(argv)
+
+    rows = args.habits * args.days
+    bulk = run(write_bulk, args.habits, args.days, args.order, args.chunk_size)
+
+    # The per-row path is far too slow for the full data set, time a slice of days
+    sample_days = max(1, min(args.days, args.per_row_limit // args.habits))
+    sample_habits = min(args.habits, args.per_row_limit)
+    per_row = run(write_per_row, sample_habits, sample_days, args.order) * rows / (sample_habits * sample_days)
+
+    print(f"{rows} completions for {args.habits} habits over {args.days} days, {args.order} by {args.order}")
+    print(f"{'per row (s, extrapolated)':>26} {'batched (s)':>12} {'rows/s batched':>15} {'speedup':>8}")
+    print(f"{per_row:>26.2f} {bulk:>12.2f} {rows / bulk:>15.0f} {per_row / bulk:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+"""
+Benchmark the hot paths across data sizes and compare them against a stored baseline.
+
+For every size (the number of completions) a database is generated and the write path,
+the load path, the streak analytics and get_db start-up are timed. The timings are
+written to a JSON results file and compared with the baseline: a case that got slower
+than the baseline by more than the threshold is a regression and the run exits with 1.
+
+Run from the project root:
+
+    python -m benchmarks.suite --sizes 1000 100000 1000000
+    python -m benchmarks.suite --save-baseline      # after an intended change
+
+Timings depend on the machine, so refresh the baseline when moving to another one.
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from itertools import islice
+
+from analyse import get_longest_run_streak_all_habits
+from db import add_completion_dates, add_completions_bulk, add_habits_bulk, get_db
+from habit import get_current_habits
+from streaks import batch_streaks
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(BENCHMARK_DIR, "baseline.json")
+DEFAULT_SIZES = [1000, 100000, 1000000]
+# Days of history per habit; a habit is completed on 6 of every 7 days
+DAYS = 365
+# A case regresses when it is this much slower than the baseline...
+DEFAULT_THRESHOLD = 0.5
+# ...and at least this many seconds slower, so timer noise on fast cases doesn't fail a run
+MIN_DELTA = 0.005
+
+
+def habit_count(size):
+    """Number of habits needed for size completions."""
+    return max(1, -(-size * 7 // (DAYS * 6)))
+
+
+def habit_rows(size):
+    return [(f"Habit {i}", "Daily" if i % 3 else "Weekly") for i in range(habit_count(size))]
+
+
+def habit_dates(i):
+    """The completion dates of habit i: every day of the year except one weekday."""
+    start = date(2025, 1, 1)
+    return [start + timedelta(days=d) for d in range(DAYS) if (d + i) % 7]
+
+
+def completions(size):
+    """Exactly size (name, date) completions."""
+    return islice(((f"Habit {i}", day) for i in range(habit_count(size)) for day in habit_dates(i)), size)
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def best_of_fresh(setup, func, repeat):
+    """Like best_of, but func(setup()) gets a new database each run and setup isn't timed."""
+    timings = []
+    for _ in range(repeat):
+        db_connect = setup()
+        start = time.perf_counter()
+        func(db_connect)
+        timings.append(time.perf_counter() - start)
+        db_connect.close()
+    return min(timings)
+
+
+def bench_writes(path, size, repeat):
+    """Time the write path, each run into a new database holding only the habits."""
+    runs = iter(range(2 * repeat))
+
+    def setup():
+        db_connect = get_db(f"{path}.{next(runs)}")
+        add_habits_bulk(db_connect, habit_rows(size))
+        return db_connect
+
+    per_habit = {}
+    for name, day in completions(size):
+        per_habit.setdefault(name, []).append(day)
+
+    def add_per_habit(db_connect):
+        for name, dates in per_habit.items():
+            add_completion_dates(db_connect, name, dates)
+
+    return {
+        "write/add_completions_bulk": best_of_fresh(
+            setup, lambda db_connect: add_completions_bulk(db_connect, completions(size)), repeat),
+        "write/add_completion_dates": best_of_fresh(setup, add_per_habit, repeat),
+    }
+
+
+def bench_reads(path, size, repeat):
+    """Time loading, the streak analytics and start-up on a database with size completions."""
+    db_connect = get_db(path)
+    add_habits_bulk(db_connect, habit_rows(size))
+    add_completions_bulk(db_connect, completions(size))
+    habits = get_current_habits(db_connect)
+
+    results = {
+        "load/get_current_habits": best_of(lambda: get_current_habits(db_connect), repeat),
+        "streaks/get_longest_run_streak": best_of(lambda: [habit.get_longest_run_streak() for habit in habits],
+                                                  repeat),
+        "streaks/batch_streaks": best_of(lambda: batch_streaks(habits), repeat),
+        "streaks/get_longest_run_streak_all_habits": best_of(
+            lambda: get_longest_run_streak_all_habits(db_connect), repeat),
+        "streaks/get_longest_run_streak_all_habits_from_completions": best_of(
+            lambda: get_longest_run_streak_all_habits(db_connect, from_completions=True), repeat),
+    }
+    db_connect.close()
+    results["startup/get_db"] = best_of(lambda: get_db(path).close(), repeat)
+    return results
+
+
+def run_suite(sizes, repeat=3):
+    """
+    Run every case for every size.
+
+    :param sizes: numbers of completions.
+    :param repeat: runs per case, the fastest is kept.
+    :return: a dict mapping "group/case[size]" to seconds.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            timings = bench_writes(os.path.join(tmp, f"write-{size}.db"), size, repeat)
+            timings.update(bench_reads(os.path.join(tmp, f"read-{size}.db"), size, repeat))
+            results.update((f"{case}[{size}]", seconds) for case, seconds in timings.items())
+    return results
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD, min_delta=MIN_DELTA):
+    """
+    Compare timings against a baseline.
+
+    :param results: dict mapping case to seconds, as returned by run_suite.
+    :param baseline: the same for the baseline; cases missing on either side are skipped.
+    :param threshold: allowed slowdown as a fraction, 0.25 allows 25% slower.
+    :param min_delta: slowdowns of fewer seconds are ignored.
+    :return: a list of tuples (case, baseline seconds, seconds, ratio, regressed).
+    """
+    rows = []
+    for case, seconds in results.items():
+        if case not in baseline:
+            continue
+        before = baseline[case]
+        ratio = seconds / before if before else float("inf")
+        regressed = ratio > 1 + threshold and seconds - before > min_delta
+        rows.append((case, before, seconds, ratio, regressed))
+    return rows
+
+
+def write_results(path, results, sizes):
+    document = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "sizes": sizes,
+        "results": results,
+    }
+    with open(path, "w") as out:
+        json.dump(document, out, indent=2, sort_keys=True)
+        out.write("\n")
+
+
+def read_results(path):
+    with open(path) as f:
+        return json.load(f)["results"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="numbers of completions")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="bench_results.json", help="machine-readable results file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed slowdown against the baseline, as a fraction")
+    parser.add_argument("--min-delta", type=float, default=MIN_DELTA,
+                        help="slowdowns of fewer seconds are never a regression")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.sizes, args.repeat)
+    write_results(args.output, results, args.sizes)
+    if args.save_baseline:
+        write_results(args.baseline, results, args.sizes)
+        print(f"Baseline saved to {args.baseline}")
+
+    baseline = read_results(args.baseline) if os.path.exists(args.baseline) else {}
+    rows = compare(results, baseline, args.threshold, args.min_delta)
+    compared = {row[0] for row in rows}
+
+    print(f"{'case':<68} {'baseline (ms)':>14} {'now (ms)':>10} {'ratio':>6}")
+    for case, before, seconds, ratio, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{case:<68} {before * 1000:>14.2f} {seconds * 1000:>10.2f} {ratio:>6.2f}{flag}")
+    for case, seconds in results.items():
+        if case not in compared:
+            print(f"{case:<68} {'-':>14} {seconds * 1000:>10.2f} {'-':>6}")
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        print(f"{len(regressions)} case(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,201 @@
+from streaks import day_ordinal
+
+
+class CompletionBitmap:
+    """
+    Set of completion days stored as one bit per day.
+
+    Bit i is the day first_day + i, with first_day a multiple of 8 so bitmaps of different
+    habits line up on whole bytes. Membership is a single bit test and counting a range is
+    a popcount over the bytes it covers; the bytes are stored as a BLOB by db.py.
+    """
+    __slots__ = ("first_day", "bits")
+
+    def __init__(self, first_day=0, bits=b""):
+        self.first_day = first_day
+        self.bits = bytearray(bits)
+
+    @classmethod
+    def from_days(cls, days):
+        """
+        Build a bitmap from day ordinals.
+
+        :param days: iterable of day ordinals, datetime, date or ISO formatted strings.
+        :return: CompletionBitmap.
+        """
+        # Day ordinals, e.g. read from the completion table, are taken without a call per day
+        days = [day if day.__class__ is int else day_ordinal(day) for day in days]
+        if not days:
+            return cls()
+        first_day = min(days) & ~7
+        bits = bytearray(((max(days) - first_day) >> 3) + 1)
+        for day in days:
+            offset = day - first_day
+            bits[offset >> 3] |= 1 << (offset & 7)
+        return cls(first_day, bits)
+
+    @classmethod
+    def _from_int(cls, first_day, value):
+        """Build a bitmap from an int holding the bit of first_day in bit 0, trimming empty bytes."""
+        if not value:
+            return cls()
+        low = ((value & -value).bit_length() - 1) & ~7
+        value >>= low
+        return cls(first_day + low, value.to_bytes((value.bit_length() + 7) >> 3, "little"))
+
+    def _to_int(self):
+        return int.from_bytes(self.bits, "little")
+
+    @property
+    def last_day(self):
+        """The last day the bitmap has room for (not necessarily completed)."""
+        return self.first_day + len(self.bits) * 8 - 1
+
+    def add(self, day):
+        """
+        Mark a day as completed, growing the bitmap in either direction when needed.
+
+        :param day: day ordinal, datetime, date or ISO formatted string.
+        :return: True if the day was not completed before.
+        """
+        day = day_ordinal(day)
+        if not self.bits:
+            self.first_day = day & ~7
+            self.bits = bytearray(1)
+        elif day < self.first_day:
+            first_day = day & ~7
+            self.bits[:0] = bytes((self.first_day - first_day) >> 3)
+            self.first_day = first_day
+        offset = day - self.first_day
+        index = offset >> 3
+        if index >= len(self.bits):
+            self.bits.extend(bytes(index - len(self.bits) + 1))
+        mask = 1 << (offset & 7)
+        if self.bits[index] & mask:
+            return False
+        self.bits[index] |= mask
+        return True
+
+    def update(self, days):
+        """
+        Mark many days as completed, growing the bitmap at most once at each end.
+
+        :param days: a sequence of day ordinals.
+        """
+        if not days:
+            return
+        self.add(min(days))
+        self.add(max(days))
+        bits, first_day = self.bits, self.first_day
+        for day in days:
+            offset = day - first_day
+            bits[offset >> 3] |= 1 << (offset & 7)
+
+    def __contains__(self, day):
+        offset = day_ordinal(day) - self.first_day
+        if offset < 0 or offset >> 3 >= len(self.bits):
+            return False
+        return bool(self.bits[offset >> 3] >> (offset & 7) & 1)
+
+    def __len__(self):
+        return self._to_int().bit_count()
+
+    def __iter__(self):
+        """Yield the completed days as day ordinals, oldest first."""
+        first_day = self.first_day
+        for index, byte in enumerate(self.bits):
+            while byte:
+                low = byte & -byte
+                yield first_day + index * 8 + low.bit_length() - 1
+                byte ^= low
+
+    def days(self, start=None, end=None):
+        """
+        Yield the completed days in a range as day ordinals, oldest first.
+
+        :param start: first day of the range (inclusive), default the first completion.
+        :param end: last day of the range (inclusive), default the last completion.
+        """
+        if not self.bits:
+            return
+        first_day = self.first_day
+        start = first_day if start is None else max(day_ordinal(start), first_day)
+        end = self.last_day if end is None else min(day_ordinal(end), self.last_day)
+        for index in range((start - first_day) >> 3, ((end - first_day) >> 3) + 1 if start <= end else 0):
+            byte = self.bits[index]
+            while byte:
+                low = byte & -byte
+                day = first_day + index * 8 + low.bit_length() - 1
+                if start <= day <= end:
+                    yield day
+                byte ^= low
+
+    def __eq__(self, other):
+        if not isinstance(other, CompletionBitmap):
+            return NotImplemented
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f"CompletionBitmap(first_day={self.first_day}, days={len(self)})"
+
+    def count(self, start=None, end=None):
+        """
+        Count the completed days in a range.
+
+        :param start: first day of the range (inclusive), default the first completion.
+        :param end: last day of the range (inclusive), default the last completion.
+        :return: the number of completed days in the range.
+        """
+        if not self.bits:
+            return 0
+        start = self.first_day if start is None else max(day_ordinal(start), self.first_day)
+        end = self.last_day if end is None else min(day_ordinal(end), self.last_day)
+        if start > end:
+            return 0
+        low = start - self.first_day
+        high = end - self.first_day
+        value = int.from_bytes(self.bits[low >> 3:(high >> 3) + 1], "little") >> (low & 7)
+        return (value & ((1 << (high - low + 1)) - 1)).bit_count()
+
+    def __and__(self, other):
+        return intersection([self, other])
+
+    def __or__(self, other):
+        return union([self, other])
+
+
+def intersection(bitmaps):
+    """
+    Return the days completed in every bitmap, e.g. the days every Daily habit was done.
+
+    :param bitmaps: iterable of CompletionBitmap.
+    :return: CompletionBitmap, empty if no bitmap is given.
+    """
+    bitmaps = list(bitmaps)
+    if not bitmaps or not all(bitmap.bits for bitmap in bitmaps):
+        return CompletionBitmap()
+    first_day = max(bitmap.first_day for bitmap in bitmaps)
+    last_day = min(bitmap.last_day for bitmap in bitmaps)
+    if first_day > last_day:
+        return CompletionBitmap()
+    value = (1 << (last_day - first_day + 1)) - 1
+    for bitmap in bitmaps:
+        value &= bitmap._to_int() >> (first_day - bitmap.first_day)
+    return CompletionBitmap._from_int(first_day, value)
+
+
+def union(bitmaps):
+    """
+    Return the days completed in at least one bitmap.
+
+    :param bitmaps: iterable of CompletionBitmap.
+    :return: CompletionBitmap, empty if no bitmap is given.
+    """
+    bitmaps = [bitmap for bitmap in bitmaps if bitmap.bits]
+    if not bitmaps:
+        return CompletionBitmap()
+    first_day = min(bitmap.first_day for bitmap in bitmaps)
+    value = 0
+    for bitmap in bitmaps:
+        value |= bitmap._to_int() << (bitmap.first_day - first_day)
+    return CompletionBitmap._from_int(first_day, value)
@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from db import (CONNECTION_TYPES, add_write_listener, remove_write_listener, get_habit, get_habit_periodicity,
+                get_completion_dates, get_habits_by_periodicity)
+
+
+logger = logging.getLogger(__name__)
+
+# Default number of entries kept by a HabitCache
+DEFAULT_MAXSIZE = 4096
+
+# Default number of seconds between two checks for writes from other connections. The
+# check is a query of its own, about as expensive as reading a periodicity.
+DEFAULT_CHECK_INTERVAL = 1.0
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    A mapping of at most maxsize entries that evicts the least recently used entry.
+
+    Lookups are counted in hits and misses, dropped entries in evictions.
+    """
+
+    def __init__(self, maxsize=DEFAULT_MAXSIZE):
+        """
+        :param maxsize: the maximum number of entries, at least 1.
+        """
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1.")
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value of key and mark it as most recently used, or default if it isn't cached."""
+        with self._lock:
+            value = self._entries.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Cache a value, evicting the least recently used entry when the cache is full."""
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key):
+        """Drop the entry of key, if any."""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """Drop all entries; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+
+class HabitCache:
+    """
+    Read-through cache of habit metadata and completion dates for one connection.
+
+    The read methods take the same arguments as the db functions of the same name, minus
+    the connection. Entries are dropped as soon as a db write function changes them: a
+    check-in only drops the completion dates of its habit, adding, editing or deleting a
+    habit drops its entries and the lists of habits by periodicity. Writes from other
+    connections, including other processes, are detected with PRAGMA data_version at
+    most check_interval seconds later and clear the whole cache.
+
+    Writes that bypass the db write functions (e.g. raw SQL) must be followed by clear().
+    """
+
+    def __init__(self, db_connect, maxsize=DEFAULT_MAXSIZE, check_interval=DEFAULT_CHECK_INTERVAL):
+        """
+        :param db_connect: Database connection object the reads and writes go through.
+        :param maxsize: the maximum number of cached entries.
+        :param check_interval: seconds between two checks for writes from other
+                               connections; 0 checks on every read.
+        """
+        if not isinstance(db_connect, CONNECTION_TYPES):
+            raise TypeError("Expected a sqlite3.Connection or ConnectionPool object")
+        self.db_connect = db_connect
+        self.entries = LRUCache(maxsize)
+        self.check_interval = check_interval
+        self._data_version = None
+        self._next_check = 0.0
+        # The arguments get_habits_by_periodicity is cached for
+        self._periodicities = set()
+        add_write_listener(self)
+
+    def close(self):
+        """Stop listening to writes and drop all entries; the connection stays open."""
+        remove_write_listener(self)
+        self.clear()
+
+    def clear(self):
+        """Drop all entries, e.g. after writing to the database with raw SQL."""
+        self.entries.clear()
+
+    @property
+    def hits(self):
+        return self.entries.hits
+
+    @property
+    def misses(self):
+        return self.entries.misses
+
+    def _check(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        self._next_check = now + self.check_interval
+        # data_version changes when another connection commits to the database
+        data_version = self.db_connect.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            if self._data_version is not None:
+                logger.debug("Database changed by another connection, clearing %d entries", len(self.entries))
+            self.entries.clear()
+            self._data_version = data_version
+
+    def _read(self, func, arg):
+        self._check()
+        value = self.entries.get((func, arg), _MISSING)
+        if value is _MISSING:
+            value = func(self.db_connect, arg)
+            self.entries.put((func, arg), value)
+            if func is get_habits_by_periodicity:
+                self._periodicities.add(arg)
+        return value
+
+    def get_habit(self, name):
+        """See db.get_habit."""
+        return self._read(get_habit, name)
+
+    def get_habit_periodicity(self, name):
+        """See db.get_habit_periodicity."""
+        return self._read(get_habit_periodicity, name)
+
+    def get_completion_dates(self, name):
+        """See db.get_completion_dates; returns a new list on every call."""
+        return list(self._read(get_completion_dates, name))
+
+    def get_habits_by_periodicity(self, periodicity):
+        """See db.get_habits_by_periodicity; returns a new list on every call."""
+        return list(self._read(get_habits_by_periodicity, periodicity))
+
+    def invalidate(self, db_connect, names=None, habits_changed=True):
+        """
+        Drop the entries changed by a write, called by the db write functions.
+
+        :param db_connect: the connection the write went through; writes through other
+                           connections are picked up by the data_version check instead.
+        :param names: the habits that changed, None for any habit.
+        :param habits_changed: False when only completions were added.
+        """
+        if db_connect is not self.db_connect:
+            return
+        if names is None:
+            self.entries.clear()
+            return
+        for name in names:
+            self.entries.pop((get_completion_dates, name))
+            if habits_changed:
+                self.entries.pop((get_habit, name))
+                self.entries.pop((get_habit_periodicity, name))
+        if habits_changed:
+            for periodicity in self._periodicities:
+                self.entries.pop((get_habits_by_periodicity, periodicity))
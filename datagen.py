@@ -0,0 +1,97 @@
+import logging
+import random
+from datetime import date
+from db import add_history_days
+from streaks import day_ordinal
+from tracing import timed
+
+
+logger = logging.getLogger(__name__)
+
+
+def _periods(rng, count, completion_rate, gap_rate, max_gap):
+    """Yield the indexes of the completed periods out of count, skipping breaks."""
+    chance = rng.random
+    period = 0
+    while period < count:
+        if chance() < gap_rate:
+            period += rng.randint(1, max_gap)
+            continue
+        if chance() < completion_rate:
+            yield period
+        period += 1
+
+
+def generate_history(habits=1000, days=365, daily_share=0.7, completion_rate=0.85, gap_rate=0.01, max_gap=14,
+                     out_of_order=0.0, end=date(2025, 5, 1), seed=0, prefix="Habit"):
+    """
+    Generate a synthetic dataset one habit at a time.
+
+    Every habit gets its own random generator seeded from seed and its number, so the same
+    arguments always generate the same habits and a habit doesn't depend on the ones before.
+
+    :param habits: number of habits.
+    :param days: length of every habit's history in days, ending the day before end.
+    :param daily_share: share of the habits that are Daily, the rest are Weekly.
+    :param completion_rate: chance that a day (Daily) or a week (Weekly) is completed.
+    :param gap_rate: chance that a break, e.g. a holiday, starts on a day or week.
+    :param max_gap: longest break in days or weeks; breaks are 1 to max_gap long.
+    :param out_of_order: share of the completions moved to the end in random order, like
+                         check-ins that were backfilled after newer ones.
+    :param end: the day after the last day of history.
+    :param seed: seed of the dataset.
+    :param prefix: habit names are prefix followed by the habit number.
+    :return: a generator of (habit_name, periodicity, days) tuples, days being a list of day
+             ordinals in insertion order, as taken by db.add_history_days.
+    """
+    if habits < 0 or days < 0 or max_gap < 1:
+        raise ValueError("habits and days can't be negative and max_gap must be at least 1")
+    for name, rate in [("daily_share", daily_share), ("completion_rate", completion_rate),
+                       ("gap_rate", gap_rate), ("out_of_order", out_of_order)]:
+        if not 0 <= rate <= 1:
+            raise ValueError(f"{name} must be between 0 and 1, not {rate}")
+    return _generate(habits, days, daily_share, completion_rate, gap_rate, max_gap, out_of_order, end, seed, prefix)
+
+
+def _generate(habits, days, daily_share, completion_rate, gap_rate, max_gap, out_of_order, end, seed, prefix):
+    first_day = day_ordinal(end) - days
+    last_day = first_day + days - 1
+    # Weekly check-ins fall in the Monday-based weeks of streaks.period_index, starting with
+    # the one first_day is in
+    week_start = first_day - (first_day - 1) % 7
+    weeks = (last_day - week_start) // 7 + 1 if days else 0
+    for number in range(habits):
+        rng = random.Random(f"{seed}:{number}")
+        if rng.random() < daily_share:
+            periodicity = "Daily"
+            completion_days = [first_day + day
+                               for day in _periods(rng, days, completion_rate, gap_rate, max_gap)]
+        else:
+            periodicity = "Weekly"
+            # One check-in on a random day of each completed week, within the history
+            completion_days = []
+            for week in _periods(rng, weeks, completion_rate, gap_rate, max_gap):
+                monday = week_start + week * 7
+                start, stop = max(monday, first_day), min(monday + 6, last_day)
+                completion_days.append(start + rng.randrange(stop - start + 1))
+
+        if out_of_order and completion_days:
+            late = [day for day in completion_days if rng.random() < out_of_order]
+            rng.shuffle(late)
+            late_days = set(late)
+            completion_days = [day for day in completion_days if day not in late_days] + late
+        yield f"{prefix} {number}", periodicity, completion_days
+
+
+@timed
+def populate(db_connect, **params):
+    """
+    Write a generated dataset into the database in a single transaction.
+
+    :param db_connect: Database connection object; the generated habit names must not exist yet.
+    :param params: arguments of generate_history, e.g. habits=10000, seed=7.
+    :return: a tuple (habits_added, completions_added).
+    """
+    habits_added, completions_added = add_history_days(db_connect, generate_history(**params))
+    logger.info("Generated %d habits with %d completions", habits_added, completions_added)
+    return habits_added, completions_added
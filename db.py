@@ -1,41 +1,657 @@
+import json
+import logging
 import sqlite3
-from datetime import datetime
-
-
+import weakref
+from array import array
+from collections import Counter
+from datetime import date, datetime
+from itertools import groupby, islice, repeat
+from operator import itemgetter
+from bitmap import CompletionBitmap, intersection, union
+from pool import ConnectionPool
+from streaks import (BUCKETS, PERIODICITIES, bucket_counts, bucket_start, day_ordinal, period_index, period_end,
+                     run_streaks, streak_status)
+from tracing import timed
+
+
+logger = logging.getLogger(__name__)
+
+
+HABIT_TABLE = """CREATE TABLE IF NOT EXISTS habit(
+      id INTEGER PRIMARY KEY,
+      name TEXT NOT NULL UNIQUE,
+      periodicity TEXT,
+      longest_run_streak INTEGER DEFAULT 0,
+      current_run_streak INTEGER DEFAULT 0,
+      last_completion INTEGER)"""
+
+# One row per completion. The composite primary key keeps the completions of a habit
+# ordered by date and turns a duplicate check-in into a no-op. Habits are tracked per day,
+# so completions (and habit.last_completion) are stored as day ordinals, see to_completion_date.
+COMPLETION_TABLE = """CREATE TABLE IF NOT EXISTS completion(
+      habit_id INTEGER NOT NULL,
+      completed_on INTEGER NOT NULL,
+      PRIMARY KEY (habit_id, completed_on),
+      FOREIGN KEY(habit_id) REFERENCES habit(id) ON DELETE CASCADE) WITHOUT ROWID"""
+
+# The completions of each habit as a bitmap, see bitmap.CompletionBitmap. Maintained by the
+# write functions next to the completion rows; habits without completions have no row.
+COMPLETION_BITMAP_TABLE = """CREATE TABLE IF NOT EXISTS completion_bitmap(
+      habit_id INTEGER PRIMARY KEY,
+      first_day INTEGER NOT NULL,
+      bits BLOB NOT NULL,
+      FOREIGN KEY(habit_id) REFERENCES habit(id) ON DELETE CASCADE)"""
+
+# The number of completions of all habits per bucket (day, ISO week and month, see
+# streaks.bucket_index) and the number of habits completed in it. Maintained by the write
+# functions next to the completion bitmaps, so a report over a range reads one row per
+# bucket however long the history is; the counts of single habits come from their
+# bitmaps. Buckets without completions have no row.
+COMPLETION_ROLLUP_TABLE = """CREATE TABLE IF NOT EXISTS completion_rollup(
+      bucket TEXT NOT NULL,
+      period INTEGER NOT NULL,
+      completions INTEGER NOT NULL,
+      habits INTEGER NOT NULL,
+      PRIMARY KEY (bucket, period)) WITHOUT ROWID"""
+
+# Queries counting the completion table into (period, completions, habits) rows per bucket,
+# see streaks.bucket_index. A habit completes a day at most once, so a day needs no DISTINCT;
+# months are grouped on strftime('%Y%m', ...) and only converted once per month.
+# 1721424.5 is the julianday() of the day before 0001-01-01
+ROLLUP_SQL = {
+    "day": "SELECT completed_on, COUNT(*), COUNT(*) FROM completion GROUP BY completed_on",
+    "week": """SELECT (completed_on - 1) / 7 AS period, COUNT(*), COUNT(DISTINCT habit_id)
+               FROM completion GROUP BY period""",
+    "month": """SELECT CAST(substr(month, 1, 4) AS INTEGER) * 12 + CAST(substr(month, 5) AS INTEGER) - 1,
+                       completions, habits
+                FROM (SELECT strftime('%Y%m', completed_on + 1721424.5) AS month, COUNT(*) AS completions,
+                             COUNT(DISTINCT habit_id) AS habits
+                      FROM completion GROUP BY month)""",
+}
+
+# SQL expression converting a column holding ISO dates (or day ordinals) to day ordinals;
+# 1721424.5 is the julianday() of the day before 0001-01-01
+ISO_TO_ORDINAL_SQL = """CASE WHEN {0} GLOB '[0-9][0-9][0-9][0-9]-*'
+                        THEN CAST(julianday(substr({0}, 1, 10)) - 1721424.5 AS INTEGER)
+                        ELSE CAST({0} AS INTEGER) END"""
+
+
+# Longest and current run streak per habit, computed by SQLite as gaps-and-islands: the
+# completions are reduced to one row per period (day or ISO week), a period minus its
+# ROW_NUMBER() is constant within a run of consecutive periods, and the last run (by its
+# last period) is the current one. A habit without completions has a single empty run.
+# {where} filters the habit table, aliased h.
+STREAKS_SQL = """WITH periods AS (
+                   SELECT h.id AS habit_id, h.name,
+                          CASE h.periodicity WHEN 'Weekly' THEN (c.completed_on - 1) / 7
+                                             ELSE c.completed_on END AS period
+                   FROM habit h LEFT JOIN completion c ON c.habit_id = h.id
+                   WHERE h.periodicity IN ('Daily', 'Weekly') {where}
+                   GROUP BY h.id, period),
+                 runs AS (
+                   SELECT habit_id, name, COUNT(period) AS length, MAX(period) AS last_period
+                   FROM (SELECT habit_id, name, period,
+                                period - ROW_NUMBER() OVER (PARTITION BY habit_id ORDER BY period) AS island
+                         FROM periods)
+                   GROUP BY habit_id, island)
+                 SELECT habit_id, name, MAX(length) AS longest_run_streak, current_run_streak
+                 FROM (SELECT habit_id, name, length,
+                              FIRST_VALUE(length) OVER (PARTITION BY habit_id ORDER BY last_period DESC)
+                                AS current_run_streak
+                       FROM runs)
+                 GROUP BY habit_id"""
+
+
+# What the db functions accept as db_connect
+CONNECTION_TYPES = (sqlite3.Connection, ConnectionPool)
+
+# Number of rows written per transaction by the bulk write functions. Every commit writes
+# each B-tree page the chunk touched, so larger chunks are much faster for interleaved data.
+DEFAULT_CHUNK_SIZE = 250_000
+
+# Objects told about every write made through the write functions, see add_write_listener
+_write_listeners = weakref.WeakSet()
+
+# Default periodicity of the demo habits, applied once by migration_clean_habits
+DEFAULT_PERIODICITY = [
+    ("Medication", "Weekly"),
+    ("Laundry", "Weekly"),
+    ("Exercise", "Daily"),
+    ("Make Daily To Do List", "Daily"),
+    ("Study", "Daily")
+]
+
+
+@timed
 def get_db(name: str = "main.db") -> sqlite3.Connection:
     db_connect = sqlite3.connect(name)
+    migrate(db_connect)   # On an up-to-date database this is a single PRAGMA read
+    return db_connect
+
+
+@timed
+def get_pool(name: str = "main.db", **pragmas) -> ConnectionPool:
+    """
+    Open a connection pool for sharing the database between threads.
+
+    The database is migrated once, through the connection of the calling thread.
+
+    :param name: path of the database file.
+    :param pragmas: pragmas overriding pool.DEFAULT_PRAGMAS.
+    :return: ConnectionPool, accepted by every function taking a db_connect.
+    """
+    pool = ConnectionPool(name, **pragmas)
+    migrate(pool.connection())
+    return pool
+
+
+def add_write_listener(listener):
+    """
+    Notify an object of the writes made through the write functions of this module.
+
+    After a write is committed, listener.invalidate(db_connect, names, habits_changed) is
+    called with the connection the write went through. names is the set of habit names
+    whose habit row or completions changed, or None when any habit may have changed.
+    habits_changed is False when only completions were added.
+
+    :param listener: the object to notify, held by a weak reference.
+    """
+    _write_listeners.add(listener)
+
+
+def remove_write_listener(listener):
+    """Stop notifying a listener added with add_write_listener."""
+    _write_listeners.discard(listener)
+
+
+def _notify_write(db_connect, names=None, habits_changed=True):
+    for listener in list(_write_listeners):
+        listener.invalidate(db_connect, names, habits_changed)
+
+
+def migration_create_schema(db_connect):
+    """
+    Migration 1: create the tables, or upgrade a database created before versioning.
+
+    Every step checks the current schema first, so it is safe on any earlier layout.
+    """
     create_tables(db_connect)
     add_longest_run_streak_column(db_connect)
-    delete_invalid_habits(db_connect)   # Delete invalid habits when the database is initialized
+    migrate_tracker_to_completion(db_connect)   # Move old comma-joined tracker rows into the completion table
+    add_streak_cache_columns(db_connect)
+
+
+def migration_clean_habits(db_connect):
+    """Migration 2: remove invalid habits and fill in missing periodicity."""
+    delete_invalid_habits(db_connect)
     fix_null_periodicity(db_connect)
-    habit_data = [
-        ("Medication", "Weekly"),
-        ("Laundry", "Weekly"),
-        ("Exercise", "Daily"),
-        ("Make Daily To Do List", "Daily"),
-        ("Study", "Daily")
-    ]
-    update_default_periodicity(db_connect, habit_data)
-    return db_connect
+    update_default_periodicity(db_connect, DEFAULT_PERIODICITY)
+
+
+def migration_add_indexes(db_connect):
+    """
+    Migration 3: index the habit columns that queries filter or aggregate on.
+
+    Completions need no extra index: the completion primary key (habit_id, completed_on)
+    already covers every lookup by habit, in date order.
+    """
+    cur = db_connect.cursor()
+    # Habits by periodicity, NULL periodicity repairs and the longest streak per periodicity
+    cur.execute("CREATE INDEX IF NOT EXISTS habit_periodicity ON habit(periodicity, longest_run_streak)")
+    # The longest streak across all habits
+    cur.execute("CREATE INDEX IF NOT EXISTS habit_longest_run_streak ON habit(longest_run_streak)")
+    cur.close()
+
+
+def migration_day_ordinals(db_connect):
+    """
+    Migration 4: store completion dates as INTEGER day ordinals instead of ISO strings.
+
+    An ordinal takes a few bytes instead of 19 and needs no parsing, and the day arithmetic
+    of the streaks works on it directly.
+    """
+    cur = db_connect.cursor()
+    completion_types = {column[1]: column[2] for column in cur.execute("PRAGMA table_info(completion)")}
+    habit_types = {column[1]: column[2] for column in cur.execute("PRAGMA table_info(habit)")}
+
+    # Keep foreign keys pointing at "habit" while the table is renamed
+    cur.execute("PRAGMA legacy_alter_table = ON")
+    cur.execute("BEGIN")
+    try:
+        if completion_types.get("completed_on") == "TEXT":
+            cur.execute("ALTER TABLE completion RENAME TO completion_old")
+            cur.execute(COMPLETION_TABLE)
+            cur.execute(f"""INSERT OR IGNORE INTO completion (habit_id, completed_on)
+                            SELECT habit_id, {ISO_TO_ORDINAL_SQL.format('completed_on')} FROM completion_old
+                            ORDER BY habit_id, completed_on""")
+            cur.execute("DROP TABLE completion_old")
+
+        if habit_types.get("last_completion") == "TEXT":
+            # A TEXT column would turn the ordinals back into strings, so rebuild the table
+            cur.execute("ALTER TABLE habit RENAME TO habit_old")
+            cur.execute(HABIT_TABLE)
+            cur.execute(f"""INSERT INTO habit (id, name, periodicity, longest_run_streak, current_run_streak,
+                                               last_completion)
+                            SELECT id, name, periodicity, longest_run_streak, current_run_streak,
+                                   {ISO_TO_ORDINAL_SQL.format('last_completion')}
+                            FROM habit_old""")
+            cur.execute("DROP TABLE habit_old")  # Also drops its indexes, recreated below
+            migration_add_indexes(db_connect)
+
+        db_connect.commit()
+    except Exception:
+        db_connect.rollback()
+        raise
+    finally:
+        cur.execute("PRAGMA legacy_alter_table = OFF")
+        cur.close()
+
+
+def migration_completion_bitmaps(db_connect):
+    """Migration 5: add the completion bitmaps and build them from the existing completions."""
+    db_connect.execute(COMPLETION_BITMAP_TABLE)
+    rebuild_completion_bitmaps(db_connect)
+
+
+def migration_index_last_completion(db_connect):
+    """Migration 6: index the last completion, so habits due in a period are found by a range seek."""
+    db_connect.execute("CREATE INDEX IF NOT EXISTS habit_last_completion ON habit(periodicity, last_completion)")
+
+
+def migration_completion_rollups(db_connect):
+    """Migration 7: add the completion rollups and build them from the existing completions."""
+    db_connect.execute(COMPLETION_ROLLUP_TABLE)
+    rebuild_rollups(db_connect)
+
+
+# Schema migrations in order; the database stores how many have run in PRAGMA user_version.
+# Only ever append to this list.
+MIGRATIONS = [
+    migration_create_schema,
+    migration_clean_habits,
+    migration_add_indexes,
+    migration_day_ordinals,
+    migration_completion_bitmaps,
+    migration_index_last_completion,
+    migration_completion_rollups,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def migrate(db_connect):
+    """
+    Bring the database up to SCHEMA_VERSION by running the migrations it hasn't run yet.
+
+    The version is only bumped after a migration has finished, and every migration is
+    idempotent, so an interrupted upgrade is simply repeated on the next start.
+
+    :param db_connect: Database connection object.
+    :return: the schema version the database was at before migrating.
+    """
+    version = db_connect.execute("PRAGMA user_version").fetchone()[0]
+    if version >= SCHEMA_VERSION:
+        return version
+
+    for number in range(version + 1, SCHEMA_VERSION + 1):
+        MIGRATIONS[number - 1](db_connect)
+        db_connect.commit()
+        db_connect.execute(f"PRAGMA user_version = {number}")
+        logger.debug("Migrated database to schema version %d", number)
+    return version
 
 
 def create_tables(db_connect):
     cur = db_connect.cursor()
 
-    cur.execute("""CREATE TABLE IF NOT EXISTS habit(    
-      name TEXT PRIMARY KEY,
-      periodicity TEXT
-      longest_run_streak INTEGER DEFAULT 0)""")
+    # The streak columns cache the run streaks of the completions, see add_completion_dates
+    cur.execute(HABIT_TABLE)
     db_connect.commit()
 
-    cur.execute("""CREATE TABLE IF NOT EXISTS tracker(
-    
-      completion_dates TEXT,
-      habit_name TEXT,
-      FOREIGN KEY(habit_name)REFERENCES habit(name))""")
+    cur.execute(COMPLETION_TABLE)
     db_connect.commit()
 
 
+def to_completion_date(value):
+    """
+    Normalize a completion date to the day ordinal stored in the completion table.
+
+    Habits are tracked per day, so the time of day is dropped.
+
+    :param value: datetime, date or ISO formatted string.
+    :return: the proleptic Gregorian day ordinal, e.g. 739342 for 2025-04-01.
+    """
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.strip())
+    return day_ordinal(value)
+
+
+def from_completion_date(day):
+    """
+    Convert a stored day ordinal back to the datetime (at midnight) returned by the API.
+
+    :param day: day ordinal as stored in the completion table.
+    :return: datetime object.
+    """
+    return datetime.fromordinal(day)
+
+
+def migrate_tracker_to_completion(db_connect):
+    """
+    Migrate a database created with the old schema in place.
+
+    The old schema keyed habits by name and stored all completions of a habit as one
+    comma-joined string in tracker.completion_dates. The habit table is rebuilt with an
+    integer id and every date is moved into its own completion row. Does nothing on a
+    database that already uses the new schema.
+
+    :param db_connect: Database connection object.
+    """
+    cur = db_connect.cursor()
+
+    cur.execute("PRAGMA table_info(habit)")
+    habit_columns = [column[1] for column in cur.fetchall()]
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'tracker'")
+    has_tracker = cur.fetchone() is not None
+
+    if "id" in habit_columns and not has_tracker:
+        return
+
+    # Keep foreign keys pointing at "habit" while the table is renamed
+    cur.execute("PRAGMA legacy_alter_table = ON")
+    cur.execute("BEGIN")
+    try:
+        if "id" not in habit_columns:
+            # Rebuild the habit table so completions can reference a stable integer id
+            cur.execute("ALTER TABLE habit RENAME TO habit_old")
+            cur.execute(HABIT_TABLE)
+            cur.execute("""INSERT INTO habit (name, periodicity, longest_run_streak)
+                           SELECT name, periodicity, COALESCE(longest_run_streak, 0) FROM habit_old""")
+            cur.execute("DROP TABLE habit_old")
+
+        if has_tracker:
+            rows = cur.execute("SELECT habit_name, completion_dates FROM tracker").fetchall()
+            for habit_name, completion_dates in rows:
+                if not completion_dates:
+                    continue
+                for date_str in completion_dates.split(','):
+                    try:
+                        completed_on = to_completion_date(date_str)
+                    except ValueError as e:
+                        logger.warning("Skipping invalid completion date '%s' for habit '%s': %s",
+                                       date_str, habit_name, e)
+                        continue
+                    cur.execute("""INSERT OR IGNORE INTO completion (habit_id, completed_on)
+                                   SELECT id, ? FROM habit WHERE name = ?""", (completed_on, habit_name))
+            cur.execute("DROP TABLE tracker")
+
+        db_connect.commit()
+    except Exception:
+        db_connect.rollback()
+        raise
+    finally:
+        cur.execute("PRAGMA legacy_alter_table = OFF")
+
+    # The streak cache of the migrated completions starts out empty
+    rebuild_streak_cache(db_connect)
+
+
+def add_streak_cache_columns(db_connect):
+    """
+    Add the current_run_streak and last_completion columns to the habit table if they don't exist.
+
+    The streak cache is filled from the existing completions when the columns are added.
+
+    :param db_connect: Database connection object.
+    """
+    cur = db_connect.cursor()
+
+    cur.execute("PRAGMA table_info(habit)")
+    column_names = [column[1] for column in cur.fetchall()]
+
+    if "current_run_streak" in column_names and "last_completion" in column_names:
+        return
+
+    if "current_run_streak" not in column_names:
+        cur.execute("ALTER TABLE habit ADD COLUMN current_run_streak INTEGER DEFAULT 0")
+    if "last_completion" not in column_names:
+        cur.execute("ALTER TABLE habit ADD COLUMN last_completion INTEGER")
+    db_connect.commit()
+
+    rebuild_streak_cache(db_connect)
+
+
+@timed
+def rebuild_streak_cache(db_connect, name=None, commit=True):
+    """
+    Recompute the cached streak columns from the full completion history.
+
+    Only needed when the cache cannot be maintained incrementally, e.g. after a schema
+    migration or a change of periodicity.
+
+    :param db_connect: Database connection object.
+    :param name: name of the habit to rebuild, or None to rebuild every habit.
+    :param commit: commit the update; pass False to keep it in the caller's transaction.
+    """
+    cur = db_connect.cursor()
+    if name is None:
+        cur.execute("SELECT id, periodicity FROM habit")
+    else:
+        cur.execute("SELECT id, periodicity FROM habit WHERE name = ?", (name,))
+    _rebuild_streaks(db_connect, dict(cur.fetchall()))
+    if commit:
+        db_connect.commit()
+    cur.close()
+
+
+def _rebuild_streaks(db_connect, periodicities):
+    """
+    Recompute the streak cache of the given habits without committing.
+
+    A handful of habits is read with one query each; for more, the whole completion table
+    is streamed once in primary key order.
+
+    :param db_connect: Database connection object.
+    :param periodicities: dict mapping habit id to periodicity.
+    """
+    if len(periodicities) > 100:
+        rows = db_connect.execute("SELECT habit_id, completed_on FROM completion ORDER BY habit_id, completed_on")
+    else:
+        rows = (row for habit_id in periodicities for row in db_connect.execute(
+            "SELECT habit_id, completed_on FROM completion WHERE habit_id = ? ORDER BY completed_on", (habit_id,)))
+
+    updates = {habit_id: (0, 0, None, habit_id) for habit_id in periodicities}
+    for habit_id, group in groupby(rows, key=itemgetter(0)):
+        periodicity = periodicities.get(habit_id)
+        if periodicity not in PERIODICITIES:
+            continue
+        days = [day for _, day in group]
+        if isinstance(days[0], str):  # Only while upgrading a database from before migration 4
+            days = [day_ordinal(day) for day in days]
+        periods = days if periodicity == "Daily" else [period_index(day, periodicity) for day in days]
+        longest_run_streak, current_run_streak = run_streaks(periods)
+        updates[habit_id] = (longest_run_streak, current_run_streak, days[-1], habit_id)
+
+    db_connect.executemany("""UPDATE habit SET longest_run_streak = ?, current_run_streak = ?, last_completion = ?
+                              WHERE id = ?""", list(updates.values()))
+
+
+@timed
+def rebuild_completion_bitmaps(db_connect, name=None, commit=True):
+    """
+    Recompute the completion bitmaps from the completion table.
+
+    :param db_connect: Database connection object.
+    :param name: name of the habit to rebuild, or None to rebuild every habit.
+    :param commit: commit the update; pass False to keep it in the caller's transaction.
+    """
+    if name is None:
+        habit_ids = [row[0] for row in db_connect.execute("SELECT id FROM habit")]
+    else:
+        habit_ids = [row[0] for row in db_connect.execute("SELECT id FROM habit WHERE name = ?", (name,))]
+    _rebuild_bitmaps(db_connect, habit_ids)
+    if commit:
+        db_connect.commit()
+
+
+def _get_bitmaps(db_connect, habit_ids):
+    """Return a dict mapping the given habit ids to their stored completion bitmap, for the habits that have one."""
+    rows = (row for habit_id in set(habit_ids) for row in db_connect.execute(
+        "SELECT habit_id, first_day, bits FROM completion_bitmap WHERE habit_id = ?", (habit_id,)))
+    return {habit_id: CompletionBitmap(first_day, bits) for habit_id, first_day, bits in rows}
+
+
+def _rebuild_bitmaps(db_connect, habit_ids):
+    """
+    Recompute the completion bitmaps of the given habit ids without committing.
+
+    :return: a dict mapping the habit ids with completions to their new CompletionBitmap.
+    """
+    habit_ids = set(habit_ids)
+    if len(habit_ids) > 100:
+        rows = db_connect.execute("SELECT habit_id, completed_on FROM completion ORDER BY habit_id, completed_on")
+    else:
+        rows = (row for habit_id in sorted(habit_ids) for row in db_connect.execute(
+            "SELECT habit_id, completed_on FROM completion WHERE habit_id = ? ORDER BY completed_on", (habit_id,)))
+
+    bitmaps = {}
+    for habit_id, group in groupby(rows, key=itemgetter(0)):
+        if habit_id in habit_ids:
+            bitmaps[habit_id] = CompletionBitmap.from_days(day for _, day in group)
+    db_connect.executemany("DELETE FROM completion_bitmap WHERE habit_id = ?", [(habit_id,) for habit_id in habit_ids])
+    db_connect.executemany("INSERT INTO completion_bitmap (habit_id, first_day, bits) VALUES (?, ?, ?)",
+                           [(habit_id, bitmap.first_day, bytes(bitmap.bits)) for habit_id, bitmap in bitmaps.items()])
+    return bitmaps
+
+
+def _update_bitmap(cur, habit_id, days):
+    """Set the bits of newly inserted completion days in the stored bitmap of a habit, and count them in the rollups."""
+    row = cur.execute("SELECT first_day, bits FROM completion_bitmap WHERE habit_id = ?", (habit_id,)).fetchone()
+    bitmap = CompletionBitmap(*row) if row else CompletionBitmap()
+    # The days are new, so they add to the completions of their buckets, and to the habits
+    # of a bucket the habit had no completion in yet
+    ordered = sorted(days)
+    # One statement adds the days, binding a row per day costs more than the upsert itself
+    cur.execute("""INSERT INTO completion_rollup (bucket, period, completions, habits)
+                   SELECT 'day', value, 1, 1 FROM json_each(?) WHERE true
+                   ON CONFLICT(bucket, period) DO UPDATE SET completions = completions + 1, habits = habits + 1""",
+                (json.dumps(ordered),))
+    rows = []
+    for bucket in BUCKETS[1:]:
+        counts = bucket_counts(ordered, bucket)
+        # The buckets the habit was already completed in, from one pass over the old days in range
+        start, end = bucket_start(next(iter(counts)), bucket), bucket_start(max(counts) + 1, bucket) - 1
+        completed = bucket_counts(bitmap.days(start, end), bucket)
+        rows.extend((bucket, period, count, int(period not in completed)) for period, count in counts.items())
+    _write_rollups(cur, rows)
+    bitmap.update(ordered)
+    cur.execute("""INSERT INTO completion_bitmap (habit_id, first_day, bits) VALUES (?, ?, ?)
+                   ON CONFLICT(habit_id) DO UPDATE SET first_day = excluded.first_day, bits = excluded.bits""",
+                (habit_id, bitmap.first_day, bytes(bitmap.bits)))
+
+
+@timed
+def rebuild_rollups(db_connect, name=None, commit=True):
+    """
+    Recompute the completion rollups from the completion table.
+
+    The share of a single habit is recounted together with its completion bitmap, which
+    the rollups are kept in step with.
+
+    :param db_connect: Database connection object.
+    :param name: name of the habit to rebuild, or None to rebuild every habit.
+    :param commit: commit the update; pass False to keep it in the caller's transaction.
+    """
+    if name is None:
+        db_connect.execute("DELETE FROM completion_rollup")
+        for bucket, counts in ROLLUP_SQL.items():
+            db_connect.execute(f"INSERT INTO completion_rollup (bucket, period, completions, habits) "
+                               f"SELECT ?, * FROM ({counts})", (bucket,))
+    else:
+        habit_ids = [row[0] for row in db_connect.execute("SELECT id FROM habit WHERE name = ?", (name,))]
+        old_bitmaps = _get_bitmaps(db_connect, habit_ids)
+        _update_rollups(db_connect, _rollup_changes(old_bitmaps, _rebuild_bitmaps(db_connect, habit_ids)))
+    if commit:
+        db_connect.commit()
+
+
+def _rollup_rows(bucket, old_days, new_days):
+    """
+    Rows (bucket, period, completions, habits) taking the completion days of a habit in the
+    rollups from old_days to new_days, both sorted day ordinals covering whole buckets.
+    """
+    old = bucket_counts(old_days, bucket)
+    new = bucket_counts(new_days, bucket)
+    return [(bucket, period, new.get(period, 0) - old.get(period, 0), (period in new) - (period in old))
+            for period in old.keys() | new.keys()]
+
+
+class _RollupCounts:
+    """Rollup rows counted in memory from whole completion histories, one habit at a time."""
+
+    def __init__(self):
+        # A day has as many habits as completions
+        self.days = Counter()
+        self.buckets = {bucket: (Counter(), Counter()) for bucket in BUCKETS[1:]}
+
+    def add(self, days):
+        """Count the completion days of a habit, sorted and distinct day ordinals."""
+        self.days.update(days)
+        for bucket, (completions, habits) in self.buckets.items():
+            counts = bucket_counts(days, bucket)
+            completions.update(counts)
+            habits.update(counts.keys())
+
+    def rows(self):
+        """The counts as (bucket, period, completions, habits) rows for _write_rollups."""
+        rows = [("day", day, count, count) for day, count in self.days.items()]
+        for bucket, (completions, habits) in self.buckets.items():
+            rows.extend((bucket, period, count, habits[period]) for period, count in completions.items())
+        return rows
+
+
+def _rollup_changes(old_bitmaps, new_bitmaps):
+    """Rows for _update_rollups from the completion bitmaps of habits before and after a change."""
+    rows = []
+    empty = CompletionBitmap()
+    for habit_id in old_bitmaps.keys() | new_bitmaps.keys():
+        old_days = list(old_bitmaps.get(habit_id, empty))
+        new_days = list(new_bitmaps.get(habit_id, empty))
+        for bucket in BUCKETS:
+            rows.extend(_rollup_rows(bucket, old_days, new_days))
+    return rows
+
+
+def _update_rollups(db_connect, rows):
+    """
+    Add (bucket, period, completions, habits) rows to the rollups without committing.
+
+    The rows of the same bucket are summed first, so every bucket is written once, and
+    buckets left without habits are removed.
+    """
+    changes = {}
+    for bucket, period, completions, habits in rows:
+        change = changes.setdefault((bucket, period), [0, 0])
+        change[0] += completions
+        change[1] += habits
+    _write_rollups(db_connect, [(*key, *change) for key, change in changes.items() if any(change)])
+
+
+def _write_rollups(db_connect, rows):
+    """
+    Add (bucket, period, completions, habits) rows, at most one per bucket, to the rollups
+    without committing, and remove the buckets left without habits.
+    """
+    db_connect.executemany("""INSERT INTO completion_rollup (bucket, period, completions, habits) VALUES (?, ?, ?, ?)
+                              ON CONFLICT(bucket, period) DO UPDATE SET
+                                completions = completions + excluded.completions, habits = habits + excluded.habits""",
+                           rows)
+    emptied = [(bucket, period) for bucket, period, completions, habits in rows if habits < 0]
+    if emptied:
+        db_connect.executemany("DELETE FROM completion_rollup WHERE bucket = ? AND period = ? AND habits <= 0",
+                               emptied)
+
+
 def add_longest_run_streak_column(db_connect):
     """
     Add the longest_run_streak column to the habit table if it doesn't exist.
@@ -82,6 +698,8 @@ def update_default_periodicity(db_connect, habit_data):
         if result and result[0] == "Daily":
             # Update the periodicity
             cur.execute('UPDATE habit SET periodicity = ? WHERE name = ?', (new_periodicity, habit_name))
+            if new_periodicity != "Daily":
+                rebuild_streak_cache(db_connect, habit_name)  # Streaks depend on the periodicity
             # Comment out the print statement
             # print(f"Updated periodicity for '{habit_name}' to '{new_periodicity}'.")
         else:
@@ -90,6 +708,8 @@ def update_default_periodicity(db_connect, habit_data):
 
             db_connect.commit()
 
+    _notify_write(db_connect, {habit_name for habit_name, new_periodicity in habit_data})
+
 
 def add_habit(db_connect, habit_data):
     """
@@ -113,25 +733,48 @@ def add_habit(db_connect, habit_data):
         if habit_name in ['Daily', 'Weekly']:
             raise ValueError(f"Habit names cannot be '{habit_name}'.")
 
+    # Look up the existing periodicity of all habits at once
+    names = [habit[0] if isinstance(habit, tuple) else habit for habit in habit_data]
+    existing = _get_periodicities(cur, names)
+
     # Process each habit
-    for habit in habit_data:
+    rows = []
+    changed_periodicity = []
+    for habit, habit_name in zip(habit_data, names):
         if isinstance(habit, tuple):
-            habit_name, periodicity = habit
+            periodicity = habit[1]
+            if habit_name in existing and existing[habit_name] != periodicity:
+                changed_periodicity.append(habit_name)
+        elif habit_name in existing:
+            periodicity = existing[habit_name]  # Use existing periodicity
         else:
-            habit_name = habit
-            # Look up existing periodicity for the habit (if it exists)
-            cur.execute('SELECT periodicity FROM habit WHERE name = ?', (habit_name,))
-            result = cur.fetchone()
-            if result:
-                periodicity = result[0]  # Use existing periodicity
-            else:
-                raise ValueError(f"Periodicity must be provided for new habit: {habit_name}")
+            raise ValueError(f"Periodicity must be provided for new habit: {habit_name}")
+        rows.append((habit_name, periodicity))
 
-        # Insert the habit with its periodicity
-        cur.execute('INSERT OR REPLACE INTO habit (name, periodicity) VALUES (?, ?)', (habit_name, periodicity))
+    # Insert the habits with their periodicity, keeping the id (and completions) of existing habits
+    cur.executemany("""INSERT INTO habit (name, periodicity) VALUES (?, ?)
+                       ON CONFLICT(name) DO UPDATE SET periodicity = excluded.periodicity""", rows)
 
     db_connect.commit()
 
+    # Streaks depend on the periodicity
+    for habit_name in changed_periodicity:
+        rebuild_streak_cache(db_connect, habit_name)
+
+    _notify_write(db_connect, set(names))
+
+
+def _get_periodicities(cur, names):
+    """Return a dict mapping each of the names that exists in the habit table to its periodicity."""
+    names = list(dict.fromkeys(names))
+    existing = {}
+    # Stay well below SQLite's limit on the number of query parameters
+    for start in range(0, len(names), 500):
+        chunk = names[start:start + 500]
+        cur.execute(f"SELECT name, periodicity FROM habit WHERE name IN ({', '.join('?' * len(chunk))})", chunk)
+        existing.update(cur.fetchall())
+    return existing
+
 
 def add_habit_with_periodicity(db_connect, habit_data):
     """
@@ -146,10 +789,314 @@ def add_habit_with_periodicity(db_connect, habit_data):
             raise ValueError(f"Habit names cannot be '{habit_name}'.")
         if not periodicity:
             raise ValueError(f"Periodicity cannot be None for habit '{habit_name}'.")
+    # Only the habits that are actually inserted change what the caches hold
+    inserted = set()
+    for habit_name, periodicity in habit_data:
         cur.execute('INSERT OR IGNORE INTO habit (name, periodicity) VALUES (?, ?)', (habit_name, periodicity))
+        if cur.rowcount:
+            inserted.add(habit_name)
+    db_connect.commit()
+    cur.close()
+    if inserted:
+        _notify_write(db_connect, inserted)
+
+
+def _chunks(iterable, chunk_size):
+    """Yield lists of up to chunk_size items from any iterable without materializing it."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+@timed
+def add_habits_bulk(db_connect, habits, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert any number of habits with one executemany and one commit per chunk.
+
+    Habits that already exist are left unchanged.
+
+    :param db_connect: Database connection object
+    :param habits: iterable of (habit_name, periodicity) tuples, e.g. a generator.
+    :param chunk_size: number of habits written per transaction.
+    :return: the number of habits added.
+    """
+    cur = db_connect.cursor()
+    added = 0
+    for chunk in _chunks(habits, chunk_size):
+        for habit_name, periodicity in chunk:
+            if habit_name in ['Daily', 'Weekly']:
+                raise ValueError(f"Habit names cannot be '{habit_name}'.")
+            if periodicity not in PERIODICITIES:
+                raise ValueError(f"Invalid periodicity '{periodicity}' for habit '{habit_name}'.")
+        changes = db_connect.total_changes
+        cur.executemany('INSERT OR IGNORE INTO habit (name, periodicity) VALUES (?, ?)', chunk)
+        added += db_connect.total_changes - changes
+        db_connect.commit()
+        _notify_write(db_connect, {habit_name for habit_name, periodicity in chunk})
+    cur.close()
+    return added
+
+
+@timed
+def add_completions_bulk(db_connect, completions, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert any number of completions with one executemany and one commit per chunk.
+
+    Completions that are already recorded are skipped. The streak cache of every habit
+    that received completions is rebuilt once at the end, which is much cheaper than
+    maintaining it row by row for large imports. A chunk is checked before any of it is
+    written; if one fails, the chunks committed before it keep their completions and the
+    caches of their habits are still rebuilt before the error is raised.
+
+    :param db_connect: Database connection object
+    :param completions: iterable of (habit_name, date) tuples, e.g. a generator. Dates can
+                        be datetime, date or ISO formatted strings.
+    :param chunk_size: number of completions written per transaction.
+    :return: the number of completions added.
+    """
+    cur = db_connect.cursor()
+    cur.execute("SELECT name, id FROM habit")
+    habit_ids = dict(cur.fetchall())
+
+    # Most completions share a handful of dates, normalize each date only once
+    normalized = {}
+    touched = set()
+    added = 0
+    try:
+        for chunk in _chunks(completions, chunk_size):
+            rows = []
+            for habit_name, date in chunk:
+                habit_id = habit_ids.get(habit_name)
+                if habit_id is None:
+                    raise ValueError(f"Habit '{habit_name}' does not exist.")
+                completed_on = normalized.get(date)
+                if completed_on is None:
+                    completed_on = normalized[date] = to_completion_date(date)
+                rows.append((habit_id, completed_on))
+            added += _insert_completions(cur, rows)
+            db_connect.commit()
+            touched.update(habit_id for habit_id, completed_on in rows)
+            _notify_write(db_connect, {habit_name for habit_name, date in chunk}, habits_changed=False)
+    except BaseException:
+        db_connect.rollback()
+        raise
+    finally:
+        _rebuild_touched(db_connect, touched)
+        cur.close()
+    return added
+
+
+@timed
+def add_history_bulk(db_connect, records, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Insert habits together with their completions, one commit per chunk.
+
+    This is the import counterpart of iter_history: habits are created the first time
+    they appear, so a single pass over the records is enough. Habits that already exist
+    keep their periodicity and completions that are already recorded are skipped. A chunk
+    is checked before any of it is written; if one fails, the chunks committed before it
+    stay and the caches of their habits are rebuilt before the error is raised.
+
+    :param db_connect: Database connection object
+    :param records: iterable of (habit_name, periodicity, date) tuples, e.g. a generator.
+                    The date is None for a habit without completions.
+    :param chunk_size: number of records written per transaction.
+    :return: a tuple (habits_added, completions_added).
+    """
+    cur = db_connect.cursor()
+    cur.execute("SELECT name, id FROM habit")
+    habit_ids = dict(cur.fetchall())
+
+    normalized = {}
+    touched = set()
+    habits_added = completions_added = 0
+    try:
+        for chunk in _chunks(records, chunk_size):
+            new_habits = {}
+            completed = []
+            for habit_name, periodicity, date in chunk:
+                if habit_name not in habit_ids and habit_name not in new_habits:
+                    if habit_name in ['Daily', 'Weekly']:
+                        raise ValueError(f"Habit names cannot be '{habit_name}'.")
+                    if periodicity not in PERIODICITIES:
+                        raise ValueError(f"Invalid periodicity '{periodicity}' for habit '{habit_name}'.")
+                    new_habits[habit_name] = periodicity
+                if date is not None:
+                    completed_on = normalized.get(date)
+                    if completed_on is None:
+                        completed_on = normalized[date] = to_completion_date(date)
+                    completed.append((habit_name, completed_on))
+
+            if new_habits:
+                changes = db_connect.total_changes
+                cur.executemany('INSERT OR IGNORE INTO habit (name, periodicity) VALUES (?, ?)', new_habits.items())
+                habits_added += db_connect.total_changes - changes
+                for habit_name in new_habits:
+                    habit_ids[habit_name] = cur.execute("SELECT id FROM habit WHERE name = ?",
+                                                        (habit_name,)).fetchone()[0]
+            rows = [(habit_ids[habit_name], completed_on) for habit_name, completed_on in completed]
+            completions_added += _insert_completions(cur, rows)
+            db_connect.commit()
+            touched.update(habit_id for habit_id, completed_on in rows)
+            _notify_write(db_connect, {habit_name for habit_name, periodicity, date in chunk}, bool(new_habits))
+    except BaseException:
+        db_connect.rollback()
+        raise
+    finally:
+        _rebuild_touched(db_connect, touched)
+        cur.close()
+    return habits_added, completions_added
+
+
+@timed
+def add_history_days(db_connect, histories):
+    """
+    Insert new habits with their completions in a single transaction.
+
+    The fast path for generated data (see datagen): every habit arrives with all of its
+    completions as day ordinals, so its streak cache, bitmap and rollups are computed on the way in
+    instead of reading the completion table back. Nothing is committed if a habit fails.
+
+    :param db_connect: Database connection object
+    :param histories: iterable of (habit_name, periodicity, days) tuples, e.g. a generator.
+                      days is a sequence of day ordinals in any order, inserted in that order.
+    :return: a tuple (habits_added, completions_added).
+    """
+    cur = db_connect.cursor()
+    existing = {row[0] for row in cur.execute("SELECT name FROM habit")}
+    names = set()
+    habits_added = completions_added = 0
+    # The rollup counts of all habits, written once at the end
+    rollups = _RollupCounts()
+    if not db_connect.in_transaction:
+        cur.execute("BEGIN")
+    try:
+        for habit_name, periodicity, days in histories:
+            if habit_name in ['Daily', 'Weekly']:
+                raise ValueError(f"Habit names cannot be '{habit_name}'.")
+            if periodicity not in PERIODICITIES:
+                raise ValueError(f"Invalid periodicity '{periodicity}' for habit '{habit_name}'.")
+            if habit_name in existing or habit_name in names:
+                raise ValueError(f"Habit '{habit_name}' already exists.")
+            names.add(habit_name)
+
+            ordered = sorted(set(days))
+            periods = ordered if periodicity == "Daily" else [period_index(day, periodicity) for day in ordered]
+            longest_run_streak, current_run_streak = run_streaks(periods)
+            cur.execute("""INSERT INTO habit (name, periodicity, longest_run_streak, current_run_streak,
+                                             last_completion) VALUES (?, ?, ?, ?, ?)""",
+                        (habit_name, periodicity, longest_run_streak, current_run_streak,
+                         ordered[-1] if ordered else None))
+            habit_id = cur.lastrowid
+            habits_added += 1
+            if not ordered:
+                continue
+            cur.executemany("INSERT OR IGNORE INTO completion (habit_id, completed_on) VALUES (?, ?)",
+                            zip(repeat(habit_id), days))
+            completions_added += len(ordered)
+            bitmap = CompletionBitmap.from_days(ordered)
+            cur.execute("INSERT INTO completion_bitmap (habit_id, first_day, bits) VALUES (?, ?, ?)",
+                        (habit_id, bitmap.first_day, bytes(bitmap.bits)))
+            rollups.add(ordered)
+        _write_rollups(cur, rollups.rows())
+        db_connect.commit()
+    except BaseException:
+        db_connect.rollback()
+        raise
+    finally:
+        cur.close()
+    _notify_write(db_connect, names)
+    return habits_added, completions_added
+
+
+def _insert_completions(cur, rows):
+    """Insert (habit_id, completed_on) rows, skipping recorded ones, and return the number added."""
+    # Inserting in primary key order keeps the B-tree writes local
+    rows.sort()
+    changes = cur.connection.total_changes
+    cur.executemany("INSERT OR IGNORE INTO completion (habit_id, completed_on) VALUES (?, ?)", rows)
+    return cur.connection.total_changes - changes
+
+
+def _rebuild_touched(db_connect, touched):
+    """Rebuild and commit the streak cache, completion bitmaps and rollups of the given habit ids."""
+    if not touched:
+        return
+    rows = db_connect.execute("SELECT id, periodicity FROM habit").fetchall()
+    periodicities = {habit_id: periodicity for habit_id, periodicity in rows if habit_id in touched}
+    if len(touched) > 100:
+        # One pass over the whole completion table beats reading this many histories one by one
+        _recount_completions(db_connect, periodicities)
+    else:
+        _rebuild_streaks(db_connect, periodicities)
+        old_bitmaps = _get_bitmaps(db_connect, touched)
+        _update_rollups(db_connect, _rollup_changes(old_bitmaps, _rebuild_bitmaps(db_connect, touched)))
     db_connect.commit()
 
 
+def _recount_completions(db_connect, periodicities):
+    """
+    Recompute the streak cache and completion bitmaps of the given habits, and the rollups of
+    all habits, without committing, from one pass over the completion table.
+
+    :param db_connect: Database connection object.
+    :param periodicities: dict mapping habit id to periodicity.
+    """
+    streaks = {habit_id: (0, 0, None, habit_id) for habit_id in periodicities}
+    bitmaps = []
+    rollups = _RollupCounts()
+    # Each habit arrives as one JSON array, which is parsed much faster than a row per completion
+    for habit_id, days in db_connect.execute("""SELECT habit_id, json_group_array(completed_on) FROM completion
+                                                GROUP BY habit_id"""):
+        days = sorted(json.loads(days))
+        rollups.add(days)
+        if habit_id not in periodicities:
+            continue
+        periodicity = periodicities[habit_id]
+        if periodicity in PERIODICITIES:
+            periods = days if periodicity == "Daily" else [period_index(day, periodicity) for day in days]
+            streaks[habit_id] = (*run_streaks(periods), days[-1], habit_id)
+        bitmap = CompletionBitmap.from_days(days)
+        bitmaps.append((habit_id, bitmap.first_day, bytes(bitmap.bits)))
+
+    db_connect.executemany("""UPDATE habit SET longest_run_streak = ?, current_run_streak = ?, last_completion = ?
+                              WHERE id = ?""", list(streaks.values()))
+    db_connect.executemany("DELETE FROM completion_bitmap WHERE habit_id = ?",
+                           [(habit_id,) for habit_id in periodicities])
+    db_connect.executemany("INSERT INTO completion_bitmap (habit_id, first_day, bits) VALUES (?, ?, ?)", bitmaps)
+    db_connect.execute("DELETE FROM completion_rollup")
+    _write_rollups(db_connect, rollups.rows())
+
+
+def iter_history(db_connect, batch_size=1000):
+    """
+    Stream every habit with its completions, ordered by habit and date.
+
+    Rows are fetched from the open cursor batch_size at a time, so the memory use does not
+    grow with the size of the database.
+
+    :param db_connect: Database connection object
+    :param batch_size: number of rows fetched from SQLite at a time.
+    :return: a generator of (habit_name, periodicity, date) tuples with the date as an ISO
+             formatted string (YYYY-MM-DD), or None for a habit without completions.
+    """
+    cur = db_connect.execute("""SELECT h.name, h.periodicity, c.completed_on
+                                FROM habit h LEFT JOIN completion c ON c.habit_id = h.id
+                                ORDER BY h.id, c.completed_on""")
+    try:
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                return
+            for habit_name, periodicity, completed_on in rows:
+                yield habit_name, periodicity, date.fromordinal(completed_on).isoformat() if completed_on else None
+    finally:
+        cur.close()
+
+
 def fix_null_periodicity(db_connect):
     """
     Set a default periodicity ('Daily') for habits where periodicity is NULL.
@@ -159,7 +1106,11 @@ def fix_null_periodicity(db_connect):
 
     cur = db_connect.cursor()
     cur.execute("UPDATE habit SET periodicity = 'Daily' WHERE periodicity IS NULL")
+    fixed = cur.rowcount
     db_connect.commit()
+    if fixed:
+        rebuild_streak_cache(db_connect)  # Streaks depend on the periodicity
+        _notify_write(db_connect)
     #  print("Fixed NULL periodicity values in the database.")  # This line is commented out
 
 
@@ -169,62 +1120,194 @@ def get_habit(db_connect, habit_name):
     return cur.fetchone()
 
 
-def add_completion_dates(db_connect, name, completion_dates):
+@timed
+def add_completion_dates(db_connect, name, completion_dates, commit=True):
+    """
+    Record completion dates of a habit and update its streak cache.
+
+    :param db_connect: Database connection object.
+    :param name: name of the habit.
+    :param completion_dates: datetime, or a list of datetime, date or ISO formatted strings.
+    :param commit: commit the completions; pass False to keep them in the caller's
+                   transaction, e.g. to check off many habits at once.
+    """
     # Ensure db is a valid SQLite connection
-    if not isinstance(db_connect, sqlite3.Connection):
-        raise TypeError("Expected a sqlite3.Connection object")
+    if not isinstance(db_connect, CONNECTION_TYPES):
+        raise TypeError("Expected a sqlite3.Connection or ConnectionPool object")
 
     # Normalize the completion_dates to a list if it's a single datetime object
     if isinstance(completion_dates, datetime):
         completion_dates = [completion_dates]
 
+    # Normalize the dates before taking the write lock, so a bad date raises without leaving
+    # the transaction open
+    dates = sorted({to_completion_date(date) for date in completion_dates})
+
     # Create a cursor object
     cur = db_connect.cursor()
 
-    # Check for existing completion dates for the specified habit
-    cur.execute("SELECT completion_dates FROM tracker WHERE habit_name = ?", (name,))
-    existing_dates_row = cur.fetchone()  # Fetch existing completion dates
+    # Take the write lock before reading the cached streaks, so concurrent writers to the
+    # same habit (e.g. threads sharing a ConnectionPool) don't update from a stale cache
+    began = not db_connect.in_transaction
+    if began:
+        cur.execute("BEGIN IMMEDIATE")
+
+    try:
+        # Look up the id the completions are stored under and the cached streaks
+        cur.execute("""SELECT id, periodicity, longest_run_streak, current_run_streak, last_completion
+                       FROM habit WHERE name = ?""", (name,))
+        habit_row = cur.fetchone()
+        if habit_row is None:
+            raise ValueError(f"Habit '{name}' does not exist.")
+        habit_id, periodicity, longest_run_streak, current_run_streak, last_completion = habit_row
+        streak = [longest_run_streak or 0, current_run_streak or 0, last_completion]
+
+        # Dates after the last completion are new and extend the streaks in O(1) each, so they
+        # are inserted with one executemany. Backfilled dates may already exist and need a
+        # bounded look at their neighbours, so they are inserted one by one first.
+        backfilled = [date for date in dates if last_completion is not None and date <= last_completion]
+        appended = dates[len(backfilled):]
+
+        added = []
+        for completed_on in backfilled:
+            cur.execute("INSERT OR IGNORE INTO completion (habit_id, completed_on) VALUES (?, ?)",
+                        (habit_id, completed_on))
+            if cur.rowcount:
+                added.append(completed_on)
+                update_streak_cache(db_connect, habit_id, periodicity, streak, completed_on)
+            else:
+                logger.debug("Duplicate date: %s already exists for habit '%s'.", date.fromordinal(completed_on), name)
+
+        cur.executemany("INSERT OR IGNORE INTO completion (habit_id, completed_on) VALUES (?, ?)",
+                        [(habit_id, completed_on) for completed_on in appended])
+        extend_streak_cache(streak, periodicity, appended)
+        added.extend(appended)
+
+        if added:
+            cur.execute("""UPDATE habit SET longest_run_streak = ?, current_run_streak = ?, last_completion = ?
+                           WHERE id = ?""", (*streak, habit_id))
+            _update_bitmap(cur, habit_id, added)
+            if logger.isEnabledFor(logging.DEBUG):
+                for completed_on in added:
+                    logger.debug("Added completion date for '%s': %s", name, date.fromordinal(completed_on))
+        else:
+            logger.debug("No new dates to add for habit '%s'.", name)
 
-    # Convert existing dates to a set of date objects for comparison
-    if existing_dates_row and existing_dates_row[0]:
-        existing_dates = set(existing_dates_row[0].split(','))
-    else:
-        existing_dates = set()
+        if commit:
+            db_connect.commit()
+    except BaseException:
+        # Don't leave the write lock taken above held on the connection
+        if began:
+            db_connect.rollback()
+        raise
+    finally:
+        cur.close()
 
-    # Initialize a list to hold new dates to insert
-    new_dates = []
+    if added:
+        _notify_write(db_connect, {name}, habits_changed=False)
 
-    # Check for duplicates and prepare new dates for insertion
-    for date in completion_dates:
-        normalized_date = date.date()  # Normalize to date only
-        if normalized_date not in existing_dates:
-            new_dates.append(date.isoformat())
-            print(f"Added completion date for '{name}': {normalized_date.isoformat()}")
-        else:
-            print(f"Duplicate date: {normalized_date.isoformat()} already exists for habit '{name}'.")
 
-    if new_dates:
-        # Combine existing and new dates
-        all_dates = existing_dates.union(new_dates)  # Combine sets to avoid duplicates
-        updated_dates = ','.join(sorted(all_dates))  # Sort and join dates
+def update_streak_cache(db_connect, habit_id, periodicity, streak, completed_on):
+    """
+    Update the cached streaks of a habit for one newly inserted completion.
 
-        # Insert or update the completion_dates in the database
-        if existing_dates_row:
+    A completion in the period after the last one extends the current run in O(1). A
+    backfilled completion only re-reads the runs directly before and after its period.
 
-            # Update the completion_dates in the database
-            cur.execute("UPDATE tracker SET completion_dates = ? WHERE habit_name = ?",
-                        (updated_dates, name))
-        else:
-            # Insert a new row
-            cur.execute("INSERT INTO tracker (completion_dates, habit_name) VALUES (?, ?)",
-                        (updated_dates, name))
+    :param db_connect: Database connection object.
+    :param habit_id: id of the habit, the completion must already be inserted.
+    :param periodicity: periodicity of the habit.
+    :param streak: list [longest_run_streak, current_run_streak, last_completion], updated in place.
+    :param completed_on: the inserted completion as stored in the completion table.
+    """
+    longest_run_streak, current_run_streak, last_completion = streak
+    period = period_index(completed_on, periodicity)
+
+    if last_completion is None:
+        streak[:] = [max(longest_run_streak, 1), 1, completed_on]
+        return
+
+    last_period = period_index(last_completion, periodicity)
+    if period == last_period:
+        # Another completion in the period already counted
+        streak[2] = max(last_completion, completed_on)
+    elif period == last_period + 1:
+        streak[:] = [max(longest_run_streak, current_run_streak + 1), current_run_streak + 1, completed_on]
+    elif period > last_period:
+        streak[:] = [max(longest_run_streak, 1), 1, completed_on]
     else:
-        print(f"No new dates to add for habit '{name}'.")
+        before = _adjacent_run(db_connect, habit_id, periodicity, completed_on, period, backwards=True)
+        after = _adjacent_run(db_connect, habit_id, periodicity, completed_on, period, backwards=False)
+        if before is None or after is None:
+            return
+        run = before + 1 + after
+        streak[0] = max(longest_run_streak, run)
+        if period + after == last_period:
+            streak[1] = run
 
-    db_connect.commit()
 
-    # Close the cursor
-    cur.close()
+def extend_streak_cache(streak, periodicity, days):
+    """
+    Update the cached streaks of a habit for completions after its last one.
+
+    The same as update_streak_cache for each day in turn, without the function call per day.
+
+    :param streak: list [longest_run_streak, current_run_streak, last_completion], updated in place.
+    :param periodicity: periodicity of the habit.
+    :param days: the new completions as stored in the completion table, sorted and all after
+                 last_completion.
+    """
+    if not days:
+        return
+    longest_run_streak, current_run_streak, last_completion = streak
+    last_period = period_index(last_completion, periodicity) if last_completion is not None else None
+    for day in days:
+        period = period_index(day, periodicity)
+        if period == last_period:
+            continue
+        current_run_streak = current_run_streak + 1 if last_period is not None and period == last_period + 1 else 1
+        if current_run_streak > longest_run_streak:
+            longest_run_streak = current_run_streak
+        last_period = period
+    streak[:] = [longest_run_streak, current_run_streak, days[-1]]
+
+
+def _adjacent_run(db_connect, habit_id, periodicity, completed_on, period, backwards):
+    """
+    Count the consecutive periods directly before or after a period.
+
+    Reads completions outward from completed_on and stops at the first gap, so the cost is
+    bounded by the length of the adjacent run rather than the whole history.
+
+    :return: the number of consecutive periods, or None if another completion already
+             falls in the same period.
+    """
+    if backwards:
+        query = """SELECT completed_on FROM completion WHERE habit_id = ? AND completed_on < ?
+                   ORDER BY completed_on DESC"""
+        step = -1
+    else:
+        query = """SELECT completed_on FROM completion WHERE habit_id = ? AND completed_on > ?
+                   ORDER BY completed_on"""
+        step = 1
+
+    cur = db_connect.execute(query, (habit_id, completed_on))
+    run = 0
+    expected = period
+    try:
+        for (day,) in cur:
+            other = period_index(day, periodicity)
+            if other == expected:
+                if other == period:
+                    return None
+                continue
+            if other != expected + step:
+                break
+            run += 1
+            expected = other
+    finally:
+        cur.close()
+    return run
 
 
 def check_database_content(db_connect):
@@ -236,8 +1319,8 @@ def check_database_content(db_connect):
     # Create a list of habits from the fetched rows
     habits = [row[0] for row in rows]
 
-    # Print the habits for debugging purposes
-    print("Current habits in the database:", habits)
+    # Log the habits for debugging purposes
+    logger.debug("Current habits in the database: %s", habits)
 
     # Return the list of habits
     return habits
@@ -256,12 +1339,18 @@ def delete_invalid_habits(db_connect):
 
     # Commit the changes
     db_connect.commit()
+    _notify_write(db_connect, {"Daily", "Weekly"})
     # Comment out the print statement
     # print("Invalid habits 'Daily' and 'Weekly' have been deleted.")
 
 
 def input_data_database(db_connect):
-    """Populate the database with completion dates."""
+    """
+    Populate the database with the demo habits and their completion dates.
+
+    Everything is written in a single transaction. Existing habits keep their id, and
+    completion dates that are already recorded are skipped.
+    """
 
     habit_info = [
         ("Medication", "Weekly", [datetime(2025, 4, d, 0, 0) for d in [1, 8, 15, 22]]),
@@ -274,9 +1363,25 @@ def input_data_database(db_connect):
         ("Study", "Daily", [datetime(2025, 4, d, 0, 0) for d in range(1, 31) if d not in
                             [6, 11, 25]])
     ]
-    for name, periodicity, dates in habit_info:
-        add_habit(db_connect, [(name, periodicity)])
-        add_completion_dates(db_connect, name, dates)
+    cur = db_connect.cursor()
+    try:
+        cur.executemany("""INSERT INTO habit (name, periodicity) VALUES (?, ?)
+                           ON CONFLICT(name) DO UPDATE SET periodicity = excluded.periodicity""",
+                        [(name, periodicity) for name, periodicity, dates in habit_info])
+        cur.executemany("""INSERT OR IGNORE INTO completion (habit_id, completed_on)
+                           SELECT id, ? FROM habit WHERE name = ?""",
+                        [(to_completion_date(date), name) for name, periodicity, dates in habit_info
+                         for date in dates])
+        for name, periodicity, dates in habit_info:
+            rebuild_streak_cache(db_connect, name, commit=False)
+            rebuild_rollups(db_connect, name, commit=False)  # Also rebuilds the completion bitmap
+        db_connect.commit()
+    except Exception:
+        db_connect.rollback()
+        raise
+    finally:
+        cur.close()
+    _notify_write(db_connect, {name for name, periodicity, dates in habit_info})
 
 
 def get_habits_by_periodicity(db_connect, periodicity):
@@ -288,8 +1393,8 @@ def get_habits_by_periodicity(db_connect, periodicity):
     :return: a list of habit names with the specified periodicity
     """
     # Ensure db is a valid SQLite connection
-    if not isinstance(db_connect, sqlite3.Connection):
-        raise TypeError("Expected a sqlite3.Connection object")
+    if not isinstance(db_connect, CONNECTION_TYPES):
+        raise TypeError("Expected a sqlite3.Connection or ConnectionPool object")
 
     # Prepare and execute the SQL query to get habits by periodicity
     cur = db_connect.cursor()
@@ -314,8 +1419,8 @@ def validate_periodicity(periodicity):
     if periodicity not in valid_periodicity:
         raise ValueError(f"Invalid periodicity '{periodicity}'. Use one of {valid_periodicity}.")
 
-    # Print confirmation message if the periodicity is valid
-    print(f"Periodicity '{periodicity}' is valid.")
+    # Log confirmation message if the periodicity is valid
+    logger.debug("Periodicity '%s' is valid.", periodicity)
     return True  # Optionally return True to indicate valid periodicity
 
 
@@ -326,53 +1431,48 @@ def get_habit_periodicity(db_connect, habit_name):
     return result[0] if result else None
 
 
-def get_current_habits(db_connect):
+@timed
+def load_habit_days(db_connect):
     """
-    Fetch the current habits from the database as a list of Habit objects.
+    Load every habit together with its completion days in a single query.
+
+    The completions of each habit are grouped into one comma-joined string by SQLite and
+    the rows are streamed through the cursor, so every habit is read in one pass without a
+    query per habit. habit.load_habits turns the rows into Habit objects.
 
     :param db_connect: The database connection object.
-    :return: A list of Habit objects.
+    :return: A list of (name, periodicity, days) tuples in id order, days being an
+             array('i') of the day ordinals of the completions, oldest first.
     """
-    # Ensure db_connect is a valid SQLite connection
-    if not isinstance(db_connect, sqlite3.Connection):
-        raise TypeError("Expected a sqlite3.Connection object")
-
     cur = db_connect.cursor()
+    cur.execute("""SELECT h.name, h.periodicity,
+                     (SELECT group_concat(completed_on) FROM
+                       (SELECT completed_on FROM completion WHERE habit_id = h.id ORDER BY completed_on))
+                   FROM habit h ORDER BY h.id""")
 
-    # Execute the query to select habit names and periodicity from the 'habit' table
-    cur.execute("SELECT name, periodicity FROM habit")
-
-    # Fetch all rows as tuples (name, periodicity)
-    habits_data = cur.fetchall()
-
-    # Filter out invalid habit names
-    invalid_habit_names = ["Daily", "Weekly"]
-    valid_habits_data = [
-        (name, periodicity) for name, periodicity in habits_data
-        if name not in invalid_habit_names
-    ]
-
-    # Import Habit class locally
-    from habit import Habit
-
-    # Convert the list of tuples into a list of Habit objects with completion dates
-    current_habits = []
-    for name, periodicity in valid_habits_data:
-        # Retrieve completion dates for the habit
-        completion_dates = get_completion_dates(db_connect, name)
-        if completion_dates is not None:
-            # Create a Habit object with the retrieved data
-            habit = Habit(name, periodicity, db_connect)
-            habit.completion_dates = completion_dates
-            current_habits.append(habit)
+    habit_days = []
+    for name, periodicity, completion_days in cur:
+        # The day ordinals go straight into an array, no datetime is created
+        days = array('i', map(int, completion_days.split(','))) if completion_days else array('i')
+        habit_days.append((name, periodicity, days))
 
-    return current_habits
+    cur.close()
+    return habit_days
 
 
 def edit_habit(db_connect, name, new_name=None, new_periodicity=None):
     """
     Edit an existing habit in the database.
+
+    :raises ValueError: if the habit doesn't exist, new_name is taken by another habit or
+                        new_periodicity is not a valid periodicity.
     """
+    if new_periodicity and new_periodicity not in PERIODICITIES:
+        raise ValueError(f"Invalid periodicity: '{new_periodicity}'. Expected 'Daily' or 'Weekly'.")
+    if get_habit(db_connect, name) is None:
+        raise ValueError(f"Habit '{name}' does not exist.")
+    if new_name and new_name != name and get_habit(db_connect, new_name) is not None:
+        raise ValueError(f"Habit '{new_name}' already exists.")
     cur = db_connect.cursor()
     if new_periodicity:
         cur.execute("UPDATE habit SET periodicity = ? WHERE name = ?", (new_periodicity, name))
@@ -381,18 +1481,366 @@ def edit_habit(db_connect, name, new_name=None, new_periodicity=None):
     db_connect.commit()
     cur.close()
 
+    if new_periodicity:
+        rebuild_streak_cache(db_connect, new_name or name)  # Streaks depend on the periodicity
+
+    _notify_write(db_connect, {name, new_name} - {None})
 
-def delete_habit(db_connect, name):
+
+def get_streak_cache(db_connect, name):
     """
-    Delete a habit from the database.
+    Retrieve the cached streaks of a habit.
+
+    :param db_connect: Database connection object.
+    :param name: name of the habit.
+    :return: a tuple (longest_run_streak, current_run_streak, last_completion), or None if
+             the habit doesn't exist. current_run_streak is the run ending at last_completion,
+             an ISO formatted string.
     """
     cur = db_connect.cursor()
-    cur.execute("DELETE FROM habit WHERE name = ?", (name,))
-    cur.execute("DELETE FROM tracker WHERE habit_name = ?", (name,))  # Delete associated completion dates
+    cur.execute("SELECT longest_run_streak, current_run_streak, last_completion FROM habit WHERE name = ?",
+                (name,))
+    result = cur.fetchone()
+    cur.close()
+    if result is None:
+        return None
+    longest_run_streak, current_run_streak, last_completion = result
+    if last_completion is not None:
+        last_completion = from_completion_date(last_completion).isoformat()
+    return longest_run_streak, current_run_streak, last_completion
+
+
+def _today(today):
+    return day_ordinal(today if today is not None else date.today())
+
+
+def get_streak_status(db_connect, today=None):
+    """
+    Retrieve the live streak of every habit from the streak cache, in one query.
+
+    :param db_connect: Database connection object.
+    :param today: the day to evaluate the streaks on (datetime, date, ISO string or day
+                  ordinal), today by default.
+    :return: a list of streaks.StreakStatus, one per habit with a valid periodicity.
+    """
+    return [status for status, longest_run_streak, last_completion in get_streak_details(db_connect, today)]
+
+
+def get_streak_details(db_connect, today=None):
+    """
+    Retrieve the live streak of every habit together with the rest of its streak cache, in one query.
+
+    :param db_connect: Database connection object.
+    :param today: see get_streak_status.
+    :return: a list of tuples (StreakStatus, longest_run_streak, last_completion), one per
+             habit with a valid periodicity; last_completion is formatted as by get_streak_cache.
+    """
+    today = _today(today)
+    cur = db_connect.execute("""SELECT name, periodicity, current_run_streak, last_completion, longest_run_streak
+                                FROM habit ORDER BY id""")
+    details = [(streak_status(name, periodicity, current_run_streak, last_completion, today), longest_run_streak,
+                from_completion_date(last_completion).isoformat() if last_completion is not None else None)
+               for name, periodicity, current_run_streak, last_completion, longest_run_streak in cur
+               if periodicity in PERIODICITIES]
+    cur.close()
+    return details
+
+
+def get_at_risk_habits(db_connect, today=None):
+    """
+    Retrieve the habits whose streak breaks at the end of the current period unless completed.
+
+    These are the habits last completed in the previous period. Both periodicities are
+    answered by a range seek on the habit_last_completion index.
+
+    :param db_connect: Database connection object.
+    :param today: see get_streak_status.
+    :return: a list of streaks.StreakStatus, soonest deadline first.
+    """
+    today = _today(today)
+    # The previous period ends the day before the current one starts
+    day_before = today - 1
+    week_before = period_end(today, "Weekly") - 7
+    cur = db_connect.execute("""SELECT name, periodicity, current_run_streak, last_completion FROM habit
+                                WHERE periodicity = 'Daily' AND last_completion = ?
+                                UNION ALL
+                                SELECT name, periodicity, current_run_streak, last_completion FROM habit
+                                WHERE periodicity = 'Weekly' AND last_completion BETWEEN ? AND ?""",
+                             (day_before, week_before - 6, week_before))
+    statuses = [streak_status(*row, today) for row in cur]
+    cur.close()
+    statuses.sort(key=lambda status: status.days_remaining)
+    return statuses
+
+
+def get_completion_bitmap(db_connect, name):
+    """
+    Retrieve the completion bitmap of a habit.
+
+    :param db_connect: Database connection object.
+    :param name: name of the habit.
+    :return: CompletionBitmap (empty for a habit without completions), or None if the
+             habit doesn't exist.
+    """
+    row = db_connect.execute("""SELECT h.id, b.first_day, b.bits FROM habit h
+                                LEFT JOIN completion_bitmap b ON b.habit_id = h.id
+                                WHERE h.name = ?""", (name,)).fetchone()
+    if row is None:
+        return None
+    return CompletionBitmap(row[1], row[2]) if row[2] is not None else CompletionBitmap()
+
+
+def get_completion_bitmaps(db_connect, periodicity=None):
+    """
+    Retrieve the completion bitmaps of all habits, or of the habits with a periodicity.
+
+    :param db_connect: Database connection object.
+    :param periodicity: "Daily", "Weekly" or None for every habit.
+    :return: a dict mapping the habit name to its CompletionBitmap.
+    """
+    query = """SELECT h.name, b.first_day, b.bits FROM habit h
+               LEFT JOIN completion_bitmap b ON b.habit_id = h.id"""
+    if periodicity is None:
+        rows = db_connect.execute(query)
+    else:
+        rows = db_connect.execute(query + " WHERE h.periodicity = ?", (periodicity,))
+    return {name: CompletionBitmap(first_day, bits) if bits is not None else CompletionBitmap()
+            for name, first_day, bits in rows}
+
+
+class BitmapIndex:
+    """
+    Completion bitmaps read through one connection, cached in memory.
+
+    Every lookup first checks whether the database changed, through this connection
+    (total_changes) or through any other (PRAGMA data_version), and drops the cache if so.
+    Otherwise "was the habit done on day X" is a dict lookup and a bit test.
+    """
+
+    def __init__(self, db_connect):
+        self.db = db_connect
+        self._version = None
+        self._bitmaps = {}
+
+    def _check(self):
+        version = (self.db.total_changes, self.db.execute("PRAGMA data_version").fetchone()[0])
+        if version != self._version:
+            self._bitmaps.clear()
+            self._version = version
+
+    def bitmap(self, name):
+        """Return the CompletionBitmap of a habit, None if the habit doesn't exist."""
+        self._check()
+        if name not in self._bitmaps:
+            self._bitmaps[name] = get_completion_bitmap(self.db, name)
+        return self._bitmaps[name]
+
+    def bitmaps(self, periodicity=None):
+        """Return a dict mapping habit names to their CompletionBitmap, see get_completion_bitmaps."""
+        self._check()
+        bitmaps = get_completion_bitmaps(self.db, periodicity)
+        self._bitmaps.update(bitmaps)
+        return bitmaps
+
+    def completed_on(self, name, day):
+        """
+        Check whether a habit was completed on a day.
+
+        :param name: name of the habit.
+        :param day: datetime, date, ISO formatted string or day ordinal.
+        :return: True or False; False for an unknown habit.
+        """
+        bitmap = self.bitmap(name)
+        return bitmap is not None and day in bitmap
+
+    def count(self, name, start=None, end=None):
+        """Count the completions of a habit from start to end (inclusive), see CompletionBitmap.count."""
+        bitmap = self.bitmap(name)
+        return bitmap.count(start, end) if bitmap is not None else 0
+
+    def all_completed(self, periodicity=None):
+        """Return a CompletionBitmap of the days every habit (with the periodicity) was completed."""
+        return intersection(self.bitmaps(periodicity).values())
+
+    def any_completed(self, periodicity=None):
+        """Return a CompletionBitmap of the days at least one habit (with the periodicity) was completed."""
+        return union(self.bitmaps(periodicity).values())
+
+
+def _bucket_days(bucket, start, end):
+    """The first and last day of the buckets start to end (either can be None)."""
+    return (bucket_start(start, bucket) if start is not None else None,
+            bucket_start(end + 1, bucket) - 1 if end is not None else None)
+
+
+@timed
+def get_rollups(db_connect, bucket, start=None, end=None, name=None, periodicity=None):
+    """
+    Count the completions of habits per bucket.
+
+    The counts are taken from the completion bitmaps, one row per habit, so only the
+    buckets in the range are counted.
+
+    :param db_connect: Database connection object.
+    :param bucket: "day", "week" or "month".
+    :param start: first bucket index (see streaks.bucket_index), or None for no limit.
+    :param end: last bucket index, inclusive, or None for no limit.
+    :param name: only this habit.
+    :param periodicity: only the habits with this periodicity.
+    :return: a list of (habit_name, period, completions) tuples ordered by habit and
+             period, without the buckets a habit wasn't completed in.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: '{bucket}'. Expected 'day', 'week' or 'month'.")
+    start_day, end_day = _bucket_days(bucket, start, end)
+    conditions, params = [], []
+    if name is not None:
+        conditions.append("h.name = ?")
+        params.append(name)
+    if periodicity is not None:
+        conditions.append("h.periodicity = ?")
+        params.append(periodicity)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    cur = db_connect.execute(f"""SELECT h.name, b.first_day, b.bits FROM habit h
+                                 JOIN completion_bitmap b ON b.habit_id = h.id {where} ORDER BY h.id""", params)
+    rows = []
+    for habit_name, first_day, bits in cur:
+        days = CompletionBitmap(first_day, bits).days(start_day, end_day)
+        rows.extend((habit_name, period, completions) for period, completions in bucket_counts(days, bucket).items())
+    cur.close()
+    return rows
+
+
+@timed
+def get_rollup_totals(db_connect, bucket, start=None, end=None):
+    """
+    Retrieve the number of completions of all habits per bucket from the rollups.
+
+    :param db_connect: Database connection object.
+    :param bucket: "day", "week" or "month".
+    :param start: first bucket index (see streaks.bucket_index), or None for no limit.
+    :param end: last bucket index, inclusive, or None for no limit.
+    :return: a list of (period, completions, habits) tuples ordered by period, habits being
+             the number of habits completed in the bucket; buckets without completions are left out.
+    """
+    if bucket not in BUCKETS:
+        raise ValueError(f"Unknown bucket: '{bucket}'. Expected 'day', 'week' or 'month'.")
+    where, params = "", []
+    if start is not None:
+        where, params = where + " AND period >= ?", params + [start]
+    if end is not None:
+        where, params = where + " AND period <= ?", params + [end]
+    cur = db_connect.execute(f"""SELECT period, completions, habits FROM completion_rollup
+                                 WHERE bucket = ? {where} ORDER BY period""", [bucket, *params])
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+
+@timed
+def compute_streaks(db_connect, name=None, periodicity=None):
+    """
+    Compute the streaks of habits from their completions inside SQLite.
+
+    Only one row per habit leaves the database, see STREAKS_SQL. Unlike the streak cache
+    the result never depends on earlier writes having kept the cache up to date.
+
+    :param db_connect: Database connection object.
+    :param name: only compute this habit.
+    :param periodicity: only compute the habits with this periodicity.
+    :return: a dict mapping each habit name to a tuple (longest_run_streak, current_run_streak);
+             habits without completions map to (0, 0).
+    """
+    where, params = "", []
+    if name is not None:
+        where, params = "AND h.name = ?", [name]
+    elif periodicity is not None:
+        where, params = "AND h.periodicity = ?", [periodicity]
+    cur = db_connect.execute(f"""SELECT name, longest_run_streak, current_run_streak
+                                 FROM ({STREAKS_SQL.format(where=where)})""", params)
+    streaks = {habit_name: (longest_run_streak, current_run_streak)
+               for habit_name, longest_run_streak, current_run_streak in cur}
+    cur.close()
+    return streaks
+
+
+@timed
+def compute_longest_run_streak(db_connect, periodicity=None):
+    """
+    Compute the longest run streak of all habits from their completions inside SQLite.
+
+    :param db_connect: Database connection object.
+    :param periodicity: only consider habits with this periodicity, or None for all habits.
+    :return: a tuple (longest_run_streak, current_run_streak) with the longest of each
+             over the habits, (0, 0) if there are none.
+    """
+    where, params = ("AND h.periodicity = ?", [periodicity]) if periodicity is not None else ("", [])
+    cur = db_connect.execute(f"""SELECT MAX(longest_run_streak), MAX(current_run_streak)
+                                 FROM ({STREAKS_SQL.format(where=where)})""", params)
+    longest_run_streak, current_run_streak = cur.fetchone()
+    cur.close()
+    return longest_run_streak or 0, current_run_streak or 0
+
+
+def set_longest_run_streak(db_connect, name, longest_run_streak):
+    """
+    Overwrite the cached longest run streak of a habit, e.g. with one computed in memory.
+
+    :param db_connect: Database connection object.
+    :param name: name of the habit.
+    :param longest_run_streak: the new longest run streak.
+    """
+    cur = db_connect.cursor()
+    cur.execute("UPDATE habit SET longest_run_streak = ? WHERE name = ?", (longest_run_streak, name))
     db_connect.commit()
     cur.close()
 
 
+def get_cached_longest_run_streak(db_connect, periodicity=None):
+    """
+    Retrieve the longest run streak of all habits from the streak cache.
+
+    :param db_connect: Database connection object.
+    :param periodicity: only consider habits with this periodicity, or None for all habits.
+    :return: the longest run streak, 0 if there are no habits.
+    """
+    cur = db_connect.cursor()
+    if periodicity is None:
+        cur.execute("SELECT MAX(longest_run_streak) FROM habit")
+    else:
+        cur.execute("SELECT MAX(longest_run_streak) FROM habit WHERE periodicity = ?", (periodicity,))
+    result = cur.fetchone()[0]
+    cur.close()
+    return result or 0
+
+
+def delete_habit(db_connect, name):
+    """
+    Delete a habit from the database.
+    """
+    cur = db_connect.cursor()
+    # Take the write lock before reading the bitmap, so a concurrent writer can't add
+    # completions the rollups would then keep
+    if not db_connect.in_transaction:
+        cur.execute("BEGIN IMMEDIATE")
+    try:
+        # Take the habit's completions out of the rollups while its bitmap is still there
+        habit_ids = [row[0] for row in cur.execute("SELECT id FROM habit WHERE name = ?", (name,))]
+        _update_rollups(db_connect, _rollup_changes(_get_bitmaps(db_connect, habit_ids), {}))
+        # Delete associated completion dates
+        cur.execute("DELETE FROM completion WHERE habit_id IN (SELECT id FROM habit WHERE name = ?)", (name,))
+        cur.execute("DELETE FROM completion_bitmap WHERE habit_id IN (SELECT id FROM habit WHERE name = ?)", (name,))
+        cur.execute("DELETE FROM habit WHERE name = ?", (name,))
+        db_connect.commit()
+    except BaseException:
+        db_connect.rollback()
+        raise
+    finally:
+        cur.close()
+    _notify_write(db_connect, {name})
+
+
+@timed
 def get_completion_dates(db_connect, name):
     """
     Retrieve completion dates for a specific habit from the database and convert them to datetime objects.
@@ -405,42 +1853,23 @@ def get_completion_dates(db_connect, name):
         list: A list of completion dates as datetime objects.
     """
     # Ensure db is a valid SQLite connection
-    if not isinstance(db_connect, sqlite3.Connection):
-        raise TypeError("Expected a sqlite3.Connection object")
+    if not isinstance(db_connect, CONNECTION_TYPES):
+        raise TypeError("Expected a sqlite3.Connection or ConnectionPool object")
 
     cur = db_connect.cursor()
 
-    # Execute the query to fetch completion dates for the specified habit
-    cur.execute("SELECT completion_dates FROM tracker WHERE habit_name = ?", (name,))
+    # Execute the query to fetch completion dates for the specified habit, oldest first
+    cur.execute("""SELECT c.completed_on FROM completion c
+                   JOIN habit h ON h.id = c.habit_id
+                   WHERE h.name = ?
+                   ORDER BY c.completed_on""", (name,))
 
-    # Fetch all results
-    rows = cur.fetchall()  # Fetch all rows
+    # Convert each stored day ordinal to a datetime object
+    completion_dates = [from_completion_date(row[0]) for row in cur.fetchall()]
 
     # Close the cursor
     cur.close()
 
-    # If no rows are found, return an empty list
-    if not rows:
-        return []
-
-    # Initialize a list to hold all completion dates
-    completion_dates = []
-
-    # Iterate through the rows and split the completion dates
-    for row in rows:
-        if row[0] is not None:  # Check if the completion_dates is not None
-            # Split the completion dates string into individual date strings
-            date_strings = row[0].split(',')
-
-            # Convert each date string to a datetime object
-            for date_str in date_strings:
-                try:
-                    # Convert the ISO formatted string to a datetime object
-                    date_obj = datetime.fromisoformat(date_str.strip())  # Use strip() to remove any extra spaces
-                    completion_dates.append(date_obj)
-                except ValueError as e:
-                    print(f"Error converting date string '{date_str}' to datetime object: {e}")
-
     return completion_dates  # Return the list of completion dates as datetime objects
 
 
@@ -453,25 +1882,27 @@ def get_habit_data(db_connect, habit):
     :return: a list of completion dates and periodicity for the specified habit
     """
     # Ensure db is a valid SQLite connection
-    if not isinstance(db_connect, sqlite3.Connection):
-        raise TypeError("Expected a sqlite3.Connection object")
+    if not isinstance(db_connect, CONNECTION_TYPES):
+        raise TypeError("Expected a sqlite3.Connection or ConnectionPool object")
 
     cur = db_connect.cursor()
 
     # Get the periodicity for the habit
-    cur.execute("SELECT periodicity FROM tracker WHERE habit_name = ?", (habit,))
+    cur.execute("SELECT periodicity FROM habit WHERE name = ?", (habit,))
     periodicity_row = cur.fetchone()
     periodicity = periodicity_row[0] if periodicity_row else None
 
     # Prepare and execute the SQL query to get data for the specified habit
-
-    cur.execute("SELECT completion_dates FROM tracker WHERE habit_name = ?", (habit,))
+    cur.execute("""SELECT c.completed_on FROM completion c
+                   JOIN habit h ON h.id = c.habit_id
+                   WHERE h.name = ?
+                   ORDER BY c.completed_on""", (habit,))
 
     # Fetch all the rows in the result
     rows = cur.fetchall()
 
-    # Extract dates from the rows
-    completion_dates = [row[0] for row in rows]
+    # Extract dates from the rows as ISO formatted strings
+    completion_dates = [from_completion_date(row[0]).isoformat() for row in rows]
 
     # Close the cursor
     cur.close()
@@ -1,33 +1,111 @@
-from db import (add_habit, add_completion_dates, get_habit as db_get_habit,
-                get_completion_dates as db_get_completion_dates, edit_habit, delete_habit,
-                validate_periodicity,
-                get_habits_by_periodicity,
-                get_current_habits)
-from datetime import datetime, timedelta
+from storage import get_storage
+from streaks import Periodicity, batch_streaks, day_ordinal, period_index, run_streaks
+from tracing import timed
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+import logging
+
+
+logger = logging.getLogger(__name__)
 
 
 def get_longest_run_streak_all_habits(habit_list):
-    longest_run_streak = 0
-    for habit in habit_list:
-        streak = habit.get_longest_run_streak()
-        longest_run_streak = max(longest_run_streak, streak)
-    return longest_run_streak
+    # All habits are computed in one batch (vectorized when NumPy is installed)
+    return max((longest for longest, current in batch_streaks(habit_list)), default=0)
+
+
+@timed
+def load_habits(db):
+    """
+    Load every habit together with its completion dates.
+
+    The habits and their completions are read in one query (see db.load_habit_days) and
+    the day ordinals go into the habits as they are, no datetime is created.
+
+    :param db: sqlite3.Connection, ConnectionPool or StorageBackend.
+    :return: A list of Habit objects with their completion dates sorted oldest first.
+    """
+    return [Habit.from_days(name, periodicity, db, days)
+            for name, periodicity, days in get_storage(db).load_habit_days()]
+
+
+def get_current_habits(db):
+    """
+    Fetch the current habits as a list of Habit objects.
+
+    :param db: sqlite3.Connection, ConnectionPool or StorageBackend; anything else raises TypeError.
+    :return: A list of Habit objects.
+    """
+    # Filter out invalid habit names
+    invalid_habit_names = ["Daily", "Weekly"]
+    return [habit for habit in load_habits(db) if habit.name not in invalid_habit_names]
 
 
 def load_habits_from_db(db):
     """
     Load habits from the database and return a list of Habit objects.
     """
-    cur = db.cursor()
-    cur.execute('SELECT name, periodicity FROM habit')
-    habits_data = cur.fetchall()  # Fetch all rows as tuples (name, periodicity)
+    # Habits and their completion dates are fetched in one query
+    return load_habits(db)
+
 
-    # Convert the list of tuples into a list of Habit objects
-    current_habits = [Habit(name, periodicity, db) for name, periodicity in habits_data]
-    return current_habits
+class CompletionDates:
+    """
+    List-like view of the completion dates of a Habit.
+
+    The dates are kept in the habit as a sorted array of day ordinals without duplicates,
+    4 bytes per completion; datetime objects are only created when the view is read.
+    """
+    __slots__ = ("_habit",)
+
+    def __init__(self, habit):
+        self._habit = habit
+
+    def __len__(self):
+        return len(self._habit.completion_days)
+
+    def __iter__(self):
+        return map(datetime.fromordinal, self._habit.completion_days)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [datetime.fromordinal(day) for day in self._habit.completion_days[index]]
+        return datetime.fromordinal(self._habit.completion_days[index])
+
+    def __contains__(self, value):
+        days = self._habit.completion_days
+        day = day_ordinal(value)
+        index = bisect_left(days, day)
+        return index < len(days) and days[index] == day
+
+    def __eq__(self, other):
+        if isinstance(other, CompletionDates):
+            return self._habit.completion_days == other._habit.completion_days
+        if isinstance(other, (list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __repr__(self):
+        return repr(list(self))
+
+    def append(self, value):
+        self.extend([value])
+
+    def extend(self, values):
+        self._habit.add_days(day_ordinal(value) for value in values)
+
+    def clear(self):
+        del self._habit.completion_days[:]
+
+    def sort(self):
+        """The dates are always sorted, kept for callers written against a list."""
 
 
 class Habit:
+    # No per-instance __dict__: a habit is three references, an enum member and an array
+    __slots__ = ("db", "name", "_periodicity", "completion_days")
+
     def __init__(self, name, periodicity, db, completion_dates=None):
         """Habit class, to count events completed
 
@@ -40,15 +118,58 @@ class Habit:
         if not self.validate_periodicity(periodicity):
             raise ValueError(f"Invalid periodicity: '{periodicity}'. Expected 'Daily' or 'Weekly'.")
         self.periodicity = periodicity  # e.g., 'Daily', 'Weekly'
-        # Make sure each instance has its own list of completion dates
-        if completion_dates is None:
-            self.completion_dates = []
-        else:
+        # Completion dates as sorted day ordinals, see CompletionDates
+        self.completion_days = array('i')
+        if completion_dates is not None:
             self.completion_dates = [datetime.fromisoformat(date) for date in completion_dates]
 
         if completion_dates:
             self.add_completion_dates(completion_dates)  # Initialize with provided dates
 
+    @classmethod
+    def from_days(cls, name, periodicity, db, completion_days):
+        """
+        Build a habit from completion dates that are already sorted unique day ordinals.
+
+        :param completion_days: array('i') of day ordinals, used without copying.
+        """
+        habit = cls(name, periodicity, db)
+        habit.completion_days = completion_days
+        return habit
+
+    @property
+    def periodicity(self):
+        # The shared enum value, so habits loaded from the database don't each hold a string
+        return self._periodicity.value
+
+    @periodicity.setter
+    def periodicity(self, value):
+        self._periodicity = Periodicity(value)
+
+    @property
+    def completion_dates(self):
+        return CompletionDates(self)
+
+    @completion_dates.setter
+    def completion_dates(self, completion_dates):
+        self.completion_days = array('i', sorted({day_ordinal(date) for date in completion_dates}))
+
+    def add_days(self, days):
+        """
+        Merge day ordinals into the sorted completion days, ignoring days already present.
+
+        :param days: iterable of day ordinals.
+        """
+        days = sorted(set(days))
+        if not days:
+            return
+        completion_days = self.completion_days
+        if not completion_days or days[0] > completion_days[-1]:
+            # Appending later dates, the common case, needs no merge
+            completion_days.extend(days)
+        else:
+            self.completion_days = array('i', sorted(set(completion_days).union(days)))
+
     def __str__(self):
         return f"{self.name} ({self.periodicity})"
 
@@ -71,157 +192,94 @@ class Habit:
             if not isinstance(date, datetime):
                 raise ValueError(f"Each date must be a datetime object. Found: {type(date).__name__}")
 
-        # Extend the completion dates list
-        self.completion_dates.extend(completion_dates)
-
-        # Prepare the database cursor
-        cur = self.db.cursor()
-
-        # Store existing dates in a set for quick lookup
-        existing_dates = set(self.get_completion_dates(self.db, self.name))
+        # Merge the dates into the in-memory completion days
+        self.add_days(day_ordinal(date) for date in completion_dates)
 
-        # List to hold newly added dates
-        new_dates = []
-
-        for date in completion_dates:
-            # Check if the date already exists to avoid duplicates
-            if date not in existing_dates:
-                # Insert the completion date into the database
-                cur.execute("INSERT INTO tracker (habit_name, completion_dates) VALUES (?, ?)",
-                            (self.name, date.isoformat()))  # Store date as an ISO format string
-
-                # Add the date to the instance's completion_dates list
-                new_dates.append(date)
-                existing_dates.add(date)  # Update the set with the newly added date
-
-        # Commit the changes to the database
-        self.db.commit()
-
-        # Close the cursor
-        cur.close()
+        # Store one completion row per date; dates already recorded are ignored by the database
+        get_storage(self.db).add_completion_dates(self.name, completion_dates)
 
+    @timed
     def get_longest_run_streak(self):
         # Return 0 if there are no completion dates
-        if not self.completion_dates:
+        if not self.completion_days:
             return 0
 
-        # Convert completion dates from strings to datetime objects
-        #try:
-            #self.completion_dates = [
-                #datetime.fromisoformat(date) for date in self.completion_dates if isinstance(date, str)
-            #]
-        #except ValueError as e:
-            #print(f"Error converting date: {e}")
-            #return 0
-
-            # Sort completion dates
-        self.completion_dates.sort()
-
-        # Output the completion_dates to debug
-        print(f"Completion Dates: {self.completion_dates}")
-
-        # Initialize streak counters
-        streak = 1  # Start with 1 since we have at least one date
-        longest_run_streak = 1  # At least one date means the streak is at least 1
-
-        # Define the range to check for streaks based on periodicity
-        if self.periodicity == "Daily":
-            date_diff = timedelta(days=1)
-        elif self.periodicity == "Weekly":
-            date_diff = timedelta(weeks=1)
-        else:
-            raise ValueError("Unknown periodicity")
-
-            # Check for streaks
-        for i in range(1, len(self.completion_dates)):
-            current_date = self.completion_dates[i]
-            previous_date = self.completion_dates[i - 1]
-
-            # Check if the current date is a continuation of the streak
-            if current_date - previous_date == date_diff:
-                streak += 1
-            else:
-                longest_run_streak = max(longest_run_streak, streak)
-                streak = 1  # Reset streak
+        # Output the completion_dates to debug; only formatted when debug logging is on
+        logger.debug("Completion Dates: %s", self.completion_dates)
 
-        # Final check to update longest_run_streak
-        longest_run_streak = max(longest_run_streak, streak)
-        print(f"Final Streak Calculation: Current Streak = {streak}, Longest run Streak = {longest_run_streak}")
+        # The completion days are sorted day ordinals: map each to its period (day or ISO
+        # week) and count consecutive periods with integer arithmetic
+        days = self.completion_days
+        if self._periodicity is not Periodicity.DAILY:
+            days = [period_index(day, self.periodicity) for day in days]
+        longest_run_streak, streak = run_streaks(days)
+        logger.debug("Final Streak Calculation: Current Streak = %d, Longest run Streak = %d",
+                     streak, longest_run_streak)
 
         return longest_run_streak
 
     @staticmethod
-    def get_longest_run_streak_by_periodicity(db, periodicity):
+    def get_longest_run_streak_by_periodicity(db, periodicity, habits=None, from_completions=False):
         """
         Calculate the longest run streak for habits grouped by periodicity.
 
         Args:
             db: The database connection.
             periodicity (str): The periodicity to filter habits by ("Daily" or "Weekly").
+            habits (list of Habit): Optional habits to compute the streaks from instead of
+                reading the streaks cached in the database.
+            from_completions (bool): Recompute the streaks from the completions inside
+                SQLite instead of reading the streak cache.
 
         Returns:
             int: The longest run streak for the given periodicity.
         """
-        # Get all habits with the specified periodicity
-        habits = get_habits_by_periodicity(db, periodicity)
+        if habits is None and from_completions:
+            return get_storage(db).compute_longest_run_streak(periodicity)[0]
+        if habits is None:
+            # The longest run streak of every habit is kept up to date by add_completion_dates
+            return get_storage(db).get_cached_longest_run_streak(periodicity)
 
-        # Initialize the longest streak
-        longest_run_streak = 0
-
-        # Calculate the longest streak for each habit
-        for habit in habits:
-            habit_instance = Habit(habit[0], habit[1], db)  # Create a Habit instance
-            streak = habit_instance.get_longest_run_streak()  # Get the longest streak for this habit
-            longest_run_streak = max(longest_run_streak, streak)  # Update the longest streak
-
-        return longest_run_streak
+        # Compute all habits with the periodicity in one batch
+        matching = [habit for habit in habits if habit.periodicity == periodicity]
+        return max((longest for longest, current in batch_streaks(matching)), default=0)
 
     def update_longest_run_streak(self, db):
         current_streak = self.get_longest_run_streak()
-
-        cur = db.cursor()
-        cur.execute("""  
-            UPDATE habit  
-            SET longest_run_streak = ?  
-            WHERE name = ?  
-        """, (current_streak, self.name))
-
-        db.commit()  # Commit the changes to the database
+        get_storage(db).set_longest_run_streak(self.name, current_streak)
 
     def store(self, db):
         """Store the habit in the database."""
-        add_habit(db, [(self.name, self.periodicity)])  # Wrap in a list of tuples
+        get_storage(db).add_habit([(self.name, self.periodicity)])  # Wrap in a list of tuples
         print(f"Habit '{self.name}' with periodicity '{self.periodicity}' stored in the database.")
 
     def store_completion_dates(self, completion_dates):
-        for current_date in completion_dates:
-            add_completion_dates(self.db, self.name, current_date)
-
-        self.db.commit()
+        # All dates are written in one call with a single commit
+        get_storage(self.db).add_completion_dates(self.name, list(completion_dates))
 
     @staticmethod
     def get_habit(db, name):
-        return db_get_habit(db, name)  # Call the imported function
+        return get_storage(db).get_habit(name)
 
     def edit_habit(self, new_name=None, new_periodicity=None):
         """
         Edit the habit's attributes and update the database.
         """
+        if new_periodicity and not self.validate_periodicity(new_periodicity):
+            raise ValueError(f"Invalid periodicity: '{new_periodicity}'. Expected 'Daily' or 'Weekly'.")
+        # Update the database first, the habit only changes if the storage accepted the edit
+        get_storage(self.db).edit_habit(self.name, new_name, new_periodicity)
         if new_name:
             self.name = new_name
         if new_periodicity:
-            if not self.validate_periodicity(new_periodicity):
-                raise ValueError(f"Invalid periodicity: '{new_periodicity}'. Expected 'Daily' or 'Weekly'.")
             self.periodicity = new_periodicity
-        # Update the database
-        edit_habit(self.db, self.name, new_name, new_periodicity)
 
     def delete_habit(self):
-        delete_habit(self.db, self.name)   # Delete the habit from the database
+        get_storage(self.db).delete_habit(self.name)   # Delete the habit from the database
 
     @staticmethod
     def get_completion_dates(db, name):
-        return db_get_completion_dates(db, name)  # Call the imported function
+        return get_storage(db).get_completion_dates(name)
 
     @staticmethod
     def get_periodicity(name):
@@ -250,15 +308,15 @@ class Tracker:
 
         :param habit_names: List of habit names to be added
         """
-        add_habit(self.db, habit_names)
-
-        self.db.commit()
+        storage = get_storage(self.db)
+        storage.add_habit(habit_names)
+        storage.commit()
 
     def get_current_habits(self, habit_load_habits_from_db):
         return load_habits_from_db(self.db)  # Call the imported function
 
     def get_habits_by_periodicity(self, periodicity):
-        return get_habits_by_periodicity(self.db, periodicity)
+        return get_storage(self.db).get_habits_by_periodicity(periodicity)
 
     def close(self):
         """Close the database connection."""
@@ -1,51 +1,44 @@
-import questionary
-import sys
+import argparse
+import json
 import os
-import contextlib
-from db import get_db, input_data_database, get_completion_dates, get_habit_periodicity, edit_habit, delete_habit
-from habit import Habit, get_current_habits
-from analyse import get_longest_run_streak, get_longest_run_streak_all_habits
-
-
-def suppress_stdout(func=None):
-    """Can be used both as a decorator and context manager to suppress stdout."""
-    if func is None:
-        # Being used as a context manager
-        @contextlib.contextmanager
-        def manager():
-            original_stdout = sys.stdout
-            with open(os.devnull, 'w') as devnull:
-                sys.stdout = devnull
-                try:
-                    yield
-                finally:
-                    sys.stdout = original_stdout
-        return manager()
-    else:
-        # Being used as a decorator
-        def wrapper(*args, **kwargs):
-            original_stdout = sys.stdout
-            with open(os.devnull, 'w') as devnull:
-                sys.stdout = devnull
-                try:
-                    return func(*args, **kwargs)
-                finally:
-                    sys.stdout = original_stdout
-        return wrapper
+import sys
+from datetime import date
+from db import (get_db, input_data_database, add_habit, add_completion_dates, get_at_risk_habits,
+                get_habits_by_periodicity, get_streak_cache, get_streak_details, rebuild_rollups)
+from streaks import BUCKETS, PERIODICITIES
+from transfer import FORMATS, guess_format, import_habits, export_habits
+
 
+# Output formats of the scripting commands
+OUTPUT_FORMATS = ["tsv", "json"]
 
-def cli(completion_dates=None, name=None, current_habits=None):
-    db_connect = get_db("main.db")  # Ensure the database name is specified
+
+def cli(completion_dates=None, name=None, current_habits=None, seed=False, db_name="main.db"):
+    # Only the interactive menu needs questionary and the habit classes, the commands start without them
+    import questionary
+    from analyse import get_longest_run_streak_all_habits
+    from cache import HabitCache
+    from habit import Habit, get_current_habits
+    from storage import SQLiteBackend
+
+    # The demo data is only loaded into a new database or when asked for
+    first_run = not os.path.exists(db_name)
+    db_connect = get_db(db_name)  # Ensure the database name is specified
     if db_connect is None:
         print("Database connection failed.")
         return
 
     questionary.confirm("Do you want to continue").ask()
 
-    # Initialize the database with data, suppress unwanted output
-    with suppress_stdout():
+    if seed or first_run:
+        # Initialize the database with the demo data in one transaction
         input_data_database(db_connect)
 
+    # The menu reads the same habits over and over; writes keep the cache up to date
+    cache = HabitCache(db_connect)
+    # Habits and the analysis read and write through the storage backend
+    storage = SQLiteBackend(db_connect)
+
     stop = False
     while not stop:
 
@@ -71,14 +64,13 @@ def cli(completion_dates=None, name=None, current_habits=None):
         if choice == "Create":
             name = questionary.text("What is the name of the habit?").ask()
             periodicity = questionary.text("What is the periodicity of the habit?").ask()
-            habit = Habit(name, periodicity, db_connect)
-            habit.store(db_connect)  # Assuming store method saves the habit to the database
+            habit = Habit(name, periodicity, storage)
+            habit.store(storage)  # Assuming store method saves the habit to the database
             continue
 
         elif choice == "Get completion dates":
             # Retrieve all habits from the database to ensure the name is valid
-            with suppress_stdout():
-                current_habits = get_current_habits(db_connect)
+            current_habits = get_current_habits(storage)
             if not current_habits:
                 print("No current habits found.")
                 continue
@@ -91,7 +83,7 @@ def cli(completion_dates=None, name=None, current_habits=None):
                                             choices=habit_names).ask()
 
             # Get completion dates for the selected habit
-            completion_dates = get_completion_dates(db_connect, habit_name)  # type: ignore
+            completion_dates = cache.get_completion_dates(habit_name)  # type: ignore
 
             if not completion_dates:
                 print(f"No completion dates found for habit '{habit_name}'.")
@@ -102,8 +94,7 @@ def cli(completion_dates=None, name=None, current_habits=None):
 
         elif choice == "Analyse":
             # Retrieve all habits for analysis
-            with suppress_stdout():
-                current_habits = get_current_habits(db_connect)
+            current_habits = get_current_habits(storage)
             if not current_habits:
                 print("No current habits found.")
                 continue
@@ -133,29 +124,20 @@ def cli(completion_dates=None, name=None, current_habits=None):
                     choices=["Daily", "Weekly"]
                 ).ask()
 
-                with suppress_stdout():
-                    habits_with_periodicity = [habit for habit in current_habits if
-                                               get_habit_periodicity(db_connect, habit.name) == periodicity]
+                names_with_periodicity = set(cache.get_habits_by_periodicity(periodicity))
+                habits_with_periodicity = [habit for habit in current_habits if habit.name in names_with_periodicity]
                 print(f"Habits with '{periodicity}' periodicity:")
                 for habit in habits_with_periodicity:
                     print(f"- {habit}")
 
             elif analysis_choice == "Get the longest run streak of all habits":
                 try:
-                    with suppress_stdout():
-                        longest_streak_all_habits = suppress_stdout(get_longest_run_streak_all_habits)(db_connect)
+                    longest_streak_all_habits = get_longest_run_streak_all_habits(storage)
                     print(f"The longest run streak across all habits is: {longest_streak_all_habits}.")
                 except Exception as e:
                     print(f"An error occurred: {e}")
 
             elif analysis_choice == "Get the longest run streak for a specific habit":
-                # Retrieve all habits for analysis
-                with suppress_stdout():
-                    current_habits = get_current_habits(db_connect)
-                if not current_habits:
-                    print("No current habits found.")
-                    continue
-
                 habit_names = [habit.name for habit in current_habits]
                 for habit in current_habits:
                     print(f"- {habit.name}")  # Assuming habit has a name attribute
@@ -180,29 +162,9 @@ def cli(completion_dates=None, name=None, current_habits=None):
                     print(f"The longest run streak for '{selected_habit_name}' is: {longest_streak}.")
 
             elif analysis_choice == "Get the longest run streak by periodicity":
-                # Retrieve all habits for analysis
-                with suppress_stdout():
-                    current_habits = get_current_habits(db_connect)
-                if not current_habits:
-                    print("No current habits found.")
-                    continue
-
-                # Group habits by periodicity
-                daily_habits = [h for h in current_habits if h.periodicity == "Daily"]
-                weekly_habits = [h for h in current_habits if h.periodicity == "Weekly"]
-
-                # Calculate the longest streak for daily habits
-                longest_run_daily_streak = 0
-                for habit in daily_habits:
-                    current_streak = habit.get_longest_run_streak()
-                    longest_run_daily_streak = max(longest_run_daily_streak, current_streak)
-
-                # Calculate the longest streak for weekly habits
-                longest_run_weekly_streak = 0
-                habit: Habit
-                for habit in weekly_habits:
-                    current_streak = habit.get_longest_run_streak()
-                    longest_run_weekly_streak = max(longest_run_weekly_streak, current_streak)
+                # The longest streak per periodicity is read from the streak cache
+                longest_run_daily_streak = Habit.get_longest_run_streak_by_periodicity(storage, "Daily")
+                longest_run_weekly_streak = Habit.get_longest_run_streak_by_periodicity(storage, "Weekly")
 
                 # Display the results
                 print(f"Longest run streak for daily habits: {longest_run_daily_streak}")
@@ -210,8 +172,7 @@ def cli(completion_dates=None, name=None, current_habits=None):
 
         elif choice == "Edit Habit":
             # Retrieve all habits for editing
-            with suppress_stdout():
-                current_habits = get_current_habits(db_connect)
+            current_habits = get_current_habits(storage)
             if not current_habits:
                 print("No current habits found.")
                 continue
@@ -243,8 +204,7 @@ def cli(completion_dates=None, name=None, current_habits=None):
 
         elif choice == "Delete Habit":
             # Retrieve all habits for deletion
-            with suppress_stdout():
-                current_habits = get_current_habits(db_connect)
+            current_habits = get_current_habits(storage)
             if not current_habits:
                 print("No current habits found.")
                 continue
@@ -276,8 +236,284 @@ def cli(completion_dates=None, name=None, current_habits=None):
             stop = True
 
             break
+    cache.close()
     db_connect.close()  # Ensure the database connection is closed when done
 
 
+def print_rows(rows, fields, fmt="tsv", out=None):
+    """
+    Print the result of a command for scripts.
+
+    :param rows: list of tuples, one value per field.
+    :param fields: column names.
+    :param fmt: "tsv" (a header line, then one tab separated line per row) or "json" (a
+                list of objects).
+    :param out: open text file, standard output by default.
+    """
+    out = out or sys.stdout
+    if fmt == "json":
+        json.dump([dict(zip(fields, row)) for row in rows], out)
+        out.write("\n")
+        return
+    out.write("\t".join(fields) + "\n")
+    for row in rows:
+        out.write("\t".join(_tsv_value(value) for value in row) + "\n")
+
+
+def _tsv_value(value):
+    # Empty for None and lower case booleans, as in the JSON output
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def parse_day(value):
+    """argparse type of the date options: an ISO date such as 2025-04-01."""
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date '{value}', expected YYYY-MM-DD") from None
+
+
+def add_command(db_connect, names, periodicity):
+    """Add habits, or change the periodicity of existing ones."""
+    add_habit(db_connect, [(name, periodicity) for name in names])
+    return [(name, periodicity) for name in names]
+
+
+def complete_command(db_connect, names, day):
+    """Check off habits on a day, all in one transaction."""
+    try:
+        for name in names:
+            add_completion_dates(db_connect, name, [day], commit=False)
+        db_connect.commit()
+    except Exception:
+        db_connect.rollback()
+        raise
+    rows = []
+    for name in names:
+        longest_run_streak, current_run_streak, last_completion = get_streak_cache(db_connect, name)
+        rows.append((name, day.isoformat(), current_run_streak, longest_run_streak))
+    return rows
+
+
+def streak_command(db_connect, names, today):
+    """The live streak of the named habits, or of every habit."""
+    details = {detail[0].name: detail for detail in get_streak_details(db_connect, today)}
+    missing = [name for name in names if name not in details]
+    if missing:
+        raise ValueError(f"Habit '{missing[0]}' does not exist.")
+    rows = []
+    for status, longest_run_streak, last_completion in ([details[name] for name in names] if names
+                                                        else details.values()):
+        rows.append((status.name, status.periodicity, status.current_run_streak, longest_run_streak,
+                     last_completion[:10] if last_completion else None, status.days_remaining, status.at_risk))
+    return rows
+
+
+def list_command(db_connect, periodicity=None):
+    """The habits, by periodicity."""
+    return [(name, each) for each in ([periodicity] if periodicity else PERIODICITIES)
+            for name in get_habits_by_periodicity(db_connect, each)]
+
+
+def stats_command(db_connect, today):
+    """Habit counts, the longest run streak and the habits at risk, per periodicity and overall."""
+    from analyse import get_longest_run_streak_all_habits
+    from habit import Habit
+
+    at_risk = [status.periodicity for status in get_at_risk_habits(db_connect, today)]
+    rows = []
+    for periodicity in PERIODICITIES:
+        rows.append((periodicity, len(get_habits_by_periodicity(db_connect, periodicity)),
+                     Habit.get_longest_run_streak_by_periodicity(db_connect, periodicity),
+                     at_risk.count(periodicity)))
+    rows.append(("all", sum(row[1] for row in rows), get_longest_run_streak_all_habits(db_connect), len(at_risk)))
+    return rows
+
+
+def completions_command(db_connect, names, bucket, start=None, end=None, periodicity=None):
+    """Completions per bucket of the named habits, of the habits with a periodicity, or of all habits together."""
+    from reports import completions_per_period, habit_completions_per_period
+
+    if not names and periodicity is None:
+        return [("all", count.period_start.isoformat(), count.completions, count.habits)
+                for count in completions_per_period(db_connect, bucket, start, end)]
+    if names:
+        reports = {}
+        for name in names:
+            reports.update(habit_completions_per_period(db_connect, bucket, start, end, name, periodicity))
+    else:
+        reports = habit_completions_per_period(db_connect, bucket, start, end, periodicity=periodicity)
+    return [(name, count.period_start.isoformat(), count.completions, count.habits)
+            for name, counts in reports.items() for count in counts]
+
+
+# Output columns of the scripting commands
+COMMAND_FIELDS = {
+    "add": ["name", "periodicity"],
+    "complete": ["name", "completed_on", "current_run_streak", "longest_run_streak"],
+    "streak": ["name", "periodicity", "current_run_streak", "longest_run_streak", "last_completion",
+               "days_remaining", "at_risk"],
+    "list": ["name", "periodicity"],
+    "stats": ["periodicity", "habits", "longest_run_streak", "at_risk"],
+    "completions": ["name", "period_start", "completions", "habits"],
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Create, track and analyse your habits.")
+    parser.add_argument("--db", default="main.db", help="path of the SQLite database (default: main.db)")
+    parser.add_argument("--seed", action="store_true",
+                        help="load the demo habits and completion dates before starting")
+    commands = parser.add_subparsers(dest="command", metavar="command",
+                                     help="run a single command instead of the interactive menu")
+
+    import_parser = commands.add_parser("import", help="import habits and completion dates from a file")
+    import_parser.add_argument("file", help="CSV, TSV or JSON Lines file, '-' for standard input")
+    import_parser.add_argument("--format", choices=FORMATS, help="file format (default: from the file name)")
+
+    export_parser = commands.add_parser("export", help="export all habits and completion dates to a file")
+    export_parser.add_argument("file", help="CSV, TSV or JSON Lines file, '-' for standard output")
+    export_parser.add_argument("--format", choices=FORMATS, help="file format (default: from the file name)")
+
+    report_parser = commands.add_parser("report", help="recompute the streaks of all habits in parallel")
+    report_parser.add_argument("--workers", type=int, help="number of worker processes (default: one per CPU)")
+
+    generate_parser = commands.add_parser("generate", help="add generated habits and completion dates for load testing")
+    generate_parser.add_argument("--habits", type=int, default=1000, help="number of habits (default: 1000)")
+    generate_parser.add_argument("--days", type=int, default=365, help="days of history per habit (default: 365)")
+    generate_parser.add_argument("--daily-share", type=float, default=0.7,
+                                 help="share of Daily habits, the rest are Weekly (default: 0.7)")
+    generate_parser.add_argument("--completion-rate", type=float, default=0.85,
+                                 help="chance a day or week is completed (default: 0.85)")
+    generate_parser.add_argument("--gap-rate", type=float, default=0.01,
+                                 help="chance a break starts on a day or week (default: 0.01)")
+    generate_parser.add_argument("--out-of-order", type=float, default=0.0,
+                                 help="share of completions inserted late, shuffled (default: 0)")
+    generate_parser.add_argument("--random-seed", type=int, default=0, help="seed of the dataset (default: 0)")
+    generate_parser.add_argument("--prefix", default="Habit", help="habit names are the prefix and a number")
+
+    # The scripting commands print their result as TSV or JSON
+    output = argparse.ArgumentParser(add_help=False)
+    output.add_argument("--format", choices=OUTPUT_FORMATS, default="tsv", help="output format (default: tsv)")
+
+    add_parser = commands.add_parser("add", parents=[output], help="add habits")
+    add_parser.add_argument("names", nargs="+", metavar="name")
+    add_parser.add_argument("--periodicity", required=True, choices=PERIODICITIES)
+
+    complete_parser = commands.add_parser("complete", parents=[output], help="check off habits")
+    complete_parser.add_argument("names", nargs="+", metavar="name")
+    complete_parser.add_argument("--date", type=parse_day, default=date.today(),
+                                 help="day of the completion, YYYY-MM-DD (default: today)")
+
+    streak_parser = commands.add_parser("streak", parents=[output], help="show the live streak of habits")
+    streak_parser.add_argument("names", nargs="*", metavar="name", help="habits to show (default: all)")
+    streak_parser.add_argument("--today", type=parse_day, help="day to evaluate the streaks on (default: today)")
+
+    list_parser = commands.add_parser("list", parents=[output], help="list the habits")
+    list_parser.add_argument("--periodicity", choices=PERIODICITIES)
+
+    stats_parser = commands.add_parser("stats", parents=[output], help="show habit statistics per periodicity")
+    stats_parser.add_argument("--today", type=parse_day, help="day to count the habits at risk on (default: today)")
+
+    completions_parser = commands.add_parser("completions", parents=[output],
+                                             help="count the completions per day, week or month")
+    completions_parser.add_argument("names", nargs="*", metavar="name",
+                                    help="habits to count (default: all habits together)")
+    completions_parser.add_argument("--bucket", choices=BUCKETS, default="day",
+                                    help="period to count in (default: day)")
+    completions_parser.add_argument("--start", type=parse_day, help="first day, YYYY-MM-DD (default: first completion)")
+    completions_parser.add_argument("--end", type=parse_day, help="last day, YYYY-MM-DD (default: last completion)")
+    completions_parser.add_argument("--periodicity", choices=PERIODICITIES,
+                                    help="count each habit with this periodicity")
+
+    commands.add_parser("rebuild-rollups", help="recompute the completion counts per period from the completions")
+
+    args = parser.parse_args(argv)
+    if args.command in COMMAND_FIELDS:
+        db_connect = get_db(args.db)
+        try:
+            if args.command == "add":
+                rows = add_command(db_connect, args.names, args.periodicity)
+            elif args.command == "complete":
+                rows = complete_command(db_connect, args.names, args.date)
+            elif args.command == "streak":
+                rows = streak_command(db_connect, args.names, args.today)
+            elif args.command == "list":
+                rows = list_command(db_connect, args.periodicity)
+            elif args.command == "completions":
+                rows = completions_command(db_connect, args.names, args.bucket, args.start, args.end, args.periodicity)
+            else:
+                rows = stats_command(db_connect, args.today)
+        except ValueError as e:
+            parser.exit(1, f"Error: {e}\n")
+        finally:
+            db_connect.close()
+        print_rows(rows, COMMAND_FIELDS[args.command], args.format)
+    elif args.command == "import":
+        db_connect = get_db(args.db)
+        fmt = args.format or guess_format(args.file)
+        try:
+            if args.file == "-":
+                habits_added, completions_added = import_habits(db_connect, sys.stdin, fmt)
+            else:
+                with open(args.file, newline="", encoding="utf-8") as lines:
+                    habits_added, completions_added = import_habits(db_connect, lines, fmt)
+        except ValueError as e:
+            parser.exit(1, f"Error: {e}\n")
+        finally:
+            db_connect.close()
+        print(f"Imported {habits_added} habits and {completions_added} completion dates.", file=sys.stderr)
+    elif args.command == "export":
+        db_connect = get_db(args.db)
+        fmt = args.format or guess_format(args.file)
+        try:
+            if args.file == "-":
+                count = export_habits(db_connect, sys.stdout, fmt)
+            else:
+                with open(args.file, "w", newline="", encoding="utf-8") as out:
+                    count = export_habits(db_connect, out, fmt)
+        finally:
+            db_connect.close()
+        print(f"Exported {count} records.", file=sys.stderr)
+    elif args.command == "report":
+        if not os.path.exists(args.db):
+            parser.exit(1, f"Error: database '{args.db}' not found\n")
+        from parallel import streak_report
+        try:
+            report = streak_report(args.db, workers=args.workers)
+        except ValueError as e:
+            parser.exit(1, f"Error: {e}\n")
+        for periodicity, totals in report.items():
+            print(f"{periodicity}: {totals['habits']} habits, {totals['completions']} completion dates, "
+                  f"longest run streak {totals['longest_run_streak']}, "
+                  f"longest current run streak {totals['current_run_streak']}")
+    elif args.command == "rebuild-rollups":
+        db_connect = get_db(args.db)
+        try:
+            rebuild_rollups(db_connect)
+        finally:
+            db_connect.close()
+        print("Rebuilt the completion rollups.", file=sys.stderr)
+    elif args.command == "generate":
+        from datagen import populate
+        db_connect = get_db(args.db)
+        try:
+            habits_added, completions_added = populate(
+                db_connect, habits=args.habits, days=args.days, daily_share=args.daily_share,
+                completion_rate=args.completion_rate, gap_rate=args.gap_rate, out_of_order=args.out_of_order,
+                seed=args.random_seed, prefix=args.prefix)
+        except ValueError as e:
+            parser.exit(1, f"Error: {e}\n")
+        finally:
+            db_connect.close()
+        print(f"Generated {habits_added} habits and {completions_added} completion dates.", file=sys.stderr)
+    else:
+        cli(completion_dates=None, name=None, current_habits=None, seed=args.seed, db_name=args.db)
+
+
 if __name__ == "__main__":
-    cli(completion_dates=None, name=None, current_habits=None)
+    main()
@@ -0,0 +1,146 @@
+import logging
+import os
+import sqlite3
+from array import array
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from streaks import PERIODICITIES, batch_streaks
+from tracing import timed
+
+
+logger = logging.getLogger(__name__)
+
+# Number of id ranges per worker; a few ranges each keep the workers busy when some
+# ranges hold more completions than others
+SLICES_PER_WORKER = 4
+
+# What batch_streaks needs of a habit, without building a Habit object
+_HabitDays = namedtuple("_HabitDays", "periodicity completion_days")
+
+
+def empty_report():
+    """Return a streak report without any habits, see streak_report."""
+    return {periodicity: {"habits": 0, "completions": 0, "longest_run_streak": 0, "current_run_streak": 0}
+            for periodicity in PERIODICITIES}
+
+
+def merge_reports(reports):
+    """
+    Combine the streak reports of disjoint sets of habits.
+
+    :param reports: iterable of reports as returned by slice_streaks.
+    :return: a single report, see streak_report.
+    """
+    merged = empty_report()
+    for report in reports:
+        for periodicity, totals in report.items():
+            target = merged[periodicity]
+            target["habits"] += totals["habits"]
+            target["completions"] += totals["completions"]
+            target["longest_run_streak"] = max(target["longest_run_streak"], totals["longest_run_streak"])
+            target["current_run_streak"] = max(target["current_run_streak"], totals["current_run_streak"])
+    return merged
+
+
+def connect_read_only(path):
+    """Open a database file in read-only URI mode; fails if the file doesn't exist."""
+    return sqlite3.connect(f"{Path(path).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def slice_streaks(path, first_id, last_id):
+    """
+    Compute the streak report of the habits with an id between first_id and last_id.
+
+    Runs in a worker process: it opens its own read-only connection, so the workers read
+    the database side by side, and only the aggregates are sent back to the parent.
+
+    :param path: path of the database file.
+    :param first_id: first habit id of the slice.
+    :param last_id: last habit id of the slice (inclusive).
+    :return: a report, see streak_report.
+    """
+    db_connect = connect_read_only(path)
+    try:
+        cur = db_connect.execute("""SELECT h.periodicity,
+                                      (SELECT group_concat(completed_on) FROM
+                                        (SELECT completed_on FROM completion WHERE habit_id = h.id
+                                         ORDER BY completed_on))
+                                    FROM habit h WHERE h.id BETWEEN ? AND ?""", (first_id, last_id))
+        habits = [_HabitDays(periodicity, array('i', map(int, days.split(','))) if days else array('i'))
+                  for periodicity, days in cur if periodicity in PERIODICITIES]
+    finally:
+        db_connect.close()
+
+    report = empty_report()
+    for habit, (longest, current) in zip(habits, batch_streaks(habits)):
+        totals = report[habit.periodicity]
+        totals["habits"] += 1
+        totals["completions"] += len(habit.completion_days)
+        totals["longest_run_streak"] = max(totals["longest_run_streak"], longest)
+        totals["current_run_streak"] = max(totals["current_run_streak"], current)
+    return report
+
+
+def id_ranges(first_id, last_id, count):
+    """
+    Split the ids first_id..last_id into at most count ranges of (almost) equal width.
+
+    :return: a list of (first_id, last_id) tuples, last_id inclusive.
+    """
+    width = -(-(last_id - first_id + 1) // count)
+    return [(start, min(start + width - 1, last_id)) for start in range(first_id, last_id + 1, width)]
+
+
+@timed
+def streak_report(path, workers=None, slices=None):
+    """
+    Recompute the streaks of every habit from its completions, in parallel.
+
+    The habits are partitioned by id range and every range is read and computed by a
+    separate worker process. Unlike the streak cache this reads only committed data, so
+    it can run next to the tracker, e.g. as a nightly report.
+
+    :param path: path of the database file; an in-memory database can't be shared.
+    :param workers: number of worker processes, the number of CPUs by default. With 1
+                    the slices are computed in this process.
+    :param slices: number of id ranges, SLICES_PER_WORKER per worker by default.
+    :return: a dict mapping each periodicity to a dict with the number of habits and
+             completions, the longest run streak and the longest current run streak.
+    """
+    if path == ":memory:" or not path:
+        raise ValueError("A streak report needs a database file, not an in-memory database.")
+    workers = workers or os.cpu_count() or 1
+    slices = slices or workers * SLICES_PER_WORKER
+    if workers < 1 or slices < 1:
+        raise ValueError("workers and slices must be positive.")
+
+    db_connect = connect_read_only(path)
+    try:
+        first_id, last_id = db_connect.execute("SELECT min(id), max(id) FROM habit").fetchone()
+    finally:
+        db_connect.close()
+    if first_id is None:
+        return empty_report()
+
+    ranges = id_ranges(first_id, last_id, slices)
+    logger.debug("Computing %d habit id ranges with %d workers", len(ranges), workers)
+    paths = [path] * len(ranges)
+    firsts, lasts = zip(*ranges)
+    if workers == 1:
+        return merge_reports(map(slice_streaks, paths, firsts, lasts))
+    with ProcessPoolExecutor(workers) as executor:
+        return merge_reports(executor.map(slice_streaks, paths, firsts, lasts))
+
+
+def longest_run_streak(report, periodicity=None):
+    """
+    Return the longest run streak of a streak report.
+
+    :param report: a report as returned by streak_report.
+    :param periodicity: only consider the habits with this periodicity.
+    """
+    if periodicity is not None and periodicity not in PERIODICITIES:
+        raise ValueError(f"Unknown periodicity: '{periodicity}'. Expected 'Daily' or 'Weekly'.")
+    periodicities = [periodicity] if periodicity else PERIODICITIES
+    return max(report[name]["longest_run_streak"] for name in periodicities)
@@ -0,0 +1,80 @@
+import logging
+import sqlite3
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+# Pragmas applied to every pooled connection. WAL lets readers run next to a writer,
+# synchronous=NORMAL only syncs on checkpoints (safe with WAL), a negative cache_size is in
+# KiB, and mmap_size lets reads go through the page cache of the OS.
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "cache_size": -16000,
+    "mmap_size": 256 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+
+class ConnectionPool:
+    """
+    Hands out one SQLite connection per thread, opened on first use.
+
+    A pool can be passed wherever the db functions, Habit or Tracker take a connection:
+    execute, cursor, commit and the other connection methods run on the connection of the
+    calling thread. Write transactions start with BEGIN IMMEDIATE, so concurrent writers
+    wait for each other (up to busy_timeout) instead of failing half way.
+    """
+
+    def __init__(self, path, **pragmas):
+        """
+        :param path: path of the database file; an in-memory database can't be shared.
+        :param pragmas: pragmas overriding DEFAULT_PRAGMAS, e.g. cache_size=-64000.
+        """
+        if path == ":memory:" or not path:
+            raise ValueError("A connection pool needs a database file, not an in-memory database.")
+        self.path = path
+        self.pragmas = {**DEFAULT_PRAGMAS, **pragmas}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = []
+        self._closed = False
+
+    def connection(self):
+        """Return the connection of the calling thread, opening it on first use."""
+        db_connect = getattr(self._local, "connection", None)
+        if db_connect is None:
+            db_connect = self._open()
+            self._local.connection = db_connect
+        return db_connect
+
+    def _open(self):
+        with self._lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("Cannot operate on a closed connection pool.")
+            # Only the owning thread uses the connection; close() may run on another one
+            db_connect = sqlite3.connect(self.path, timeout=self.pragmas["busy_timeout"] / 1000,
+                                         isolation_level="IMMEDIATE", check_same_thread=False)
+            for name, value in self.pragmas.items():
+                db_connect.execute(f"PRAGMA {name} = {value}")
+            self._connections.append(db_connect)
+        logger.debug("Opened pooled connection %d to %s", len(self._connections), self.path)
+        return db_connect
+
+    def __getattr__(self, name):
+        # execute, executemany, cursor, commit, rollback, total_changes, ...
+        return getattr(self.connection(), name)
+
+    def close(self):
+        """Close the connections of all threads."""
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for db_connect in connections:
+            db_connect.close()
+
+    def __len__(self):
+        """The number of open connections."""
+        return len(self._connections)
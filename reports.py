@@ -0,0 +1,73 @@
+from collections import namedtuple
+from datetime import date
+from storage import get_storage
+from streaks import bucket_index, bucket_start, day_ordinal
+from tracing import timed
+
+# The completions in one bucket; period_start is its first day and habits the number of
+# habits completed in it (0 or 1 in the report of a single habit)
+PeriodCount = namedtuple("PeriodCount", "period_start completions habits")
+
+
+def _bucket_range(bucket, start, end):
+    return (bucket_index(day_ordinal(start), bucket) if start is not None else None,
+            bucket_index(day_ordinal(end), bucket) if end is not None else None)
+
+
+def _series(counts, bucket, first, last):
+    """
+    Turn a dict mapping bucket index to (completions, habits) into a list of PeriodCount.
+
+    With both first and last every bucket from first to last is listed, with zeros where
+    nothing was completed; otherwise only the buckets in counts.
+    """
+    periods = range(first, last + 1) if first is not None and last is not None else sorted(counts)
+    return [PeriodCount(date.fromordinal(bucket_start(period, bucket)), *counts.get(period, (0, 0)))
+            for period in periods]
+
+
+@timed
+def completions_per_period(db_con, bucket="day", start=None, end=None):
+    """
+    Count the completions of all habits per bucket.
+
+    The counts come from the rollups db.py keeps up to date on every write (see
+    db.rebuild_rollups), so a report reads one row per bucket however long the histories are.
+
+    :param db_con: an initialized sqlite3 database connection or a StorageBackend
+    :param bucket: "day", "week" or "month".
+    :param start: first day of the report (datetime, date, ISO formatted string or day
+                  ordinal); the report starts with the bucket it falls in. None starts at
+                  the first completion.
+    :param end: last day of the report, inclusive; None ends at the last completion.
+    :return: a list of PeriodCount, oldest first. When start and end are given every bucket
+             in between is listed, also the ones without completions.
+    """
+    first, last = _bucket_range(bucket, start, end)
+    rows = get_storage(db_con).get_rollup_totals(bucket, first, last)
+    return _series({period: (completions, habits) for period, completions, habits in rows}, bucket, first, last)
+
+
+@timed
+def habit_completions_per_period(db_con, bucket="day", start=None, end=None, name=None, periodicity=None):
+    """
+    Count the completions of every habit per bucket.
+
+    :param db_con: an initialized sqlite3 database connection or a StorageBackend
+    :param bucket: "day", "week" or "month".
+    :param start: see completions_per_period.
+    :param end: see completions_per_period.
+    :param name: only report this habit; raises ValueError if it doesn't exist.
+    :param periodicity: only report the habits with this periodicity.
+    :return: a dict mapping the habit name to its list of PeriodCount, in habit order. Only
+             habits completed in the range are included, except for the named habit.
+    """
+    storage = get_storage(db_con)
+    if name is not None and storage.get_habit(name) is None:
+        raise ValueError(f"Habit '{name}' does not exist.")
+    first, last = _bucket_range(bucket, start, end)
+
+    counts = {} if name is None else {name: {}}
+    for habit_name, period, completions in storage.get_rollups(bucket, first, last, name, periodicity):
+        counts.setdefault(habit_name, {})[period] = (completions, 1)
+    return {habit_name: _series(periods, bucket, first, last) for habit_name, periods in counts.items()}
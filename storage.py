@@ -0,0 +1,337 @@
+import logging
+from array import array
+from collections import Counter
+from datetime import datetime
+from typing import Protocol, runtime_checkable
+import db
+from streaks import BUCKETS, PERIODICITIES, batch_streaks, bucket_index, day_ordinal, period_index, run_streaks
+
+
+logger = logging.getLogger(__name__)
+
+# Names that can't be used for a habit, they would be mistaken for a periodicity
+INVALID_HABIT_NAMES = ["Daily", "Weekly"]
+
+
+@runtime_checkable
+class StorageBackend(Protocol):
+    """
+    The storage operations Habit, Tracker and analyse need.
+
+    Every method mirrors the db function of the same name without its db_connect argument,
+    see SQLiteBackend; habit.load_habits builds Habit objects from load_habit_days.
+    Implementations keep the same semantics: unknown habits raise ValueError on writes and
+    read as None (or empty), completion dates are returned as datetime objects at
+    midnight, and cached streaks are kept up to date on every write.
+    """
+
+    def add_habit(self, habit_data): ...
+
+    def add_completion_dates(self, name, completion_dates): ...
+
+    def get_habit(self, name): ...
+
+    def get_habit_periodicity(self, name): ...
+
+    def get_habits_by_periodicity(self, periodicity): ...
+
+    def get_completion_dates(self, name): ...
+
+    def get_habit_data(self, name): ...
+
+    def load_habit_days(self): ...
+
+    def edit_habit(self, name, new_name=None, new_periodicity=None): ...
+
+    def delete_habit(self, name): ...
+
+    def get_streak_cache(self, name): ...
+
+    def get_cached_longest_run_streak(self, periodicity=None): ...
+
+    def compute_longest_run_streak(self, periodicity=None): ...
+
+    def set_longest_run_streak(self, name, longest_run_streak): ...
+
+    def get_rollups(self, bucket, start=None, end=None, name=None, periodicity=None): ...
+
+    def get_rollup_totals(self, bucket, start=None, end=None): ...
+
+    def commit(self): ...
+
+    def close(self): ...
+
+
+class SQLiteBackend:
+    """
+    Storage backed by a SQLite database, a thin wrapper around the db functions.
+    """
+
+    def __init__(self, db_connect):
+        """
+        :param db_connect: sqlite3.Connection or ConnectionPool.
+        """
+        if not isinstance(db_connect, db.CONNECTION_TYPES):
+            raise TypeError("Expected a sqlite3.Connection or ConnectionPool object")
+        self.db_connect = db_connect
+
+    def add_habit(self, habit_data):
+        db.add_habit(self.db_connect, habit_data)
+
+    def add_completion_dates(self, name, completion_dates):
+        db.add_completion_dates(self.db_connect, name, completion_dates)
+
+    def get_habit(self, name):
+        return db.get_habit(self.db_connect, name)
+
+    def get_habit_periodicity(self, name):
+        return db.get_habit_periodicity(self.db_connect, name)
+
+    def get_habits_by_periodicity(self, periodicity):
+        return db.get_habits_by_periodicity(self.db_connect, periodicity)
+
+    def get_completion_dates(self, name):
+        return db.get_completion_dates(self.db_connect, name)
+
+    def get_habit_data(self, name):
+        return db.get_habit_data(self.db_connect, name)
+
+    def load_habit_days(self):
+        return db.load_habit_days(self.db_connect)
+
+    def edit_habit(self, name, new_name=None, new_periodicity=None):
+        db.edit_habit(self.db_connect, name, new_name, new_periodicity)
+
+    def delete_habit(self, name):
+        db.delete_habit(self.db_connect, name)
+
+    def get_streak_cache(self, name):
+        return db.get_streak_cache(self.db_connect, name)
+
+    def get_cached_longest_run_streak(self, periodicity=None):
+        return db.get_cached_longest_run_streak(self.db_connect, periodicity)
+
+    def compute_longest_run_streak(self, periodicity=None):
+        return db.compute_longest_run_streak(self.db_connect, periodicity)
+
+    def set_longest_run_streak(self, name, longest_run_streak):
+        db.set_longest_run_streak(self.db_connect, name, longest_run_streak)
+
+    def get_rollups(self, bucket, start=None, end=None, name=None, periodicity=None):
+        return db.get_rollups(self.db_connect, bucket, start, end, name, periodicity)
+
+    def get_rollup_totals(self, bucket, start=None, end=None):
+        return db.get_rollup_totals(self.db_connect, bucket, start, end)
+
+    def commit(self):
+        self.db_connect.commit()
+
+    def close(self):
+        self.db_connect.close()
+
+
+class _StoredHabit:
+    """A habit held by MemoryBackend: its sorted completion days and cached streaks."""
+
+    __slots__ = ("periodicity", "completion_days", "longest_run_streak", "current_run_streak")
+
+    def __init__(self, periodicity):
+        self.periodicity = periodicity
+        self.completion_days = array('i')
+        self.longest_run_streak = 0
+        self.current_run_streak = 0
+
+    def rebuild_streaks(self):
+        periods = [period_index(day, self.periodicity) for day in self.completion_days]
+        self.longest_run_streak, self.current_run_streak = run_streaks(periods)
+
+
+class MemoryBackend:
+    """
+    Storage kept in process memory, for tests and benchmarks that don't need a database.
+
+    Habits are kept in insertion order like the ids of the habit table, each with its
+    completion days as a sorted array of day ordinals. Nothing is persisted: commit is a
+    no-op and close drops every habit.
+    """
+
+    def __init__(self):
+        self._habits = {}
+
+    def __len__(self):
+        return len(self._habits)
+
+    def _get(self, name):
+        stored = self._habits.get(name)
+        if stored is None:
+            raise ValueError(f"Habit '{name}' does not exist.")
+        return stored
+
+    def add_habit(self, habit_data):
+        """
+        Add habits, or change the periodicity of existing ones.
+
+        :param habit_data: list of (habit_name, periodicity) tuples, or habit names of
+                           existing habits, as taken by db.add_habit.
+        """
+        rows = []
+        for habit in habit_data:
+            name, periodicity = habit if isinstance(habit, tuple) else (habit, None)
+            if name in INVALID_HABIT_NAMES:
+                raise ValueError(f"Habit names cannot be '{name}'.")
+            if periodicity is None:
+                if name not in self._habits:
+                    raise ValueError(f"Periodicity must be provided for new habit: {name}")
+                continue
+            if periodicity not in PERIODICITIES:
+                raise ValueError(f"Invalid periodicity: '{periodicity}'. Expected 'Daily' or 'Weekly'.")
+            rows.append((name, periodicity))
+
+        for name, periodicity in rows:
+            stored = self._habits.get(name)
+            if stored is None:
+                self._habits[name] = _StoredHabit(periodicity)
+            elif stored.periodicity != periodicity:
+                stored.periodicity = periodicity
+                stored.rebuild_streaks()  # Streaks depend on the periodicity
+
+    def add_completion_dates(self, name, completion_dates):
+        """
+        Record completion dates of a habit; dates already recorded are ignored.
+
+        Dates after the last completion extend the cached streaks period by period, a
+        backfilled date recomputes them from the completion days.
+        """
+        if isinstance(completion_dates, datetime):
+            completion_dates = [completion_dates]
+        stored = self._get(name)
+        days = sorted({day_ordinal(date) for date in completion_dates})
+        if not days:
+            return
+        completion_days = stored.completion_days
+        if completion_days and days[0] <= completion_days[-1]:
+            # Backfilled dates: merge and recompute the runs
+            stored.completion_days = array('i', sorted(set(completion_days).union(days)))
+            stored.rebuild_streaks()
+            return
+
+        # Appended dates extend the current run period by period
+        previous = period_index(completion_days[-1], stored.periodicity) if completion_days else None
+        for day in days:
+            period = period_index(day, stored.periodicity)
+            if period == previous:
+                continue
+            stored.current_run_streak = stored.current_run_streak + 1 if previous == period - 1 else 1
+            stored.longest_run_streak = max(stored.longest_run_streak, stored.current_run_streak)
+            previous = period
+        completion_days.extend(days)
+
+    def get_habit(self, name):
+        stored = self._habits.get(name)
+        return (name, stored.periodicity) if stored is not None else None
+
+    def get_habit_periodicity(self, name):
+        stored = self._habits.get(name)
+        return stored.periodicity if stored is not None else None
+
+    def get_habits_by_periodicity(self, periodicity):
+        return [name for name, stored in self._habits.items() if stored.periodicity == periodicity]
+
+    def get_completion_dates(self, name):
+        stored = self._habits.get(name)
+        if stored is None:
+            return []
+        return [datetime.fromordinal(day) for day in stored.completion_days]
+
+    def get_habit_data(self, name):
+        return ([date.isoformat() for date in self.get_completion_dates(name)],
+                self.get_habit_periodicity(name))
+
+    def load_habit_days(self):
+        # Each habit gets its own copy of the completion days, as if loaded from a database
+        return [(name, stored.periodicity, array('i', stored.completion_days))
+                for name, stored in self._habits.items()]
+
+    def edit_habit(self, name, new_name=None, new_periodicity=None):
+        # Everything is checked before the habit is changed, like db.edit_habit
+        if new_periodicity and new_periodicity not in PERIODICITIES:
+            raise ValueError(f"Invalid periodicity: '{new_periodicity}'. Expected 'Daily' or 'Weekly'.")
+        stored = self._get(name)
+        if new_name and new_name != name and new_name in self._habits:
+            raise ValueError(f"Habit '{new_name}' already exists.")
+        if new_periodicity:
+            stored.periodicity = new_periodicity
+            stored.rebuild_streaks()
+        if new_name and new_name != name:
+            # Rebuild the dict so the renamed habit keeps its position
+            self._habits = {new_name if key == name else key: value for key, value in self._habits.items()}
+
+    def delete_habit(self, name):
+        self._habits.pop(name, None)
+
+    def get_streak_cache(self, name):
+        stored = self._habits.get(name)
+        if stored is None:
+            return None
+        last_completion = (datetime.fromordinal(stored.completion_days[-1]).isoformat()
+                           if stored.completion_days else None)
+        return stored.longest_run_streak, stored.current_run_streak, last_completion
+
+    def _select(self, periodicity):
+        return [stored for stored in self._habits.values()
+                if periodicity is None or stored.periodicity == periodicity]
+
+    def get_cached_longest_run_streak(self, periodicity=None):
+        return max((stored.longest_run_streak for stored in self._select(periodicity)), default=0)
+
+    def compute_longest_run_streak(self, periodicity=None):
+        streaks = batch_streaks(self._select(periodicity))
+        return (max((longest for longest, current in streaks), default=0),
+                max((current for longest, current in streaks), default=0))
+
+    def set_longest_run_streak(self, name, longest_run_streak):
+        self._get(name).longest_run_streak = longest_run_streak
+
+    def get_rollups(self, bucket, start=None, end=None, name=None, periodicity=None):
+        # Nothing is rolled up in memory, the completion days are counted on every call
+        if bucket not in BUCKETS:
+            raise ValueError(f"Unknown bucket: '{bucket}'. Expected 'day', 'week' or 'month'.")
+        rows = []
+        for habit_name, stored in self._habits.items():
+            if (name is not None and habit_name != name) or (periodicity is not None
+                                                             and stored.periodicity != periodicity):
+                continue
+            counts = Counter(bucket_index(day, bucket) for day in stored.completion_days)
+            rows.extend((habit_name, period, counts[period]) for period in sorted(counts)
+                        if (start is None or period >= start) and (end is None or period <= end))
+        return rows
+
+    def get_rollup_totals(self, bucket, start=None, end=None):
+        completions, habits = Counter(), Counter()
+        for habit_name, period, count in self.get_rollups(bucket, start, end):
+            completions[period] += count
+            habits[period] += 1
+        return [(period, completions[period], habits[period]) for period in sorted(completions)]
+
+    def commit(self):
+        return None
+
+    def close(self):
+        self._habits.clear()
+
+
+def get_storage(db_or_storage):
+    """
+    Return the storage backend for a connection, or the backend itself.
+
+    Habit, Tracker and analyse call this on whatever they were given, so they work the
+    same on a database connection and on any StorageBackend such as MemoryBackend.
+
+    :param db_or_storage: sqlite3.Connection, ConnectionPool or StorageBackend.
+    :return: a StorageBackend.
+    """
+    if isinstance(db_or_storage, db.CONNECTION_TYPES):
+        return SQLiteBackend(db_or_storage)
+    if isinstance(db_or_storage, StorageBackend):
+        return db_or_storage
+    raise TypeError("Expected a sqlite3.Connection, ConnectionPool or StorageBackend object")
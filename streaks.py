@@ -0,0 +1,337 @@
+from collections import Counter, namedtuple
+from datetime import date
+from enum import Enum
+from tracing import timed
+
+# NumPy is optional and slow to import, so it is only imported when a batch function first
+# runs; without it they fall back to pure Python
+np = None
+_numpy_missing = False
+
+
+class Periodicity(Enum):
+    """Periodicity of a habit; the value is the name stored in the database."""
+    DAILY = "Daily"
+    WEEKLY = "Weekly"
+
+
+PERIODICITIES = [periodicity.value for periodicity in Periodicity]
+
+# Periods the completions are counted in by the rollups, see db.rebuild_rollups
+BUCKETS = ["day", "week", "month"]
+
+# Day ordinal of 1970-01-01, the epoch of numpy.datetime64
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# The streak of a habit as of a given day, see streak_status
+StreakStatus = namedtuple("StreakStatus", "name periodicity current_run_streak days_remaining at_risk")
+
+
+def day_ordinal(value):
+    """
+    Convert a completion date to its proleptic Gregorian day ordinal.
+
+    :param value: datetime, date, ISO formatted string or a day ordinal, returned as is.
+    :return: the day ordinal as an int, where 0001-01-01 is day 1.
+    """
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str):
+        return date.fromisoformat(value.strip()[:10]).toordinal()
+    # datetime.toordinal ignores the time of day
+    return value.toordinal()
+
+
+def period_index(day, periodicity):
+    """
+    Return the index of the period a day falls in.
+
+    Daily habits use the day itself and Weekly habits the ISO week (Monday to Sunday),
+    so two completions extend a run when their periods are consecutive.
+
+    :param day: day ordinal as returned by day_ordinal.
+    :param periodicity: "Daily" or "Weekly".
+    :return: the period index as an int.
+    """
+    if periodicity == "Daily":
+        return day
+    if periodicity == "Weekly":
+        # Day ordinal 1 (0001-01-01) is a Monday
+        return (day - 1) // 7
+    raise ValueError(f"Unknown periodicity: '{periodicity}'. Expected 'Daily' or 'Weekly'.")
+
+
+def period_end(day, periodicity):
+    """
+    Return the last day of the period a day falls in.
+
+    :param day: day ordinal as returned by day_ordinal.
+    :param periodicity: "Daily" or "Weekly".
+    :return: the day ordinal of the last day (the Sunday for Weekly habits).
+    """
+    if periodicity == "Weekly":
+        return period_index(day, periodicity) * 7 + 7
+    return period_index(day, periodicity)
+
+
+def bucket_index(day, bucket):
+    """
+    Return the index of the day, ISO week or calendar month a day falls in.
+
+    Indexes of consecutive buckets are consecutive, so a range of buckets is a range of
+    indexes. Weeks are numbered like the periods of Weekly habits, months as
+    year * 12 + month - 1.
+
+    :param day: day ordinal as returned by day_ordinal.
+    :param bucket: "day", "week" or "month".
+    :return: the bucket index as an int.
+    """
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        return (day - 1) // 7
+    if bucket == "month":
+        value = date.fromordinal(day)
+        return value.year * 12 + value.month - 1
+    raise ValueError(f"Unknown bucket: '{bucket}'. Expected 'day', 'week' or 'month'.")
+
+
+def bucket_start(index, bucket):
+    """
+    Return the first day of a bucket, the inverse of bucket_index.
+
+    :param index: bucket index as returned by bucket_index.
+    :param bucket: "day", "week" or "month".
+    :return: the day ordinal of the first day (the Monday for weeks).
+    """
+    if bucket == "day":
+        return index
+    if bucket == "week":
+        return index * 7 + 1
+    if bucket == "month":
+        return date(index // 12, index % 12 + 1, 1).toordinal()
+    raise ValueError(f"Unknown bucket: '{bucket}'. Expected 'day', 'week' or 'month'.")
+
+
+def bucket_counts(days, bucket):
+    """
+    Count day ordinals per bucket.
+
+    :param days: day ordinals, oldest first.
+    :param bucket: "day", "week" or "month".
+    :return: a dict mapping the bucket index to the number of days in it, oldest first.
+    """
+    if bucket == "day":
+        return dict(Counter(days))
+    if bucket == "week":
+        return dict(Counter((day - 1) // 7 for day in days))
+    if bucket == "month":
+        # The days are sorted, so the month only has to be worked out when a new one starts
+        counts = {}
+        month = next_month = None
+        for day in days:
+            if next_month is None or day >= next_month:
+                month = bucket_index(day, "month")
+                next_month = bucket_start(month + 1, "month")
+                counts[month] = 0
+            counts[month] += 1
+        return counts
+    raise ValueError(f"Unknown bucket: '{bucket}'. Expected 'day', 'week' or 'month'.")
+
+
+def streak_status(name, periodicity, current_run_streak, last_completion, today):
+    """
+    Work out the live streak of a habit from its cached streak.
+
+    The run ending at the last completion is still alive while the habit was completed in
+    the current or the previous period. When it was last completed in the previous period
+    the streak is at risk: it breaks unless the habit is completed in the days remaining.
+
+    :param name: name of the habit.
+    :param periodicity: "Daily" or "Weekly".
+    :param current_run_streak: the run ending at last_completion.
+    :param last_completion: day ordinal of the last completion, None if there is none.
+    :param today: day ordinal of the day to evaluate the streak on.
+    :return: a StreakStatus; days_remaining counts today.
+    """
+    period = period_index(today, periodicity)
+    days_remaining = period_end(today, periodicity) - today + 1
+    last_period = period_index(last_completion, periodicity) if last_completion is not None else None
+    if last_period is None or last_period < period - 1:
+        return StreakStatus(name, periodicity, 0, days_remaining, False)
+    return StreakStatus(name, periodicity, current_run_streak or 0, days_remaining, last_period == period - 1)
+
+
+def run_streaks(periods):
+    """
+    Compute the longest run and the run ending at the last period.
+
+    :param periods: period indexes sorted oldest first; repeated periods are allowed.
+    :return: a tuple (longest_run_streak, current_run_streak).
+    """
+    longest_run_streak = 0
+    current_run_streak = 0
+    previous = None
+    for period in periods:
+        if period == previous:
+            continue
+        if previous is not None and period == previous + 1:
+            current_run_streak += 1
+        else:
+            current_run_streak = 1
+        longest_run_streak = max(longest_run_streak, current_run_streak)
+        previous = period
+    return longest_run_streak, current_run_streak
+
+
+def habit_days(habit):
+    """
+    Return the completion dates of a habit as day ordinals.
+
+    :param habit: Habit object (anything with completion_dates); the compact completion_days
+                  array of a Habit is used as is.
+    :return: a sequence of day ordinals.
+    """
+    days = getattr(habit, "completion_days", None)
+    if days is None:
+        days = [day_ordinal(value) for value in habit.completion_dates]
+    return days
+
+
+def completion_streaks(completion_dates, periodicity):
+    """
+    Compute the longest and current run streak of a list of completion dates.
+
+    :param completion_dates: datetime, date, ISO formatted strings or day ordinals in any order.
+    :param periodicity: "Daily" or "Weekly".
+    :return: a tuple (longest_run_streak, current_run_streak).
+    """
+    periods = sorted(period_index(day_ordinal(value), periodicity) for value in completion_dates)
+    return run_streaks(periods)
+
+
+@timed
+def batch_streaks(habits, use_numpy=None):
+    """
+    Compute the longest and current run streak of many habits at once.
+
+    With NumPy the completion dates of all habits are packed into one int32 array of
+    period indexes and every run is found in a single vectorized pass.
+
+    :param habits: Habit objects (anything with periodicity and completion_dates).
+    :param use_numpy: force (True) or disable (False) the NumPy engine; by default it is
+                      used when NumPy is installed.
+    :return: a list of tuples (longest_run_streak, current_run_streak), one per habit.
+    """
+    habits = list(habits)
+    if _numpy_enabled(use_numpy):
+        owner, periods = _pack(habits)
+        longest, current = _numpy_run_streaks(owner, periods, len(habits))
+        return list(zip(longest.tolist(), current.tolist()))
+    return [completion_streaks(habit_days(habit), habit.periodicity) for habit in habits]
+
+
+def gap_histogram(habits, use_numpy=None):
+    """
+    Count the gaps between consecutive completions of many habits.
+
+    A gap is measured in periods (days or weeks), so a gap of 1 continues a run and a gap
+    of 3 means two periods were missed. Repeated completions within a period are ignored.
+
+    :param habits: Habit objects (anything with periodicity and completion_dates).
+    :param use_numpy: see batch_streaks.
+    :return: a dict mapping the gap length to the number of times it occurs.
+    """
+    habits = list(habits)
+    if _numpy_enabled(use_numpy):
+        owner, periods = _dedupe(*_sort(*_pack(habits)))
+        same_habit = owner[1:] == owner[:-1]
+        gaps, counts = np.unique(np.diff(periods)[same_habit], return_counts=True)
+        return dict(zip(gaps.tolist(), counts.tolist()))
+
+    histogram = Counter()
+    for habit in habits:
+        periods = sorted({period_index(day, habit.periodicity) for day in habit_days(habit)})
+        histogram.update(b - a for a, b in zip(periods, periods[1:]))
+    return dict(sorted(histogram.items()))
+
+
+def has_numpy():
+    """Import NumPy on first use; return whether it is installed."""
+    global np, _numpy_missing
+    if np is None and not _numpy_missing:
+        try:
+            import numpy as np
+        except ImportError:
+            _numpy_missing = True
+    return np is not None
+
+
+def _numpy_enabled(use_numpy):
+    if use_numpy is None:
+        return has_numpy()
+    if use_numpy and not has_numpy():
+        raise ImportError("NumPy is required for use_numpy=True")
+    return use_numpy
+
+
+def _pack(habits):
+    """Pack the completion dates of all habits into (owner, period) int32 arrays."""
+    for habit in habits:
+        if habit.periodicity not in PERIODICITIES:
+            raise ValueError(f"Unknown periodicity: '{habit.periodicity}'. Expected 'Daily' or 'Weekly'.")
+
+    if all(hasattr(habit, "completion_days") for habit in habits):
+        # The day ordinal arrays of Habit objects are copied into one buffer as they are
+        counts = [len(habit.completion_days) for habit in habits]
+        days = np.frombuffer(b"".join(habit.completion_days.tobytes() for habit in habits), dtype=np.intc)
+        days = days.astype(np.int32)
+    else:
+        counts = [len(habit.completion_dates) for habit in habits]
+        dates = [value for habit in habits for value in habit.completion_dates]
+        days = np.array(dates, dtype="datetime64[D]").astype(np.int32) + np.int32(EPOCH_ORDINAL)
+    owner = np.repeat(np.arange(len(habits), dtype=np.int32), counts)
+    weekly = np.array([habit.periodicity == "Weekly" for habit in habits], dtype=bool)[owner]
+    # Same period indexes as period_index
+    periods = np.where(weekly, (days - 1) // 7, days).astype(np.int32)
+    return owner, periods
+
+
+def _sort(owner, periods):
+    order = np.lexsort((periods, owner))
+    return owner[order], periods[order]
+
+
+def _dedupe(owner, periods):
+    """Drop repeated periods of a habit from arrays sorted by (owner, period)."""
+    keep = np.ones(len(periods), dtype=bool)
+    keep[1:] = (owner[1:] != owner[:-1]) | (periods[1:] != periods[:-1])
+    return owner[keep], periods[keep]
+
+
+def _numpy_run_streaks(owner, periods, habit_count):
+    longest = np.zeros(habit_count, dtype=np.int64)
+    current = np.zeros(habit_count, dtype=np.int64)
+    if not len(periods):
+        return longest, current
+
+    owner, periods = _dedupe(*_sort(owner, periods))
+
+    # A run starts at the first period of a habit and after every gap
+    run_start = np.ones(len(periods), dtype=bool)
+    run_start[1:] = (owner[1:] != owner[:-1]) | (np.diff(periods) != 1)
+    starts = np.flatnonzero(run_start)
+    run_lengths = np.diff(np.append(starts, len(periods)))
+    run_owner = owner[starts]
+
+    # Runs are grouped by habit: reduce each group for the longest run, take its last run
+    # as the current one
+    first_run = np.ones(len(starts), dtype=bool)
+    first_run[1:] = run_owner[1:] != run_owner[:-1]
+    first = np.flatnonzero(first_run)
+    longest[run_owner[first]] = np.maximum.reduceat(run_lengths, first)
+
+    last_run = np.ones(len(starts), dtype=bool)
+    last_run[:-1] = run_owner[1:] != run_owner[:-1]
+    current[run_owner[last_run]] = run_lengths[last_run]
+    return longest, current
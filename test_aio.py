@@ -0,0 +1,77 @@
+from datetime import datetime
+from aio import AsyncHabitStore
+import asyncio
+import pytest
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "aio.db")
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class TestAsyncHabitStore:
+
+    def test_round_trip(self, db_path):
+        async def scenario():
+            async with AsyncHabitStore(db_path) as store:
+                await store.add_habit([("Study", "Daily"), ("Laundry", "Weekly")])
+                await store.add_completion_dates("Study", [datetime(2025, 4, d) for d in [1, 2, 3]])
+                await store.add_completion_dates("Laundry", [datetime(2025, 4, 1), datetime(2025, 4, 8)])
+                assert await store.get_completion_dates("Study") == [datetime(2025, 4, d) for d in [1, 2, 3]]
+                assert await store.get_streak("Study") == (3, 3, "2025-04-03T00:00:00")
+                assert await store.get_longest_run_streak_all_habits() == 3
+                assert await store.get_longest_run_streak_by_periodicity("Weekly") == 2
+
+                await store.edit_habit("Study", new_name="Reading")
+                await store.delete_habit("Laundry")
+                habits = await store.get_current_habits()
+                assert [(habit.name, len(habit.completion_dates)) for habit in habits] == [("Reading", 3)]
+
+                with pytest.raises(ValueError):
+                    await store.add_completion_dates("Unknown", [datetime(2025, 4, 1)])
+
+        run(scenario())
+
+    def test_concurrent_reads_are_coalesced(self, db_path):
+        async def scenario():
+            async with AsyncHabitStore(db_path) as store:
+                await store.add_habit([("Study", "Daily")])
+                await store.add_completion_dates("Study", [datetime(2025, 4, 1)])
+
+                results = await asyncio.gather(*(store.get_streak("Study") for _ in range(1000)))
+                assert set(results) == {(1, 1, "2025-04-01T00:00:00")}
+                assert (store.queries, store.coalesced) == (1, 999)
+
+                # Different reads are not merged
+                await asyncio.gather(store.get_streak("Study"), store.get_completion_dates("Study"))
+                assert store.queries == 3
+
+        run(scenario())
+
+    def test_reads_after_a_write_see_it(self, db_path):
+        async def scenario():
+            async with AsyncHabitStore(db_path) as store:
+                await store.add_habit([("Study", "Daily")])
+                before = asyncio.ensure_future(store.get_completion_dates("Study"))
+                await store.add_completion_dates("Study", [datetime(2025, 4, 1)])
+                after = await store.get_completion_dates("Study")
+                assert after == [datetime(2025, 4, 1)]
+                await before
+
+        run(scenario())
+
+    def test_cancelled_caller_does_not_cancel_the_read(self, db_path):
+        async def scenario():
+            async with AsyncHabitStore(db_path) as store:
+                await store.add_habit([("Study", "Daily")])
+                first = asyncio.ensure_future(store.get_streak("Study"))
+                second = asyncio.ensure_future(store.get_streak("Study"))
+                await asyncio.sleep(0)
+                first.cancel()
+                assert await second == (0, 0, None)
+
+        run(scenario())
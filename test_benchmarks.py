@@ -0,0 +1,31 @@
+import json
+from benchmarks.suite import compare, main, read_results, run_suite
+
+
+def test_compare_flags_slowdowns_beyond_the_threshold():
+    baseline = {"load[1000]": 0.100, "fast[1000]": 0.001, "removed[1000]": 0.1}
+    results = {"load[1000]": 0.200, "fast[1000]": 0.003, "new[1000]": 0.1}
+    rows = {case: regressed for case, before, seconds, ratio, regressed in compare(results, baseline, 0.5)}
+    # fast only got 2 ms slower, below the noise floor; new and removed have nothing to compare
+    assert rows == {"load[1000]": True, "fast[1000]": False}
+    assert not any(row[4] for row in compare(results, baseline, threshold=1.5))
+
+
+def test_suite_writes_results_and_fails_on_regressions(tmp_path, capsys):
+    results = run_suite([100], repeat=1)
+    assert {case.split("/")[0] for case in results} == {"write", "load", "streaks", "startup"}
+    assert all(case.endswith("[100]") and seconds >= 0 for case, seconds in results.items())
+
+    output, baseline = tmp_path / "results.json", tmp_path / "baseline.json"
+    assert main(["--sizes", "100", "--repeat", "1", "--output", str(output), "--baseline", str(baseline),
+                 "--save-baseline"]) == 0
+    assert json.loads(output.read_text())["sizes"] == [100]
+    assert read_results(baseline).keys() == results.keys()
+
+    # A baseline ten times faster than reality
+    document = json.loads(baseline.read_text())
+    document["results"] = {case: seconds / 10 for case, seconds in document["results"].items()}
+    baseline.write_text(json.dumps(document))
+    assert main(["--sizes", "100", "--repeat", "1", "--output", str(output), "--baseline", str(baseline),
+                 "--min-delta", "0"]) == 1
+    assert "REGRESSION" in capsys.readouterr().out
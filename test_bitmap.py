@@ -0,0 +1,54 @@
+from datetime import date, datetime
+from bitmap import CompletionBitmap, intersection, union
+import random
+
+
+class TestCompletionBitmap:
+
+    def test_membership(self):
+        bitmap = CompletionBitmap.from_days([datetime(2025, 4, 3), date(2025, 4, 1), "2025-04-20"])
+        assert date(2025, 4, 1) in bitmap
+        assert datetime(2025, 4, 3, 18, 30) in bitmap
+        assert date(2025, 4, 20).toordinal() in bitmap
+        assert date(2025, 4, 2) not in bitmap
+        assert date(2024, 4, 1) not in bitmap
+        assert date(2026, 4, 1) not in bitmap
+        assert bitmap.first_day % 8 == 0
+        assert len(bitmap) == 3
+
+    def test_add_grows_both_ways(self):
+        bitmap = CompletionBitmap()
+        assert bitmap.add(date(2025, 4, 10))
+        assert not bitmap.add(date(2025, 4, 10))
+        assert bitmap.add(date(2025, 1, 1))
+        assert bitmap.add(date(2025, 12, 31))
+        assert list(bitmap) == [date(2025, m, d).toordinal() for m, d in [(1, 1), (4, 10), (12, 31)]]
+        assert CompletionBitmap(bitmap.first_day, bytes(bitmap.bits)) == bitmap
+
+    def test_matches_a_set(self):
+        rng = random.Random(5)
+        days = {739000 + rng.randrange(1000) for _ in range(300)}
+        bitmap = CompletionBitmap()
+        for day in rng.sample(sorted(days), len(days)):
+            bitmap.add(day)
+        assert list(bitmap) == sorted(days)
+        assert bitmap == CompletionBitmap.from_days(days)
+        for _ in range(50):
+            start = 739000 + rng.randrange(-10, 1010)
+            end = start + rng.randrange(-5, 400)
+            assert bitmap.count(start, end) == sum(start <= day <= end for day in days)
+        assert bitmap.count() == len(days)
+        assert bitmap.count(end=738000) == 0
+
+    def test_intersection_and_union(self):
+        first = CompletionBitmap.from_days([date(2025, 4, d) for d in [1, 2, 3, 10]])
+        second = CompletionBitmap.from_days([date(2025, 4, d) for d in [2, 3, 4, 20]])
+        third = CompletionBitmap.from_days([date(2025, 3, 1), date(2025, 4, 3)])
+
+        assert list(intersection([first, second, third])) == [date(2025, 4, 3).toordinal()]
+        assert list(first & second) == [date(2025, 4, d).toordinal() for d in [2, 3]]
+        assert list(first | third) == sorted(set(first) | set(third))
+        assert len(union([first, second, third])) == 7
+        assert not intersection([first, CompletionBitmap()])
+        assert not intersection([first, CompletionBitmap.from_days([date(2026, 1, 1)])])
+        assert not union([])
@@ -0,0 +1,119 @@
+from datetime import datetime
+from cache import LRUCache, HabitCache
+from db import (get_db, add_habit, add_habits_bulk, add_completions_bulk, add_completion_dates, edit_habit,
+                delete_habit, add_habit_with_periodicity)
+import db
+import pytest
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "cache.db")
+    db_connect = get_db(path)
+    add_habit(db_connect, [("Study", "Daily"), ("Laundry", "Weekly")])
+    add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1), datetime(2025, 4, 2)])
+    db_connect.close()
+    return path
+
+
+@pytest.fixture
+def db_connect(db_path):
+    db_connect = get_db(db_path)
+    yield db_connect
+    db_connect.close()
+
+
+@pytest.fixture
+def cache(db_connect):
+    cache = HabitCache(db_connect, check_interval=0)
+    yield cache
+    cache.close()
+
+
+class TestLRUCache:
+
+    def test_evicts_the_least_recently_used_entry(self):
+        lru = LRUCache(2)
+        lru.put("a", 1)
+        lru.put("b", 2)
+        assert lru.get("a") == 1  # "b" is now the least recently used
+        lru.put("c", 3)
+        assert "b" not in lru and len(lru) == 2
+        assert lru.get("b", "missing") == "missing"
+        assert (lru.hits, lru.misses, lru.evictions) == (1, 1, 1)
+
+    def test_invalid_size(self):
+        with pytest.raises(ValueError):
+            LRUCache(0)
+
+
+class TestHabitCache:
+
+    def test_reads_are_cached(self, cache):
+        assert cache.get_habit_periodicity("Laundry") == "Weekly"
+        assert cache.get_habit_periodicity("Laundry") == "Weekly"
+        assert cache.get_habit("Study") == ("Study", "Daily")
+        assert cache.get_completion_dates("Study") == [datetime(2025, 4, 1), datetime(2025, 4, 2)]
+        assert cache.get_habits_by_periodicity("Daily") == ["Study"]
+        assert cache.get_habit("Unknown") is None
+        assert cache.get_habit("Unknown") is None
+        assert (cache.hits, cache.misses) == (2, 5)
+
+    def test_returned_lists_are_copies(self, cache):
+        cache.get_completion_dates("Study").append(datetime(2025, 4, 3))
+        assert cache.get_completion_dates("Study") == [datetime(2025, 4, 1), datetime(2025, 4, 2)]
+
+    def test_check_in_only_drops_the_completion_dates(self, cache, db_connect):
+        cache.get_completion_dates("Study")
+        cache.get_habit_periodicity("Study")
+        cache.get_habits_by_periodicity("Daily")
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, 3)])
+        assert len(cache.get_completion_dates("Study")) == 3
+        cache.get_habit_periodicity("Study")
+        cache.get_habits_by_periodicity("Daily")
+        assert (cache.hits, cache.misses) == (2, 4)
+
+    def test_writes_invalidate_their_habits(self, cache, db_connect):
+        assert cache.get_habit("Reading") is None
+        add_habit(db_connect, [("Reading", "Weekly")])
+        assert cache.get_habit("Reading") == ("Reading", "Weekly")
+        assert cache.get_habits_by_periodicity("Weekly") == ["Laundry", "Reading"]
+
+        edit_habit(db_connect, "Laundry", new_name="Washing", new_periodicity="Daily")
+        assert cache.get_habit_periodicity("Laundry") is None
+        assert cache.get_habit_periodicity("Washing") == "Daily"
+        assert cache.get_habits_by_periodicity("Weekly") == ["Reading"]
+
+        delete_habit(db_connect, "Study")
+        assert cache.get_habit("Study") is None
+        assert cache.get_completion_dates("Study") == []
+
+        add_habits_bulk(db_connect, [("Cooking", "Daily")])
+        add_completions_bulk(db_connect, [("Cooking", datetime(2025, 4, 1))])
+        assert cache.get_habits_by_periodicity("Daily") == ["Washing", "Cooking"]
+        assert cache.get_completion_dates("Cooking") == [datetime(2025, 4, 1)]
+
+    def test_insert_with_periodicity_invalidates_the_new_habits(self, cache, db_connect):
+        assert cache.get_habit("Reading") is None
+        assert cache.get_habits_by_periodicity("Weekly") == ["Laundry"]
+        add_habit_with_periodicity(db_connect, [("Reading", "Weekly"), ("Study", "Weekly")])
+        assert cache.get_habit("Reading") == ("Reading", "Weekly")
+        assert cache.get_habits_by_periodicity("Weekly") == ["Laundry", "Reading"]
+        # Existing habits are left alone
+        assert cache.get_habit_periodicity("Study") == "Daily"
+
+    def test_writes_through_other_connections(self, cache, db_path):
+        assert cache.get_habit_periodicity("Study") == "Daily"
+        other = get_db(db_path)
+        edit_habit(other, "Study", new_periodicity="Weekly")
+        other.close()
+        assert cache.get_habit_periodicity("Study") == "Weekly"
+
+    def test_closed_cache_stops_listening(self, cache):
+        assert cache in db._write_listeners
+        cache.close()
+        assert cache not in db._write_listeners
+
+    def test_invalid_connection(self):
+        with pytest.raises(TypeError):
+            HabitCache("main.db")
@@ -0,0 +1,90 @@
+from datetime import date
+from bitmap import CompletionBitmap
+from datagen import generate_history, populate
+from db import (get_db, add_habit, compute_streaks, get_streak_cache, get_completion_bitmap, get_completion_dates,
+                get_rollup_totals, get_rollups, rebuild_rollups)
+from streaks import BUCKETS, period_index, run_streaks
+import pytest
+
+
+@pytest.fixture
+def db_connect(tmp_path):
+    db_connect = get_db(str(tmp_path / "datagen.db"))
+    yield db_connect
+    db_connect.close()
+
+
+def test_same_seed_same_dataset():
+    first = list(generate_history(habits=50, days=120, out_of_order=0.2, seed=7))
+    assert first == list(generate_history(habits=50, days=120, out_of_order=0.2, seed=7))
+    assert first != list(generate_history(habits=50, days=120, out_of_order=0.2, seed=8))
+    # A habit doesn't depend on how many habits are generated
+    assert first[:10] == list(generate_history(habits=10, days=120, out_of_order=0.2, seed=7))
+
+
+def test_shape_of_the_history():
+    end = date(2025, 5, 1)
+    habits = list(generate_history(habits=20, days=70, daily_share=1, completion_rate=1, gap_rate=0, end=end))
+    assert [name for name, periodicity, days in habits] == [f"Habit {i}" for i in range(20)]
+    for name, periodicity, days in habits:
+        assert periodicity == "Daily"
+        assert days == list(range(end.toordinal() - 70, end.toordinal()))
+
+    for name, periodicity, days in generate_history(habits=20, days=70, daily_share=0, gap_rate=0.2, seed=1):
+        assert periodicity == "Weekly"
+        # The 70 days from Thursday 2025-02-20 touch 11 Monday-based weeks
+        assert len(days) <= 11 and days == sorted(days)
+        assert all(end.toordinal() - 70 <= day < end.toordinal() for day in days)
+
+    assert all(not days for name, periodicity, days in generate_history(habits=5, completion_rate=0))
+
+
+@pytest.mark.parametrize("days", [70, 71, 365])
+def test_full_weekly_history_is_one_streak(days):
+    end = date(2025, 5, 1)
+    for name, periodicity, completion_days in generate_history(habits=10, days=days, daily_share=0,
+                                                              completion_rate=1, gap_rate=0, end=end, seed=2):
+        weeks = {period_index(day, "Weekly") for day in completion_days}
+        assert len(weeks) == len(completion_days)
+        assert weeks == set(range(period_index(end.toordinal() - days, "Weekly"),
+                                  period_index(end.toordinal() - 1, "Weekly") + 1))
+        assert run_streaks(sorted(weeks)) == (len(weeks), len(weeks))
+
+
+def test_out_of_order():
+    in_order = list(generate_history(habits=20, seed=3))
+    shuffled = list(generate_history(habits=20, seed=3, out_of_order=0.3))
+    assert [sorted(days) for name, periodicity, days in shuffled] == [days for name, periodicity, days in in_order]
+    assert any(days != sorted(days) for name, periodicity, days in shuffled)
+
+
+@pytest.mark.parametrize("params", [{"habits": -1}, {"max_gap": 0}, {"completion_rate": 1.5}, {"gap_rate": -0.1}])
+def test_invalid_parameters(params):
+    with pytest.raises(ValueError):
+        generate_history(**params)
+
+
+def test_populate_keeps_streaks_bitmaps_and_rollups_consistent(db_connect):
+    assert populate(db_connect, habits=60, days=200, gap_rate=0.05, out_of_order=0.2, seed=5) == (
+        60, sum(len(days) for name, periodicity, days in generate_history(habits=60, days=200, gap_rate=0.05,
+                                                                           out_of_order=0.2, seed=5)))
+    for name, streaks in compute_streaks(db_connect).items():
+        assert get_streak_cache(db_connect, name)[:2] == streaks
+        assert get_completion_bitmap(db_connect, name) == CompletionBitmap.from_days(
+            get_completion_dates(db_connect, name))
+
+    rollups = {bucket: (get_rollups(db_connect, bucket), get_rollup_totals(db_connect, bucket)) for bucket in BUCKETS}
+    rebuild_rollups(db_connect)
+    assert rollups == {bucket: (get_rollups(db_connect, bucket), get_rollup_totals(db_connect, bucket))
+                       for bucket in BUCKETS}
+
+
+def test_populate_is_one_transaction(db_connect):
+    add_habit(db_connect, [("Habit 3", "Daily")])
+    with pytest.raises(ValueError):
+        populate(db_connect, habits=10)
+    assert db_connect.execute("SELECT COUNT(*) FROM habit").fetchone()[0] == 1
+    assert db_connect.execute("SELECT COUNT(*) FROM completion").fetchone()[0] == 0
+
+    assert populate(db_connect, habits=10, prefix="Generated")[0] == 10
+    assert db_connect.execute("SELECT COUNT(*) FROM habit").fetchone()[0] == 11
@@ -0,0 +1,794 @@
+from datetime import datetime
+from db import (get_db, add_completion_dates, get_completion_dates, get_habit_data, delete_habit, edit_habit,
+                get_streak_cache, get_cached_longest_run_streak, rebuild_streak_cache, migrate,
+                SCHEMA_VERSION, input_data_database, add_habits_bulk, add_completions_bulk, add_habit,
+                add_history_bulk, iter_history, get_habit, get_habits_by_periodicity, get_habit_periodicity,
+                fix_null_periodicity, delete_invalid_habits, update_default_periodicity, check_database_content,
+                get_completion_bitmap, get_completion_bitmaps, rebuild_completion_bitmaps, BitmapIndex,
+                get_streak_status, get_streak_details, get_at_risk_habits, compute_streaks, compute_longest_run_streak,
+                rebuild_rollups, get_rollups, get_rollup_totals)
+from streaks import BUCKETS, batch_streaks, bucket_index, completion_streaks, StreakStatus
+from analyse import get_longest_run_streak_all_habits
+from habit import Habit, load_habits
+from tracing import enable_timing, enable_tracing, get_timings, reset_timings
+import db
+import tracing
+import logging
+import random
+import re
+import sqlite3
+import threading
+import pytest
+
+
+@pytest.fixture
+def db_connect(tmp_path):
+    db_connect = get_db(str(tmp_path / "test_db.db"))
+    yield db_connect
+    db_connect.close()
+
+
+@pytest.fixture
+def old_db_path(tmp_path):
+    """Fixture to create a database with the old comma-joined tracker schema."""
+    db_path = str(tmp_path / "old.db")
+    con = sqlite3.connect(db_path)
+    con.execute("""CREATE TABLE habit(
+      name TEXT PRIMARY KEY,
+      periodicity TEXT
+      longest_run_streak INTEGER DEFAULT 0)""")
+    con.execute("""CREATE TABLE tracker(
+      completion_dates TEXT,
+      habit_name TEXT,
+      FOREIGN KEY(habit_name)REFERENCES habit(name))""")
+    con.execute("INSERT INTO habit (name, periodicity) VALUES ('Exercise', 'Daily')")
+    con.execute("INSERT INTO habit (name, periodicity) VALUES ('Laundry', 'Weekly')")
+    # Comma-joined row written by db.add_completion_dates
+    con.execute("INSERT INTO tracker VALUES ('2025-04-02T00:00:00,2025-04-01T00:00:00', 'Exercise')")
+    # One row per date written by Habit.add_completion_dates, including a duplicate
+    con.execute("INSERT INTO tracker VALUES ('2025-04-03T00:00:00', 'Exercise')")
+    con.execute("INSERT INTO tracker VALUES ('2025-04-03T00:00:00', 'Exercise')")
+    con.execute("INSERT INTO tracker VALUES ('2025-04-03', 'Laundry')")
+    con.commit()
+    con.close()
+    return db_path
+
+
+@pytest.fixture
+def iso_db_path(tmp_path):
+    """Fixture to create a database at schema version 3, with completions stored as ISO strings."""
+    db_path = str(tmp_path / "iso.db")
+    con = sqlite3.connect(db_path)
+    con.execute("""CREATE TABLE habit(
+      id INTEGER PRIMARY KEY,
+      name TEXT NOT NULL UNIQUE,
+      periodicity TEXT,
+      longest_run_streak INTEGER DEFAULT 0,
+      current_run_streak INTEGER DEFAULT 0,
+      last_completion TEXT)""")
+    con.execute("""CREATE TABLE completion(
+      habit_id INTEGER NOT NULL,
+      completed_on TEXT NOT NULL,
+      PRIMARY KEY (habit_id, completed_on),
+      FOREIGN KEY(habit_id) REFERENCES habit(id) ON DELETE CASCADE) WITHOUT ROWID""")
+    con.execute("CREATE INDEX habit_periodicity ON habit(periodicity, longest_run_streak)")
+    con.execute("""INSERT INTO habit VALUES (1, 'Study', 'Daily', 2, 1, '2025-04-04T00:00:00'),
+                                            (2, 'Laundry', 'Weekly', 0, 0, NULL)""")
+    con.executemany("INSERT INTO completion VALUES (1, ?)",
+                    [("2025-04-01T00:00:00",), ("2025-04-02T00:00:00",), ("2025-04-04T00:00:00",)])
+    con.execute("PRAGMA user_version = 3")
+    con.commit()
+    con.close()
+    return db_path
+
+
+class TestCompletionSchema:
+
+    def test_migrates_tracker_rows(self, old_db_path):
+        """Test the in-place migration from the comma-joined tracker column."""
+        db_connect = get_db(old_db_path)
+
+        assert get_completion_dates(db_connect, "Exercise") == [
+            datetime(2025, 4, 1), datetime(2025, 4, 2), datetime(2025, 4, 3)]
+        assert get_completion_dates(db_connect, "Laundry") == [datetime(2025, 4, 3)]
+        assert get_streak_cache(db_connect, "Exercise") == (3, 3, "2025-04-03T00:00:00")
+
+        tables = {row[0] for row in db_connect.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "tracker" not in tables
+        db_connect.close()
+
+        # Opening the migrated database again leaves the data untouched
+        db_connect = get_db(old_db_path)
+        assert len(get_completion_dates(db_connect, "Exercise")) == 3
+        db_connect.close()
+
+    def test_migrates_iso_dates_to_day_ordinals(self, iso_db_path):
+        db_connect = get_db(iso_db_path)
+
+        assert db_connect.execute("SELECT DISTINCT typeof(completed_on) FROM completion").fetchall() == [("integer",)]
+        assert db_connect.execute("SELECT MIN(completed_on) FROM completion").fetchone()[0] == \
+            datetime(2025, 4, 1).toordinal()
+        assert get_completion_dates(db_connect, "Study") == [datetime(2025, 4, d) for d in [1, 2, 4]]
+        assert get_streak_cache(db_connect, "Study") == (2, 1, "2025-04-04T00:00:00")
+        assert get_streak_cache(db_connect, "Laundry") == (0, 0, None)
+        assert list(get_completion_bitmap(db_connect, "Study")) == \
+            [datetime(2025, 4, d).toordinal() for d in [1, 2, 4]]
+
+        # The streak cache keeps working incrementally on the converted rows
+        add_completion_dates(db_connect, "Study", datetime(2025, 4, 3))
+        assert get_streak_cache(db_connect, "Study") == (4, 4, "2025-04-04T00:00:00")
+
+        schema = dict(db_connect.execute("SELECT name, sql FROM sqlite_master"))
+        assert {"habit_periodicity", "habit_longest_run_streak"} <= set(schema)
+        assert "habit_old" not in schema["completion"]
+        db_connect.close()
+
+    def test_old_schema_keeps_completion_foreign_key(self, old_db_path):
+        db_connect = get_db(old_db_path)
+        sql = db_connect.execute("SELECT sql FROM sqlite_master WHERE name = 'completion'").fetchone()[0]
+        assert "REFERENCES habit(id)" in sql
+        db_connect.close()
+
+    def test_add_completion_dates_ignores_duplicates(self, db_connect):
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, 2), datetime(2025, 4, 1, 18, 30)])
+        add_completion_dates(db_connect, "Study", datetime(2025, 4, 2, 7, 0))
+
+        assert get_completion_dates(db_connect, "Study") == [datetime(2025, 4, 1), datetime(2025, 4, 2)]
+        assert get_habit_data(db_connect, "Study") == (["2025-04-01T00:00:00", "2025-04-02T00:00:00"], "Daily")
+
+    def test_add_completion_dates_unknown_habit(self, db_connect):
+        with pytest.raises(ValueError):
+            add_completion_dates(db_connect, "Unknown", [datetime(2025, 4, 1)])
+
+    def test_add_completion_dates_bad_date_releases_lock(self, db_connect, tmp_path):
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        db_connect.commit()
+        with pytest.raises(ValueError):
+            add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1), "2025-13-01"])
+        assert not db_connect.in_transaction
+
+        # Another connection can still write
+        other = sqlite3.connect(str(tmp_path / "test_db.db"), timeout=0)
+        add_completion_dates(other, "Study", [datetime(2025, 4, 2)])
+        other.close()
+        assert get_completion_dates(db_connect, "Study") == [datetime(2025, 4, 2)]
+
+    def test_add_completion_dates_failed_write_releases_lock(self, db_connect, tmp_path, monkeypatch):
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        db_connect.commit()
+        with pytest.raises(ValueError):
+            add_completion_dates(db_connect, "Unknown", [datetime(2025, 4, 1)])
+        assert not db_connect.in_transaction
+
+        def fail(*args):
+            raise sqlite3.OperationalError("disk I/O error")
+
+        # An error after the completions are inserted rolls them back
+        monkeypatch.setattr(db, "_update_bitmap", fail)
+        with pytest.raises(sqlite3.OperationalError):
+            add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1)])
+        assert not db_connect.in_transaction
+        monkeypatch.undo()
+
+        other = sqlite3.connect(str(tmp_path / "test_db.db"), timeout=0)
+        add_completion_dates(other, "Study", [datetime(2025, 4, 2)])
+        other.close()
+        assert get_completion_dates(db_connect, "Study") == [datetime(2025, 4, 2)]
+
+    def test_completions_follow_rename_and_delete(self, db_connect):
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1)])
+
+        edit_habit(db_connect, "Study", new_name="Reading")
+        assert get_completion_dates(db_connect, "Reading") == [datetime(2025, 4, 1)]
+
+        delete_habit(db_connect, "Reading")
+        assert db_connect.execute("SELECT COUNT(*) FROM completion").fetchone()[0] == 0
+
+
+class TestLoadHabits:
+
+    def test_load_habits_single_query(self, db_connect):
+        """Test that the bulk loader returns every habit with its sorted completion dates."""
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Laundry', 'Weekly')")
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Reading', 'Daily')")
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, 3), datetime(2025, 4, 1)])
+        add_completion_dates(db_connect, "Laundry", [datetime(2025, 4, 3)])
+
+        statements = []
+        db_connect.set_trace_callback(statements.append)
+        habits = load_habits(db_connect)
+        db_connect.set_trace_callback(None)
+
+        assert len(statements) == 1
+        assert [(h.name, h.periodicity, h.completion_dates) for h in habits] == [
+            ("Study", "Daily", [datetime(2025, 4, 1), datetime(2025, 4, 3)]),
+            ("Laundry", "Weekly", [datetime(2025, 4, 3)]),
+            ("Reading", "Daily", []),
+        ]
+
+
+class TestStreakCache:
+
+    @pytest.fixture
+    def habits(self, db_connect):
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Laundry', 'Weekly')")
+        db_connect.commit()
+
+    def test_appending_extends_current_run(self, db_connect, habits):
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1), datetime(2025, 4, 2)])
+        add_completion_dates(db_connect, "Study", datetime(2025, 4, 3))
+        assert get_streak_cache(db_connect, "Study") == (3, 3, "2025-04-03T00:00:00")
+
+        add_completion_dates(db_connect, "Study", datetime(2025, 4, 5))
+        assert get_streak_cache(db_connect, "Study") == (3, 1, "2025-04-05T00:00:00")
+
+    def test_backfilled_date_merges_runs(self, db_connect, habits):
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, d) for d in [1, 2, 4, 5, 6]])
+        assert get_streak_cache(db_connect, "Study") == (3, 3, "2025-04-06T00:00:00")
+
+        add_completion_dates(db_connect, "Study", datetime(2025, 4, 3))
+        assert get_streak_cache(db_connect, "Study") == (6, 6, "2025-04-06T00:00:00")
+
+    def test_weekly_runs_count_iso_weeks(self, db_connect, habits):
+        # Tuesday, then Thursday of the next week and Monday of the week after
+        add_completion_dates(db_connect, "Laundry", [datetime(2025, 4, 1), datetime(2025, 4, 10)])
+        add_completion_dates(db_connect, "Laundry", [datetime(2025, 4, 14), datetime(2025, 4, 15)])
+        assert get_streak_cache(db_connect, "Laundry") == (3, 3, "2025-04-15T00:00:00")
+        assert get_cached_longest_run_streak(db_connect, "Weekly") == 3
+        assert get_cached_longest_run_streak(db_connect, "Daily") == 0
+
+    def test_incremental_matches_rebuild(self, db_connect, habits):
+        rng = random.Random(7)
+        days = [datetime.fromordinal(datetime(2025, 1, 1).toordinal() + rng.randrange(120)) for _ in range(150)]
+        for start in range(0, len(days), 10):
+            add_completion_dates(db_connect, "Study", days[start:start + 10])
+            add_completion_dates(db_connect, "Laundry", days[start:start + 10])
+
+        incremental = [get_streak_cache(db_connect, name) for name in ("Study", "Laundry")]
+        rebuild_streak_cache(db_connect)
+        assert [get_streak_cache(db_connect, name) for name in ("Study", "Laundry")] == incremental
+        assert incremental[0][:2] == completion_streaks(days, "Daily")
+        assert incremental[1][:2] == completion_streaks(days, "Weekly")
+
+    def test_periodicity_change_rebuilds_cache(self, db_connect, habits):
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1), datetime(2025, 4, 8)])
+        assert get_streak_cache(db_connect, "Study")[0] == 1
+
+        edit_habit(db_connect, "Study", new_periodicity="Weekly")
+        assert get_streak_cache(db_connect, "Study")[0] == 2
+
+
+class TestSqlStreaks:
+
+    def test_matches_the_python_streaks(self, db_connect):
+        rng = random.Random(19)
+        habits = [(f"Habit {i}", rng.choice(["Daily", "Weekly"])) for i in range(40)]
+        add_habits_bulk(db_connect, habits)
+        history = {name: [datetime.fromordinal(datetime(2025, 1, 1).toordinal() + rng.randrange(90))
+                          for _ in range(rng.randrange(80))] for name, _ in habits}
+        add_completions_bulk(db_connect, [(name, day) for name, days in history.items() for day in days])
+
+        expected = {name: completion_streaks(history[name], periodicity) for name, periodicity in habits}
+        assert compute_streaks(db_connect) == expected
+        assert compute_streaks(db_connect, name="Habit 3") == {"Habit 3": expected["Habit 3"]}
+        assert compute_streaks(db_connect, periodicity="Weekly") == {
+            name: expected[name] for name, periodicity in habits if periodicity == "Weekly"}
+        assert compute_longest_run_streak(db_connect) == (max(longest for longest, _ in expected.values()),
+                                                          max(current for _, current in expected.values()))
+        assert compute_longest_run_streak(db_connect, "Daily")[0] == get_cached_longest_run_streak(db_connect, "Daily")
+
+    def test_habits_without_completions(self, db_connect):
+        add_habits_bulk(db_connect, [("Study", "Daily")])
+        assert compute_streaks(db_connect) == {"Study": (0, 0)}
+        assert compute_streaks(db_connect, name="Unknown") == {}
+        assert compute_longest_run_streak(db_connect, "Weekly") == (0, 0)
+
+    def test_analytics_can_recompute(self, db_connect):
+        add_habits_bulk(db_connect, [("Study", "Daily"), ("Laundry", "Weekly")])
+        add_completions_bulk(db_connect, [("Study", datetime(2025, 4, d)) for d in [1, 2, 3]] +
+                             [("Laundry", datetime(2025, 4, d)) for d in [1, 8]])
+        # Break the cache behind the write functions' back
+        db_connect.execute("UPDATE habit SET longest_run_streak = 0")
+        assert get_longest_run_streak_all_habits(db_connect) == 0
+        assert get_longest_run_streak_all_habits(db_connect, from_completions=True) == 3
+        assert Habit.get_longest_run_streak_by_periodicity(db_connect, "Weekly", from_completions=True) == 2
+
+
+class TestBulkWrites:
+
+    def test_add_habits_bulk(self, db_connect):
+        habits = (pair for pair in [("Study", "Daily"), ("Laundry", "Weekly"), ("Study", "Weekly")])
+        assert add_habits_bulk(db_connect, habits, chunk_size=2) == 2
+        assert get_habit_data(db_connect, "Study")[1] == "Daily"
+
+        with pytest.raises(ValueError):
+            add_habits_bulk(db_connect, [("Reading", "Monthly")])
+
+    def test_add_completions_bulk(self, db_connect):
+        add_habits_bulk(db_connect, [("Study", "Daily"), ("Laundry", "Weekly")])
+        rng = random.Random(3)
+        days = [datetime.fromordinal(datetime(2025, 1, 1).toordinal() + rng.randrange(90)) for _ in range(100)]
+        completions = ((name, day) for day in days for name in ("Study", "Laundry"))
+
+        added = add_completions_bulk(db_connect, completions, chunk_size=7)
+        assert added == 2 * len(set(days))
+        assert get_completion_dates(db_connect, "Study") == sorted(set(days))
+
+        cache = [get_streak_cache(db_connect, name) for name in ("Study", "Laundry")]
+        assert cache[0][:2] == completion_streaks(days, "Daily")
+        assert cache[1][:2] == completion_streaks(days, "Weekly")
+        rebuild_streak_cache(db_connect)
+        assert [get_streak_cache(db_connect, name) for name in ("Study", "Laundry")] == cache
+
+        # Writing the same completions again changes nothing
+        assert add_completions_bulk(db_connect, [("Study", day) for day in days]) == 0
+
+    def test_add_completions_bulk_unknown_habit(self, db_connect):
+        with pytest.raises(ValueError):
+            add_completions_bulk(db_connect, [("Unknown", datetime(2025, 4, 1))])
+
+    @pytest.mark.parametrize("bad", [("Unknown", datetime(2025, 4, 3)), ("Study", "2025-13-01")])
+    def test_add_completions_bulk_failing_chunk(self, db_connect, bad):
+        add_habits_bulk(db_connect, [("Study", "Daily")])
+        completions = [("Study", datetime(2025, 4, 1)), ("Study", datetime(2025, 4, 2)),
+                       ("Study", datetime(2025, 4, 4)), bad]
+        with pytest.raises(ValueError):
+            add_completions_bulk(db_connect, completions, chunk_size=2)
+        assert not db_connect.in_transaction
+
+        # The first chunk stays committed, with its cache, bitmap and rollups
+        assert get_completion_dates(db_connect, "Study") == [datetime(2025, 4, 1), datetime(2025, 4, 2)]
+        assert get_streak_cache(db_connect, "Study") == (2, 2, "2025-04-02T00:00:00")
+        assert list(get_completion_bitmap(db_connect, "Study")) == [datetime(2025, 4, d).toordinal() for d in [1, 2]]
+        april = bucket_index(datetime(2025, 4, 1).toordinal(), "month")
+        assert get_rollup_totals(db_connect, "month") == [(april, 2, 1)]
+
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, 3)])
+        assert get_streak_cache(db_connect, "Study") == (3, 3, "2025-04-03T00:00:00")
+
+
+class TestCompletionBitmaps:
+
+    @pytest.fixture
+    def habits(self, db_connect):
+        add_habits_bulk(db_connect, [("Study", "Daily"), ("Exercise", "Daily"), ("Laundry", "Weekly")])
+
+    def test_maintained_by_writes(self, db_connect, habits):
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, d) for d in [3, 4]])
+        add_completion_dates(db_connect, "Study", [datetime(2025, 3, 30), datetime(2025, 4, 20)])
+        add_completions_bulk(db_connect, [("Study", datetime(2025, 4, 5)), ("Exercise", datetime(2025, 4, 4))])
+
+        bitmap = get_completion_bitmap(db_connect, "Study")
+        assert list(bitmap) == [day.toordinal() for day in get_completion_dates(db_connect, "Study")]
+        assert get_completion_bitmap(db_connect, "Laundry") == get_completion_bitmap(db_connect, "Laundry") == \
+            get_completion_bitmaps(db_connect, "Weekly")["Laundry"]
+        assert not get_completion_bitmap(db_connect, "Laundry")
+        assert get_completion_bitmap(db_connect, "Unknown") is None
+
+        stored = {name: list(bitmap) for name, bitmap in get_completion_bitmaps(db_connect).items()}
+        rebuild_completion_bitmaps(db_connect)
+        assert {name: list(bitmap) for name, bitmap in get_completion_bitmaps(db_connect).items()} == stored
+
+        delete_habit(db_connect, "Study")
+        assert db_connect.execute("SELECT COUNT(*) FROM completion_bitmap").fetchone()[0] == 1
+
+    def test_index_queries(self, db_connect, habits):
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, d) for d in range(1, 11)])
+        add_completion_dates(db_connect, "Exercise", [datetime(2025, 4, d) for d in [2, 4, 6, 30]])
+        add_completion_dates(db_connect, "Laundry", [datetime(2025, 4, 1)])
+
+        index = BitmapIndex(db_connect)
+        assert index.completed_on("Study", datetime(2025, 4, 5))
+        assert not index.completed_on("Exercise", datetime(2025, 4, 5))
+        assert not index.completed_on("Unknown", datetime(2025, 4, 5))
+        assert index.count("Study", datetime(2025, 4, 3), datetime(2025, 4, 30)) == 8
+        assert index.count("Unknown") == 0
+
+        # Days every Daily habit was done, and days any habit was done
+        assert [datetime.fromordinal(day).day for day in index.all_completed("Daily")] == [2, 4, 6]
+        assert len(index.any_completed()) == 11
+
+    def test_index_cache_follows_writes(self, db_connect, habits, tmp_path):
+        index = BitmapIndex(db_connect)
+        assert not index.completed_on("Study", datetime(2025, 4, 1))
+
+        # A write through the same connection
+        add_completion_dates(db_connect, "Study", datetime(2025, 4, 1))
+        assert index.completed_on("Study", datetime(2025, 4, 1))
+
+        statements = []
+        db_connect.set_trace_callback(statements.append)
+        assert index.completed_on("Study", datetime(2025, 4, 1))
+        db_connect.set_trace_callback(None)
+        assert statements == ["PRAGMA data_version"]
+
+        # A write through another connection
+        other = get_db(str(tmp_path / "test_db.db"))
+        add_completion_dates(other, "Study", datetime(2025, 4, 2))
+        other.close()
+        assert index.completed_on("Study", datetime(2025, 4, 2))
+
+
+class TestRollups:
+
+    @pytest.fixture
+    def habits(self, db_connect):
+        add_habits_bulk(db_connect, [("Study", "Daily"), ("Exercise", "Daily"), ("Laundry", "Weekly")])
+
+    @staticmethod
+    def rollups(db_connect):
+        """The stored rollups of every bucket: a dict mapping bucket to (per habit rows, total rows)."""
+        return {bucket: (get_rollups(db_connect, bucket), get_rollup_totals(db_connect, bucket)) for bucket in BUCKETS}
+
+    @staticmethod
+    def counted(db_connect):
+        """The rollups counted from the completion dates, as returned by rollups."""
+        result = {}
+        for bucket in BUCKETS:
+            per_habit, totals = [], {}
+            for name, in db_connect.execute("SELECT name FROM habit ORDER BY id").fetchall():
+                counts = {}
+                for value in get_completion_dates(db_connect, name):
+                    period = bucket_index(value.toordinal(), bucket)
+                    counts[period] = counts.get(period, 0) + 1
+                for period, count in sorted(counts.items()):
+                    per_habit.append((name, period, count))
+                    completions, habit_count = totals.get(period, (0, 0))
+                    totals[period] = (completions + count, habit_count + 1)
+            result[bucket] = (per_habit, [(period, *totals[period]) for period in sorted(totals)])
+        return result
+
+    def test_maintained_by_writes(self, db_connect, habits):
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, d) for d in [3, 4, 30]])
+        # Backfilled, duplicate and new dates across a month boundary
+        add_completion_dates(db_connect, "Study", [datetime(2025, 3, 30), datetime(2025, 4, 4), datetime(2025, 5, 1)])
+        add_completion_dates(db_connect, "Laundry", [datetime(2025, 4, 1), datetime(2025, 4, 3)])
+        add_completions_bulk(db_connect, [("Study", datetime(2025, 4, 5)), ("Exercise", datetime(2025, 4, 4))])
+        add_history_bulk(db_connect, [("Writing", "Daily", "2025-04-04"), ("Writing", "Daily", "2025-03-31")])
+        assert self.rollups(db_connect) == self.counted(db_connect)
+
+        week = bucket_index(datetime(2025, 4, 4).toordinal(), "week")
+        assert get_rollups(db_connect, "week", week, week, name="Study") == [("Study", week, 3)]
+        assert get_rollups(db_connect, "week", week, week, periodicity="Weekly") == [("Laundry", week, 2)]
+        day = datetime(2025, 4, 4).toordinal()
+        assert get_rollup_totals(db_connect, "day", day, day) == [(day, 3, 3)]
+        april = bucket_index(datetime(2025, 4, 1).toordinal(), "month")
+        assert get_rollup_totals(db_connect, "month", april, april) == [(april, 8, 4)]
+
+        edit_habit(db_connect, "Exercise", new_name="Running", new_periodicity="Weekly")
+        delete_habit(db_connect, "Study")
+        assert self.rollups(db_connect) == self.counted(db_connect)
+        assert get_rollup_totals(db_connect, "month", april, april) == [(april, 4, 3)]
+
+    def test_maintained_by_large_bulk_writes(self, db_connect, habits):
+        # Enough habits that the caches are recounted from the whole completion table
+        add_completion_dates(db_connect, "Study", [datetime(2025, 3, 31), datetime(2025, 4, 2)])
+        add_habits_bulk(db_connect, [(f"Habit {i}", "Weekly" if i % 3 else "Daily") for i in range(150)])
+        rng = random.Random(4)
+        add_completions_bulk(db_connect, [(f"Habit {i}", datetime.fromordinal(datetime(2025, 3, 1).toordinal() + day))
+                                          for i in range(150) for day in rng.sample(range(90), 20)] +
+                             [("Laundry", datetime(2025, 4, 1))], chunk_size=1000)
+        assert self.rollups(db_connect) == self.counted(db_connect)
+        for name, streaks in compute_streaks(db_connect).items():
+            assert get_streak_cache(db_connect, name)[:2] == streaks
+            assert list(get_completion_bitmap(db_connect, name)) == [
+                value.toordinal() for value in get_completion_dates(db_connect, name)]
+
+    def test_rebuild(self, db_connect, habits):
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, d) for d in range(1, 11)])
+        add_completion_dates(db_connect, "Laundry", [datetime(2025, 4, 1)])
+        stored = self.rollups(db_connect)
+        db_connect.execute("DELETE FROM completion_rollup WHERE bucket = 'week'")
+        db_connect.execute("UPDATE completion_rollup SET completions = 99")
+        rebuild_rollups(db_connect)
+        assert self.rollups(db_connect) == stored
+
+        # Completions written around the write functions are counted by rebuilding the habit
+        db_connect.execute("INSERT INTO completion (habit_id, completed_on) VALUES (1, ?)",
+                           (datetime(2025, 5, 1).toordinal(),))
+        rebuild_rollups(db_connect, "Study")
+        assert self.rollups(db_connect) == self.counted(db_connect) != stored
+
+    def test_delete_takes_the_write_lock(self, db_connect, habits, tmp_path):
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, d) for d in [1, 2]])
+        stored = self.rollups(db_connect)
+
+        # The bitmap is only read under the write lock, so delete_habit waits for (here:
+        # fails on) another writer instead of subtracting a bitmap that writer may change
+        other = sqlite3.connect(str(tmp_path / "test_db.db"))
+        other.execute("BEGIN IMMEDIATE")
+        db_connect.execute("PRAGMA busy_timeout = 0")
+        with pytest.raises(sqlite3.OperationalError):
+            delete_habit(db_connect, "Study")
+        other.rollback()
+        other.close()
+        assert not db_connect.in_transaction
+        assert self.rollups(db_connect) == stored
+
+        delete_habit(db_connect, "Study")
+        assert self.rollups(db_connect) == self.counted(db_connect)
+
+    def test_built_by_migration(self, iso_db_path):
+        db_connect = get_db(iso_db_path)
+        assert self.rollups(db_connect) == self.counted(db_connect)
+        april = bucket_index(datetime(2025, 4, 1).toordinal(), "month")
+        assert get_rollup_totals(db_connect, "month") == [(april, 3, 1)]
+        db_connect.close()
+
+    def test_unknown_bucket(self, db_connect):
+        with pytest.raises(ValueError):
+            get_rollups(db_connect, "year")
+        with pytest.raises(ValueError):
+            get_rollup_totals(db_connect, "hour")
+
+
+class TestStreakStatus:
+
+    # Wednesday, so a Weekly habit has five days left in its week
+    TODAY = datetime(2025, 4, 16)
+
+    @pytest.fixture
+    def habits(self, db_connect):
+        add_habits_bulk(db_connect, [("Study", "Daily"), ("Exercise", "Daily"), ("Reading", "Daily"),
+                                     ("Laundry", "Weekly"), ("Medication", "Weekly"), ("Cooking", "Daily")])
+        add_completions_bulk(db_connect, [("Study", datetime(2025, 4, d)) for d in [13, 14, 15]] +
+                             [("Exercise", datetime(2025, 4, d)) for d in [14, 15, 16]] +
+                             [("Reading", datetime(2025, 4, 10)), ("Medication", datetime(2025, 4, 14))] +
+                             [("Laundry", datetime(2025, 4, d)) for d in [3, 10]])
+        return db_connect
+
+    def test_streak_status(self, habits):
+        assert get_streak_status(habits, self.TODAY) == [
+            StreakStatus("Study", "Daily", 3, 1, True),
+            StreakStatus("Exercise", "Daily", 3, 1, False),
+            StreakStatus("Reading", "Daily", 0, 1, False),
+            StreakStatus("Laundry", "Weekly", 2, 5, True),
+            StreakStatus("Medication", "Weekly", 1, 5, False),
+            StreakStatus("Cooking", "Daily", 0, 1, False),
+        ]
+
+    def test_streak_details(self, habits):
+        statements = []
+        habits.set_trace_callback(statements.append)
+        details = get_streak_details(habits, self.TODAY)
+        habits.set_trace_callback(None)
+        assert len(statements) == 1
+        assert [status for status, longest_run_streak, last_completion in details] == \
+            get_streak_status(habits, self.TODAY)
+        for status, longest_run_streak, last_completion in details:
+            cached = get_streak_cache(habits, status.name)
+            assert (longest_run_streak, last_completion) == (cached[0], cached[2])
+        assert details[0][1:] == (3, "2025-04-15T00:00:00")
+
+    def test_at_risk_habits(self, habits):
+        assert get_at_risk_habits(habits, self.TODAY) == [
+            StreakStatus("Study", "Daily", 3, 1, True),
+            StreakStatus("Laundry", "Weekly", 2, 5, True),
+        ]
+        # Until Sunday the Weekly habits completed last week are at risk, on Monday they broke
+        assert [status.name for status in get_at_risk_habits(habits, "2025-04-20")] == ["Laundry"]
+        assert get_at_risk_habits(habits, "2025-04-21") == [StreakStatus("Medication", "Weekly", 1, 7, True)]
+
+    def test_at_risk_habits_match_the_streak_status(self, habits):
+        for day in range(1, 31):
+            today = datetime(2025, 4, day)
+            at_risk = [status for status in get_streak_status(habits, today) if status.at_risk]
+            assert sorted(get_at_risk_habits(habits, today)) == sorted(at_risk)
+
+
+class TestQueryPlans:
+
+    # Statements that read every row on purpose: loading or exporting everything, the
+    # name to id maps of the bulk writers, the full streak cache and rollup rebuilds and
+    # the rollups of every habit.
+    WHOLE_TABLE_READS = {
+        "SELECT name, id FROM habit",
+        "SELECT name, periodicity, current_run_streak, last_completion, longest_run_streak FROM habit ORDER BY id",
+        "SELECT id, periodicity FROM habit",
+        "SELECT name FROM habit",
+        "SELECT id FROM habit",
+        "SELECT h.name, b.first_day, b.bits FROM habit h LEFT JOIN completion_bitmap b ON b.habit_id = h.id",
+        "SELECT habit_id, completed_on FROM completion ORDER BY habit_id, completed_on",
+        "SELECT habit_id, json_group_array(completed_on) FROM completion GROUP BY habit_id",
+        "SELECT h.name, h.periodicity, (SELECT group_concat(completed_on) FROM (SELECT completed_on FROM completion "
+        "WHERE habit_id = h.id ORDER BY completed_on)) FROM habit h ORDER BY h.id",
+        "SELECT h.name, h.periodicity, c.completed_on FROM habit h LEFT JOIN completion c ON c.habit_id = h.id "
+        "ORDER BY h.id, c.completed_on",
+        "INSERT INTO completion_rollup (bucket, period, completions, habits) SELECT 'day', * FROM (SELECT "
+        "completed_on, COUNT(*), COUNT(*) FROM completion GROUP BY completed_on)",
+        "INSERT INTO completion_rollup (bucket, period, completions, habits) SELECT 'week', * FROM (SELECT "
+        "(completed_on - 1) / 7 AS period, COUNT(*), COUNT(DISTINCT habit_id) FROM completion GROUP BY period)",
+        "INSERT INTO completion_rollup (bucket, period, completions, habits) SELECT 'month', * FROM (SELECT "
+        "CAST(substr(month, 1, 4) AS INTEGER) * 12 + CAST(substr(month, 5) AS INTEGER) - 1, completions, habits "
+        "FROM (SELECT strftime('%Y%m', completed_on + 1721424.5) AS month, COUNT(*) AS completions, "
+        "COUNT(DISTINCT habit_id) AS habits FROM completion GROUP BY month))",
+        "SELECT h.name, b.first_day, b.bits FROM habit h JOIN completion_bitmap b ON b.habit_id = h.id ORDER BY h.id",
+    }
+
+    def run_every_query(self, db_connect):
+        """Call every db function that reads or writes habits and completions."""
+        add_habit(db_connect, [("Study", "Daily"), ("Laundry", "Weekly")])
+        add_habits_bulk(db_connect, [("Reading", "Daily")] + [(f"Habit {i}", "Daily") for i in range(150)])
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, d) for d in [1, 2, 4]])
+        add_completion_dates(db_connect, "Study", datetime(2025, 4, 3))
+        add_completions_bulk(db_connect, [("Laundry", datetime(2025, 4, 1)), ("Reading", datetime(2025, 4, 2))])
+        add_completions_bulk(db_connect, [(f"Habit {i}", datetime(2025, 4, 2)) for i in range(150)])
+        add_history_bulk(db_connect, [("Writing", "Daily", "2025-04-01")])
+        list(iter_history(db_connect))
+        get_habit(db_connect, "Study")
+        get_habits_by_periodicity(db_connect, "Daily")
+        get_habit_periodicity(db_connect, "Study")
+        get_completion_dates(db_connect, "Study")
+        get_habit_data(db_connect, "Study")
+        get_streak_cache(db_connect, "Study")
+        get_cached_longest_run_streak(db_connect)
+        get_cached_longest_run_streak(db_connect, "Weekly")
+        get_streak_status(db_connect)
+        compute_streaks(db_connect)
+        compute_streaks(db_connect, name="Study")
+        compute_streaks(db_connect, periodicity="Weekly")
+        compute_longest_run_streak(db_connect)
+        compute_longest_run_streak(db_connect, "Daily")
+        get_at_risk_habits(db_connect)
+        load_habits(db_connect)
+        check_database_content(db_connect)
+        update_default_periodicity(db_connect, [("Reading", "Weekly")])
+        fix_null_periodicity(db_connect)
+        delete_invalid_habits(db_connect)
+        rebuild_streak_cache(db_connect, "Study")
+        rebuild_streak_cache(db_connect)
+        rebuild_completion_bitmaps(db_connect, "Study")
+        rebuild_completion_bitmaps(db_connect)
+        rebuild_rollups(db_connect, "Study")
+        rebuild_rollups(db_connect)
+        get_rollups(db_connect, "week", name="Study")
+        get_rollups(db_connect, "day", 739342, 739372)
+        get_rollups(db_connect, "month", periodicity="Weekly")
+        get_rollup_totals(db_connect, "day", 739342, 739372)
+        get_rollup_totals(db_connect, "month")
+        get_completion_bitmap(db_connect, "Study")
+        get_completion_bitmaps(db_connect)
+        get_completion_bitmaps(db_connect, "Daily")
+        edit_habit(db_connect, "Study", new_periodicity="Weekly")
+        edit_habit(db_connect, "Study", new_name="Learning")
+        delete_habit(db_connect, "Learning")
+
+    def test_no_full_table_scans(self, db_connect):
+        """Every query of db.py that filters rows has to use an index."""
+        statements = []
+        db_connect.set_trace_callback(statements.append)
+        self.run_every_query(db_connect)
+        db_connect.set_trace_callback(None)
+
+        queries = {" ".join(sql.split()) for sql in statements}
+        queries = {sql for sql in queries if sql.upper().startswith(("SELECT", "UPDATE", "DELETE", "INSERT", "WITH"))}
+        scans = {}
+        for sql in queries - self.WHOLE_TABLE_READS:
+            plan = [row[3] for row in db_connect.execute("EXPLAIN QUERY PLAN " + sql)]
+            # Scans of CTEs and subqueries read rows the query already produced, json_each
+            # the array bound to it
+            derived = set(re.findall(r"(\w+) AS \(", sql)) | {"json_each"}
+            full_scans = [step for step in plan if step.startswith("SCAN ")
+                          and not step.split()[1].startswith("(") and step.split()[1] not in derived]
+            if full_scans:
+                scans[sql] = full_scans
+        assert not scans
+        # The allowlist must not hide queries db.py no longer runs
+        assert self.WHOLE_TABLE_READS <= queries
+
+
+class TestTracing:
+
+    def test_hot_paths_do_not_print(self, db_connect, capsys):
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1), datetime(2025, 4, 1)])
+        load_habits(db_connect)[0].get_longest_run_streak()
+        assert capsys.readouterr().out == ""
+
+    def test_debug_messages_are_logged(self, db_connect, caplog):
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        with caplog.at_level(logging.DEBUG, logger="db"):
+            add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1)])
+        assert "Added completion date for 'Study': 2025-04-01" in caplog.messages
+
+    def test_timing(self, db_connect):
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Study', 'Daily')")
+        reset_timings()
+        enable_timing()
+        try:
+            add_completion_dates(db_connect, "Study", [datetime(2025, 4, 1)])
+            add_completion_dates(db_connect, "Study", [datetime(2025, 4, 2)])
+        finally:
+            enable_timing(False)
+        calls, total = get_timings()["db.add_completion_dates"]
+        assert calls == 2 and total > 0
+
+        load_habits(db_connect)
+        assert "habit.load_habits" not in get_timings()
+        reset_timings()
+
+    def test_timing_from_threads(self):
+        reset_timings()
+        enable_timing()
+        try:
+            threads = [threading.Thread(target=lambda: [batch_streaks([]) for i in range(500)]) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            enable_timing(False)
+        assert get_timings()["streaks.batch_streaks"][0] == 8 * 500
+        reset_timings()
+
+    def test_tracing_covers_all_modules(self, monkeypatch):
+        import reports  # noqa: F401
+        monkeypatch.setattr(tracing, "_tracing_level", None)  # Undone after the test
+        names = ["aio", "bitmap", "cache", "db", "pool", "reports", "storage", "streaks", "tracing"]
+        try:
+            enable_tracing(timing=False)
+            assert all(logging.getLogger(name).level == logging.DEBUG for name in names)
+        finally:
+            for name in tracing._loggers:
+                logging.getLogger(name).setLevel(logging.NOTSET)
+
+
+class TestMigrations:
+
+    def test_new_database_is_at_schema_version(self, db_connect):
+        assert db_connect.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+
+    def test_up_to_date_database_costs_one_pragma(self, tmp_path):
+        db_path = str(tmp_path / "startup.db")
+        get_db(db_path).close()
+
+        db_connect = sqlite3.connect(db_path)
+        statements = []
+        db_connect.set_trace_callback(statements.append)
+        assert migrate(db_connect) == SCHEMA_VERSION
+        assert statements == ["PRAGMA user_version"]
+        assert db_connect.total_changes == 0
+        db_connect.close()
+
+    def test_old_database_is_upgraded_once(self, old_db_path):
+        get_db(old_db_path).close()
+
+        db_connect = sqlite3.connect(old_db_path)
+        assert migrate(db_connect) == SCHEMA_VERSION
+        db_connect.close()
+
+    def test_edits_survive_reopening(self, tmp_path):
+        """Default periodicities are only applied once, not on every start."""
+        db_path = str(tmp_path / "reopen.db")
+        db_connect = get_db(db_path)
+        db_connect.execute("INSERT INTO habit (name, periodicity) VALUES ('Medication', 'Weekly')")
+        db_connect.commit()
+        edit_habit(db_connect, "Medication", new_periodicity="Daily")
+        db_connect.close()
+
+        db_connect = get_db(db_path)
+        assert get_habit_data(db_connect, "Medication")[1] == "Daily"
+        db_connect.close()
+
+
+class TestSeed:
+
+    def test_seed_in_one_transaction(self, db_connect):
+        statements = []
+        db_connect.set_trace_callback(statements.append)
+        input_data_database(db_connect)
+        db_connect.set_trace_callback(None)
+
+        assert statements.count("COMMIT") == 1
+        assert get_cached_longest_run_streak(db_connect) == 13
+        assert get_streak_cache(db_connect, "Medication") == (4, 4, "2025-04-22T00:00:00")
+
+    def test_seeding_again_keeps_data(self, db_connect):
+        input_data_database(db_connect)
+        habits = {h.name: h.completion_dates for h in load_habits(db_connect)}
+        input_data_database(db_connect)
+        assert {h.name: h.completion_dates for h in load_habits(db_connect)} == habits
@@ -1,6 +1,8 @@
-from habit import Habit
+from habit import Habit, Tracker, get_current_habits, load_habits
+from storage import MemoryBackend, SQLiteBackend, StorageBackend, get_storage
+from analyse import get_longest_run_streak_all_habits
 from datetime import datetime, timedelta
-from db import (get_db, add_habit as db_add_habit, edit_habit, delete_habit, get_current_habits,
+from db import (get_db, add_habit as db_add_habit, edit_habit, delete_habit,
                 get_habits_by_periodicity,
                 check_database_content, add_habit_with_periodicity, get_completion_dates, get_habit)
 import pytest
@@ -39,7 +41,7 @@ def db_connect():
     db_path = "test_habit.db"
     db_connect = get_db(db_path)
     cur = db_connect.cursor()
-    cur.execute("DELETE FROM tracker")
+    cur.execute("DELETE FROM completion")
     cur.execute("DELETE FROM habit")  # Clear existing habits
     db_connect.commit()
 
@@ -390,6 +392,11 @@ class TestHabit:
         habit_name = "Exercise"
         new_name = "Swimming"
 
+        # Start from the habit under its old name, an earlier run renamed it
+        db_connect.execute("DELETE FROM habit WHERE name = ?", (new_name,))
+        db_connect.execute("INSERT OR IGNORE INTO habit (name, periodicity) VALUES (?, ?)", (habit_name, "Daily"))
+        db_connect.commit()
+
         # Edit the habit name
         edit_habit(db_connect, habit_name, new_name=new_name)
 
@@ -483,12 +490,13 @@ class TestHabit:
         assert unchanged_habit == original_habit, "Habit should remain unchanged"
 
     def test_edit_nonexistent_habit(self, db_connect):
-        """Test editing a habit that doesn't exist (should not modify the database)."""
+        """Test editing a habit that doesn't exist (should raise and not modify the database)."""
         non_existent_habit = "NonExistentHabit"
         new_name = "ShouldNotExist"
 
         # Try to edit a non-existent habit
-        edit_habit(db_connect, non_existent_habit, new_name=new_name)
+        with pytest.raises(ValueError):
+            edit_habit(db_connect, non_existent_habit, new_name=new_name)
 
         # Verify no habit was created/modified
         result = get_habit(db_connect, new_name)
@@ -505,22 +513,22 @@ class TestHabit:
         ]
 
         # Ensure the habit does not already exist by deleting it before the test
-        db_connect.execute("DELETE FROM habit WHERE name=?", (habit_name,))
-        db_connect.execute("DELETE FROM tracker WHERE habit_name=?",
+        db_connect.execute("DELETE FROM completion WHERE habit_id IN (SELECT id FROM habit WHERE name=?)",
                            (habit_name,))  # Clean up any existing related entries
+        db_connect.execute("DELETE FROM habit WHERE name=?", (habit_name,))
         db_connect.commit()
 
         # Insert the habit
-        db_connect.execute(
+        habit_id = db_connect.execute(
             "INSERT INTO habit (name, periodicity) VALUES (?, ?)",
             (habit_name, "Weekly")
-        )
+        ).lastrowid
 
-        # Insert associated tracker entries
+        # Insert associated completion entries
         for habit_name, completion_dates in tracker_entries:
             db_connect.execute(
-                "INSERT INTO tracker (habit_name, completion_dates) VALUES (?, ?)",
-                (habit_name, completion_dates)
+                "INSERT INTO completion (habit_id, completed_on) VALUES (?, ?)",
+                (habit_id, completion_dates)
             )
 
         db_connect.commit()
@@ -530,9 +538,9 @@ class TestHabit:
         cur.execute("SELECT * FROM habit WHERE name = ?", (habit_name,))
         assert cur.fetchone() is not None, f"The habit '{habit_name}' should exist."
 
-        # Verify tracker entries exist
-        cur.execute("SELECT * FROM tracker WHERE habit_name = ?", (habit_name,))
-        assert len(cur.fetchall()) == len(tracker_entries), "Tracker entries should exist for this habit."
+        # Verify completion entries exist
+        cur.execute("SELECT * FROM completion WHERE habit_id = ?", (habit_id,))
+        assert len(cur.fetchall()) == len(tracker_entries), "Completion entries should exist for this habit."
 
         # Now delete the habit
         delete_habit(db_connect, habit_name)
@@ -541,8 +549,172 @@ class TestHabit:
         cur.execute("SELECT * FROM habit WHERE name = ?", (habit_name,))
         assert cur.fetchone() is None, f"The habit '{habit_name}' should have been deleted."
 
-        # Verify tracker entries are deleted
-        cur.execute("SELECT * FROM tracker WHERE habit_name = ?", (habit_name,))
-        assert cur.fetchone() is None, "Tracker entries for the habit should also be deleted."
+        # Verify completion entries are deleted
+        cur.execute("SELECT * FROM completion WHERE habit_id = ?", (habit_id,))
+        assert cur.fetchone() is None, "Completion entries for the habit should also be deleted."
+
+
+class TestCompactHabit:
+
+    def test_no_instance_dict(self):
+        habit = Habit("Study", "Daily", None)
+        assert not hasattr(habit, "__dict__")
+        with pytest.raises(AttributeError):
+            habit.notes = "not a slot"
 
+    def test_periodicity_is_shared(self):
+        habits = [Habit(name, "".join(["Dai", "ly"]), None) for name in ["Study", "Exercise"]]
+        assert habits[0].periodicity == "Daily"
+        assert habits[0].periodicity is habits[1].periodicity
 
+        with pytest.raises(ValueError):
+            habits[0].periodicity = "Monthly"
+
+    def test_completion_dates_view(self):
+        habit = Habit("Study", "Daily", None)
+        habit.completion_dates = [datetime(2025, 4, 3), datetime(2025, 4, 1), datetime(2025, 4, 1, 18, 30)]
+        assert habit.completion_dates == [datetime(2025, 4, 1), datetime(2025, 4, 3)]
+        assert list(habit.completion_days) == [datetime(2025, 4, 1).toordinal(), datetime(2025, 4, 3).toordinal()]
+
+        habit.completion_dates.extend([datetime(2025, 4, 2), datetime(2025, 4, 4)])
+        assert len(habit.completion_dates) == 4
+        assert habit.completion_dates[-1] == datetime(2025, 4, 4)
+        assert datetime(2025, 4, 2) in habit.completion_dates
+        assert datetime(2025, 4, 5) not in habit.completion_dates
+        assert habit.get_longest_run_streak() == 4
+
+        habit.completion_dates.clear()
+        assert not habit.completion_dates
+        assert habit.get_longest_run_streak() == 0
+
+    def test_loaded_habits_match_database(self, db_connect):
+        for habit in load_habits(db_connect):
+            assert habit.completion_dates == get_completion_dates(db_connect, habit.name)
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage(request, tmp_path):
+    """The same empty store on each backend."""
+    if request.param == "sqlite":
+        storage = SQLiteBackend(get_db(str(tmp_path / "storage.db")))
+    else:
+        storage = MemoryBackend()
+    yield storage
+    storage.close()
+
+
+class TestStorageBackends:
+
+    def test_backends_follow_the_protocol(self, storage):
+        assert isinstance(storage, StorageBackend)
+        assert get_storage(storage) is storage
+
+    def test_connections_are_wrapped(self, tmp_path):
+        db_connect = get_db(str(tmp_path / "wrapped.db"))
+        assert get_storage(db_connect).db_connect is db_connect
+        db_connect.close()
+
+        with pytest.raises(TypeError):
+            get_storage("main.db")
+        with pytest.raises(TypeError):
+            SQLiteBackend(MemoryBackend())
+
+    def test_habit_lifecycle(self, storage):
+        habit = Habit("Study", "Daily", storage)
+        habit.store(storage)
+        Habit("Laundry", "Weekly", storage).store(storage)
+        habit.add_completion_dates([datetime(2025, 4, d) for d in [3, 1, 2, 5]])
+        habit.store_completion_dates([datetime(2025, 4, 2), datetime(2025, 4, 6)])
+
+        assert Habit.get_habit(storage, "Study") == ("Study", "Daily")
+        assert Habit.get_habit(storage, "Unknown") is None
+        assert Habit.get_completion_dates(storage, "Study") == [datetime(2025, 4, d) for d in [1, 2, 3, 5, 6]]
+        assert storage.get_habit_data("Study") == (["2025-04-01T00:00:00", "2025-04-02T00:00:00",
+                                                    "2025-04-03T00:00:00", "2025-04-05T00:00:00",
+                                                    "2025-04-06T00:00:00"], "Daily")
+        assert [(h.name, h.periodicity, len(h.completion_dates)) for h in get_current_habits(storage)] == [
+            ("Study", "Daily", 5), ("Laundry", "Weekly", 0)]
+
+        with pytest.raises(ValueError):
+            storage.add_habit([("Daily", "Daily")])
+        with pytest.raises(ValueError):
+            storage.add_completion_dates("Unknown", [datetime(2025, 4, 1)])
+
+    def test_streak_cache(self, storage):
+        storage.add_habit([("Study", "Daily"), ("Laundry", "Weekly")])
+        storage.add_completion_dates("Study", [datetime(2025, 4, d) for d in [1, 2, 3, 5, 6]])
+        assert storage.get_streak_cache("Study") == (3, 2, "2025-04-06T00:00:00")
+        # A backfilled date joins both runs
+        storage.add_completion_dates("Study", datetime(2025, 4, 4))
+        assert storage.get_streak_cache("Study") == (6, 6, "2025-04-06T00:00:00")
+        storage.add_completion_dates("Laundry", [datetime(2025, 4, 1), datetime(2025, 4, 3), datetime(2025, 4, 8)])
+        assert storage.get_streak_cache("Laundry") == (2, 2, "2025-04-08T00:00:00")
+        assert storage.get_streak_cache("Unknown") is None
+
+        assert get_longest_run_streak_all_habits(storage) == 6
+        assert get_longest_run_streak_all_habits(storage, from_completions=True) == 6
+        assert Habit.get_longest_run_streak_by_periodicity(storage, "Weekly") == 2
+        assert Habit.get_longest_run_streak_by_periodicity(storage, "Weekly", from_completions=True) == 2
+        assert storage.compute_longest_run_streak() == (6, 6)
+
+        # A new periodicity recomputes the streaks
+        storage.add_habit([("Study", "Weekly")])
+        assert storage.get_streak_cache("Study") == (1, 1, "2025-04-06T00:00:00")
+
+    def test_update_longest_run_streak(self, storage):
+        storage.add_habit([("Study", "Daily")])
+        habit = load_habits(storage)[0]
+        habit.completion_dates = [datetime(2025, 4, d) for d in [1, 2, 3]]
+        habit.update_longest_run_streak(storage)
+        assert storage.get_cached_longest_run_streak("Daily") == 3
+        assert storage.get_cached_longest_run_streak("Weekly") == 0
+
+    def test_edit_and_delete(self, storage):
+        storage.add_habit([("Study", "Daily"), ("Laundry", "Weekly"), ("Exercise", "Daily")])
+        storage.add_completion_dates("Study", [datetime(2025, 4, 1), datetime(2025, 4, 2)])
+        habit = next(habit for habit in load_habits(storage) if habit.name == "Study")
+
+        habit.edit_habit(new_name="Reading", new_periodicity="Weekly")
+        assert (habit.name, habit.periodicity) == ("Reading", "Weekly")
+        assert storage.get_habit("Study") is None
+        assert storage.get_habit_periodicity("Reading") == "Weekly"
+        assert storage.get_completion_dates("Reading") == [datetime(2025, 4, 1), datetime(2025, 4, 2)]
+        assert storage.get_streak_cache("Reading")[:2] == (1, 1)
+        # The renamed habit keeps its place
+        assert [habit.name for habit in load_habits(storage)] == ["Reading", "Laundry", "Exercise"]
+        assert sorted(storage.get_habits_by_periodicity("Weekly")) == ["Laundry", "Reading"]
+
+        habit.delete_habit()
+        assert storage.get_habit("Reading") is None
+        assert storage.get_completion_dates("Reading") == []
+        assert storage.get_habits_by_periodicity("Weekly") == ["Laundry"]
+
+    @pytest.mark.parametrize("name, changes", [
+        ("Reading", {"new_name": "Learning"}),
+        ("Reading", {"new_periodicity": "Weekly"}),
+        ("Study", {"new_periodicity": "Monthly"}),
+        ("Study", {"new_name": "Laundry"}),
+        ("Study", {"new_name": "Laundry", "new_periodicity": "Weekly"}),
+    ])
+    def test_invalid_edit(self, storage, name, changes):
+        storage.add_habit([("Study", "Daily"), ("Laundry", "Weekly")])
+        storage.add_completion_dates("Study", [datetime(2025, 4, d) for d in [1, 2, 3]])
+        with pytest.raises(ValueError):
+            storage.edit_habit(name, **changes)
+        assert [storage.get_habit(name) for name in ["Study", "Laundry"]] == [("Study", "Daily"),
+                                                                              ("Laundry", "Weekly")]
+        assert storage.get_streak_cache("Study") == (3, 3, "2025-04-03T00:00:00")
+
+    def test_failed_edit_keeps_the_habit(self, storage):
+        storage.add_habit([("Study", "Daily"), ("Laundry", "Weekly")])
+        habit = load_habits(storage)[0]
+        with pytest.raises(ValueError):
+            habit.edit_habit(new_name="Laundry", new_periodicity="Weekly")
+        assert (habit.name, habit.periodicity) == ("Study", "Daily")
+        assert storage.get_habit("Study") == ("Study", "Daily")
+
+    def test_tracker(self, storage):
+        tracker = Tracker(storage, "Tracker", "Daily")
+        tracker.add_current_habit([("Study", "Daily"), ("Laundry", "Weekly")])
+        assert tracker.get_habits_by_periodicity("Daily") == ["Study"]
+        assert [habit.name for habit in tracker.get_current_habits(None)] == ["Study", "Laundry"]
@@ -0,0 +1,165 @@
+import json
+import os
+import subprocess
+import sys
+import types
+from datetime import date
+from db import get_db, input_data_database
+from main import main
+import pytest
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    path = str(tmp_path / "main.db")
+    db_connect = get_db(path)
+    input_data_database(db_connect)
+    db_connect.close()
+    return path
+
+
+# Cold-start budget of "import main", in microseconds as reported by -X importtime
+IMPORT_BUDGET = 150000
+# Modules only the interactive menu, the analytics and the report need
+LAZY_MODULES = ["questionary", "numpy", "habit", "analyse", "reports", "cache", "storage", "parallel", "datagen",
+                "multiprocessing", "concurrent.futures"]
+
+
+def import_times():
+    """Run "import main" in a new interpreter; return a dict mapping module to cumulative microseconds."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"],
+                            cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True,
+                            check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, module = line.split("|")
+            if cumulative.strip().isdigit():
+                times[module.strip()] = int(cumulative)
+    return times
+
+
+def run(capsys, db_path, *args):
+    main(["--db", db_path, *args])
+    return capsys.readouterr().out
+
+
+class TestCommands:
+
+    def test_add_and_list(self, tmp_path, capsys):
+        db_path = str(tmp_path / "new.db")
+        assert run(capsys, db_path, "add", "Reading", "Cooking", "--periodicity", "Daily") == (
+            "name\tperiodicity\nReading\tDaily\nCooking\tDaily\n")
+        run(capsys, db_path, "add", "Laundry", "--periodicity", "Weekly")
+        assert json.loads(run(capsys, db_path, "list", "--periodicity", "Weekly", "--format", "json")) == [
+            {"name": "Laundry", "periodicity": "Weekly"}]
+        lines = run(capsys, db_path, "list").splitlines()
+        assert lines[0] == "name\tperiodicity"
+        assert sorted(lines[1:]) == ["Cooking\tDaily", "Laundry\tWeekly", "Reading\tDaily"]
+
+    def test_complete_many_habits(self, db_path, capsys):
+        output = run(capsys, db_path, "complete", "Study", "Exercise", "Laundry", "--date", "2025-05-01",
+                     "--format", "json")
+        assert json.loads(output) == [
+            {"name": "Study", "completed_on": "2025-05-01", "current_run_streak": 6, "longest_run_streak": 13},
+            {"name": "Exercise", "completed_on": "2025-05-01", "current_run_streak": 9, "longest_run_streak": 9},
+            {"name": "Laundry", "completed_on": "2025-05-01", "current_run_streak": 5, "longest_run_streak": 5},
+        ]
+
+    def test_complete_is_all_or_nothing(self, db_path, capsys):
+        with pytest.raises(SystemExit) as exit_info:
+            main(["--db", db_path, "complete", "Study", "Unknown", "--date", "2025-05-01"])
+        assert exit_info.value.code == 1
+        assert "Habit 'Unknown' does not exist." in capsys.readouterr().err
+        db_connect = get_db(db_path)
+        assert db_connect.execute("SELECT COUNT(*) FROM completion WHERE completed_on = ?",
+                                  (date(2025, 5, 1).toordinal(),)).fetchone()[0] == 0
+        db_connect.close()
+
+    def test_streak(self, db_path, capsys):
+        output = run(capsys, db_path, "streak", "Exercise", "Medication", "--today", "2025-05-01")
+        assert output.splitlines() == [
+            "name\tperiodicity\tcurrent_run_streak\tlongest_run_streak\tlast_completion\tdays_remaining\tat_risk",
+            "Exercise\tDaily\t8\t9\t2025-04-30\t1\ttrue",
+            "Medication\tWeekly\t4\t4\t2025-04-22\t4\ttrue",
+        ]
+        # A week later every streak is broken
+        statuses = json.loads(run(capsys, db_path, "streak", "--format", "json", "--today", "2025-05-08"))
+        assert len(statuses) == 5
+        assert not any(status["current_run_streak"] or status["at_risk"] for status in statuses)
+
+        with pytest.raises(SystemExit):
+            main(["--db", db_path, "streak", "Unknown"])
+
+    def test_stats(self, db_path, capsys):
+        assert run(capsys, db_path, "stats", "--today", "2025-05-01").splitlines() == [
+            "periodicity\thabits\tlongest_run_streak\tat_risk",
+            "Daily\t3\t13\t3",
+            "Weekly\t2\t4\t2",
+            "all\t5\t13\t5",
+        ]
+
+    def test_completions(self, db_path, capsys):
+        assert run(capsys, db_path, "completions", "--bucket", "week", "--start", "2025-04-21",
+                   "--end", "2025-05-04").splitlines() == [
+            "name\tperiod_start\tcompletions\thabits",
+            "all\t2025-04-21\t19\t5",
+            "all\t2025-04-28\t9\t3",
+        ]
+        output = run(capsys, db_path, "completions", "Study", "Laundry", "--bucket", "month", "--format", "json")
+        assert json.loads(output) == [
+            {"name": "Study", "period_start": "2025-04-01", "completions": 27, "habits": 1},
+            {"name": "Laundry", "period_start": "2025-04-01", "completions": 4, "habits": 1},
+        ]
+        assert run(capsys, db_path, "completions", "--periodicity", "Weekly", "--bucket", "month").splitlines()[1:] == [
+            "Medication\t2025-04-01\t4\t1",
+            "Laundry\t2025-04-01\t4\t1",
+        ]
+        with pytest.raises(SystemExit):
+            main(["--db", db_path, "completions", "Unknown"])
+
+    def test_rebuild_rollups(self, db_path, capsys):
+        db_connect = get_db(db_path)
+        db_connect.execute("DELETE FROM completion_rollup")
+        db_connect.commit()
+        db_connect.close()
+        assert run(capsys, db_path, "completions", "--bucket", "month") == "name\tperiod_start\tcompletions\thabits\n"
+        main(["--db", db_path, "rebuild-rollups"])
+        assert run(capsys, db_path, "completions", "--bucket", "month").splitlines()[1:] == ["all\t2025-04-01\t81\t5"]
+
+
+class TestColdStart:
+
+    def test_lazy_imports(self):
+        imported = set(import_times())
+        assert "main" in imported
+        assert [module for module in LAZY_MODULES if module in imported] == []
+
+    def test_import_budget(self):
+        # The fastest of a few runs, so a busy machine doesn't fail the test
+        assert min(import_times()["main"] for _ in range(3)) < IMPORT_BUDGET
+
+
+class TestMenu:
+
+    @pytest.fixture
+    def answers(self, monkeypatch):
+        """Fixture to answer the prompts of the interactive menu from a list, in order."""
+        answers = []
+
+        def prompt(*args, **kwargs):
+            return types.SimpleNamespace(ask=lambda: answers.pop(0))
+
+        monkeypatch.setitem(sys.modules, "questionary",
+                            types.SimpleNamespace(confirm=prompt, text=prompt, select=prompt))
+        return answers
+
+    def test_longest_run_streak_of_all_habits(self, db_path, answers, capsys):
+        from main import cli
+
+        answers.extend([True, "Analyse", "Get the longest run streak of all habits", "Exit"])
+        cli(name="Tester", db_name=db_path)
+        out = capsys.readouterr().out
+        assert "An error occurred" not in out
+        assert "The longest run streak across all habits is: 13." in out
+        assert answers == []
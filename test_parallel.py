@@ -0,0 +1,80 @@
+from datetime import date, timedelta
+from db import get_db, add_habits_bulk, add_completions_bulk
+from habit import load_habits
+from parallel import streak_report, id_ranges, longest_run_streak, empty_report
+from streaks import batch_streaks
+import random
+import sqlite3
+import pytest
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A database with 200 habits and random completion dates."""
+    path = str(tmp_path / "parallel.db")
+    db_connect = get_db(path)
+    rng = random.Random(16)
+    habits = [(f"Habit {i}", rng.choice(["Daily", "Weekly"])) for i in range(200)]
+    add_habits_bulk(db_connect, habits)
+    start = date(2025, 1, 1)
+    add_completions_bulk(db_connect, ((name, start + timedelta(days=day))
+                                      for name, _ in habits[:150] for day in range(120) if rng.random() < 0.8))
+    db_connect.close()
+    return path
+
+
+def expected_report(path):
+    db_connect = get_db(path)
+    habits = load_habits(db_connect)
+    db_connect.close()
+    report = empty_report()
+    for habit, (longest, current) in zip(habits, batch_streaks(habits)):
+        totals = report[habit.periodicity]
+        totals["habits"] += 1
+        totals["completions"] += len(habit.completion_days)
+        totals["longest_run_streak"] = max(totals["longest_run_streak"], longest)
+        totals["current_run_streak"] = max(totals["current_run_streak"], current)
+    return report
+
+
+class TestStreakReport:
+
+    def test_matches_the_serial_computation(self, db_path):
+        expected = expected_report(db_path)
+        assert expected["Daily"]["habits"] + expected["Weekly"]["habits"] == 200
+        assert streak_report(db_path, workers=1) == expected
+        assert streak_report(db_path, workers=2) == expected
+        assert streak_report(db_path, workers=3, slices=7) == expected
+
+    def test_longest_run_streak(self, db_path):
+        report = streak_report(db_path, workers=1)
+        assert longest_run_streak(report) == max(longest_run_streak(report, "Daily"),
+                                                 longest_run_streak(report, "Weekly"))
+        with pytest.raises(ValueError):
+            longest_run_streak(report, "Monthly")
+
+    def test_empty_database(self, tmp_path):
+        path = str(tmp_path / "empty.db")
+        get_db(path).close()
+        assert streak_report(path, workers=2) == empty_report()
+
+    def test_invalid_arguments(self, tmp_path, db_path):
+        with pytest.raises(ValueError):
+            streak_report(":memory:")
+        with pytest.raises(ValueError):
+            streak_report(db_path, workers=-1)
+        with pytest.raises(sqlite3.OperationalError):
+            # Read-only connections never create the database
+            streak_report(str(tmp_path / "missing.db"))
+
+    def test_id_ranges(self):
+        assert id_ranges(1, 10, 3) == [(1, 4), (5, 8), (9, 10)]
+        assert id_ranges(5, 6, 4) == [(5, 5), (6, 6)]
+        assert id_ranges(3, 3, 1) == [(3, 3)]
+
+    def test_report_command(self, db_path, capsys):
+        from main import main
+
+        main(["--db", db_path, "report", "--workers", "2"])
+        lines = capsys.readouterr().out.splitlines()
+        assert [line.split(":")[0] for line in lines] == ["Daily", "Weekly"]
@@ -0,0 +1,80 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from db import get_pool, add_habits_bulk, add_completion_dates, get_completion_dates, get_streak_cache
+from habit import Habit, load_habits
+from pool import ConnectionPool
+from streaks import completion_streaks
+import threading
+import pytest
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = get_pool(str(tmp_path / "pool.db"))
+    yield pool
+    pool.close()
+
+
+class TestConnectionPool:
+
+    def test_one_connection_per_thread(self, pool):
+        connections = []
+        barrier = threading.Barrier(4)
+
+        def work():
+            barrier.wait()  # Keep all four threads alive at the same time
+            connections.append(pool.connection())
+            assert pool.connection() is connections[-1]
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len({id(db_connect) for db_connect in connections}) == 4
+        assert pool.connection() not in connections
+        assert len(pool) == 5
+
+    def test_pragmas(self, pool):
+        assert pool.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert pool.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+        assert pool.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+
+        custom = ConnectionPool(pool.path, cache_size=-1000)
+        assert custom.execute("PRAGMA cache_size").fetchone()[0] == -1000
+        custom.close()
+
+    def test_in_memory_database_is_rejected(self):
+        with pytest.raises(ValueError):
+            ConnectionPool(":memory:")
+
+    def test_closed_pool(self, pool):
+        pool.connection()
+        pool.close()
+        with pytest.raises(Exception):
+            pool.execute("SELECT 1")
+
+    def test_db_functions_and_habit_accept_a_pool(self, pool):
+        add_habits_bulk(pool, [("Study", "Daily")])
+        habit = Habit("Study", "Daily", pool)
+        habit.add_completion_dates([datetime(2025, 4, 1), datetime(2025, 4, 2)])
+        assert get_completion_dates(pool, "Study") == [datetime(2025, 4, 1), datetime(2025, 4, 2)]
+        assert load_habits(pool)[0].get_longest_run_streak() == 2
+
+    def test_concurrent_writers(self, pool):
+        """Threads writing to the same habits keep the streak cache consistent."""
+        add_habits_bulk(pool, [("Study", "Daily"), ("Laundry", "Weekly")])
+        start = datetime(2025, 1, 1)
+        days = [start + timedelta(days=d) for d in range(80)]
+
+        def work(offset):
+            for day in days[offset::8]:
+                add_completion_dates(pool, "Study", day)
+                add_completion_dates(pool, "Laundry", [day])
+
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(work, range(8)))
+
+        assert get_completion_dates(pool, "Study") == days
+        assert get_streak_cache(pool, "Study")[:2] == completion_streaks(days, "Daily") == (80, 80)
+        assert get_streak_cache(pool, "Laundry")[:2] == completion_streaks(days, "Weekly")
@@ -0,0 +1,73 @@
+from datetime import date, datetime
+from db import get_db
+from reports import PeriodCount, completions_per_period, habit_completions_per_period
+from storage import MemoryBackend, SQLiteBackend
+import pytest
+
+
+@pytest.fixture(params=["sqlite", "memory"])
+def storage(request, tmp_path):
+    """The same habits and completions on each backend."""
+    if request.param == "sqlite":
+        storage = SQLiteBackend(get_db(str(tmp_path / "reports.db")))
+    else:
+        storage = MemoryBackend()
+    storage.add_habit([("Study", "Daily"), ("Laundry", "Weekly"), ("Reading", "Daily")])
+    storage.add_completion_dates("Study", [datetime(2025, 3, 31)] + [datetime(2025, 4, d) for d in [1, 2, 3, 7]])
+    storage.add_completion_dates("Laundry", [datetime(2025, 4, 2), datetime(2025, 4, 9)])
+    yield storage
+    storage.close()
+
+
+def test_completions_per_day(storage):
+    assert completions_per_period(storage, "day", date(2025, 4, 1), date(2025, 4, 4)) == [
+        PeriodCount(date(2025, 4, 1), 1, 1),
+        PeriodCount(date(2025, 4, 2), 2, 2),
+        PeriodCount(date(2025, 4, 3), 1, 1),
+        PeriodCount(date(2025, 4, 4), 0, 0),
+    ]
+    # Without a range only the days with completions are listed
+    assert [count.period_start.day for count in completions_per_period(storage)] == [31, 1, 2, 3, 7, 9]
+
+
+def test_completions_per_week_and_month(storage):
+    # Weeks start on Monday; the week of 2025-03-31 holds every completion up to 2025-04-06
+    assert completions_per_period(storage, "week", "2025-04-02", "2025-04-15") == [
+        PeriodCount(date(2025, 3, 31), 5, 2),
+        PeriodCount(date(2025, 4, 7), 2, 2),
+        PeriodCount(date(2025, 4, 14), 0, 0),
+    ]
+    assert completions_per_period(storage, "month") == [
+        PeriodCount(date(2025, 3, 1), 1, 1),
+        PeriodCount(date(2025, 4, 1), 6, 2),
+    ]
+
+
+def test_habit_completions_per_period(storage):
+    assert habit_completions_per_period(storage, "week", date(2025, 4, 7), date(2025, 4, 13)) == {
+        "Study": [PeriodCount(date(2025, 4, 7), 1, 1)],
+        "Laundry": [PeriodCount(date(2025, 4, 7), 1, 1)],
+    }
+    assert habit_completions_per_period(storage, "month", periodicity="Weekly") == {
+        "Laundry": [PeriodCount(date(2025, 4, 1), 2, 1)]}
+    # A named habit is listed even without completions
+    assert habit_completions_per_period(storage, "day", date(2025, 4, 1), date(2025, 4, 2), name="Reading") == {
+        "Reading": [PeriodCount(date(2025, 4, 1), 0, 0), PeriodCount(date(2025, 4, 2), 0, 0)]}
+
+    with pytest.raises(ValueError):
+        habit_completions_per_period(storage, name="Unknown")
+    with pytest.raises(ValueError):
+        completions_per_period(storage, "year")
+
+
+def test_reports_follow_writes(storage):
+    storage.add_completion_dates("Reading", [datetime(2025, 4, 2), datetime(2025, 4, 30)])
+    assert completions_per_period(storage, "month", date(2025, 4, 1), date(2025, 4, 30)) == [
+        PeriodCount(date(2025, 4, 1), 8, 3)]
+
+    storage.delete_habit("Study")
+    assert completions_per_period(storage, "month", date(2025, 3, 1), date(2025, 4, 30)) == [
+        PeriodCount(date(2025, 3, 1), 0, 0),
+        PeriodCount(date(2025, 4, 1), 4, 2),
+    ]
+    assert list(habit_completions_per_period(storage, "week")) == ["Laundry", "Reading"]
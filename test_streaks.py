@@ -0,0 +1,92 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from habit import Habit
+from streaks import (BUCKETS, batch_streaks, bucket_index, bucket_start, completion_streaks, gap_histogram,
+                     day_ordinal, period_end, streak_status)
+import random
+import pytest
+
+
+@pytest.fixture(params=[False, True], ids=["python", "numpy"])
+def use_numpy(request):
+    """Fixture to run a test with the pure Python and the NumPy engine."""
+    if request.param:
+        pytest.importorskip("numpy")
+    return request.param
+
+
+@pytest.fixture
+def habits():
+    """Fixture to provide habits with random completion dates."""
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    return [SimpleNamespace(periodicity=rng.choice(["Daily", "Weekly"]),
+                            completion_dates=[start + timedelta(days=rng.randrange(200))
+                                              for _ in range(rng.randrange(60))])
+            for _ in range(200)]
+
+
+class TestStreaks:
+
+    def test_completion_streaks(self):
+        dates = [datetime(2025, 4, d) for d in [5, 1, 2, 3, 3, 7, 8]]
+        assert completion_streaks(dates, "Daily") == (3, 2)
+        # 2025-04-01 is a Tuesday, 2025-04-07 the Monday of the next ISO week
+        assert completion_streaks(dates, "Weekly") == (2, 2)
+        assert completion_streaks([], "Daily") == (0, 0)
+
+    def test_period_end(self):
+        wednesday = day_ordinal("2025-04-16")
+        assert period_end(wednesday, "Daily") == wednesday
+        assert period_end(wednesday, "Weekly") == day_ordinal("2025-04-20")
+        assert period_end(day_ordinal("2025-04-20"), "Weekly") == day_ordinal("2025-04-20")
+
+    def test_buckets(self):
+        wednesday = day_ordinal("2025-04-16")
+        assert bucket_start(bucket_index(wednesday, "week"), "week") == day_ordinal("2025-04-14")
+        assert bucket_start(bucket_index(wednesday, "month"), "month") == day_ordinal("2025-04-01")
+        # Consecutive buckets have consecutive indexes, also across a year
+        assert bucket_index(day_ordinal("2025-01-01"), "month") == bucket_index(day_ordinal("2024-12-31"), "month") + 1
+        for bucket in BUCKETS:
+            for day in range(day_ordinal("2024-12-20"), day_ordinal("2025-03-10")):
+                index = bucket_index(day, bucket)
+                assert bucket_start(index, bucket) <= day < bucket_start(index + 1, bucket)
+        with pytest.raises(ValueError):
+            bucket_index(wednesday, "year")
+
+    def test_streak_status(self):
+        sunday = day_ordinal("2025-04-20")
+        # Completed in the current week, in the previous week and two weeks ago
+        assert streak_status("Laundry", "Weekly", 4, sunday - 6, sunday)[2:] == (4, 1, False)
+        assert streak_status("Laundry", "Weekly", 4, sunday - 7, sunday)[2:] == (4, 1, True)
+        assert streak_status("Laundry", "Weekly", 4, sunday - 14, sunday)[2:] == (0, 1, False)
+        assert streak_status("Study", "Daily", 0, None, sunday)[2:] == (0, 1, False)
+
+    def test_batch_streaks(self, habits, use_numpy):
+        expected = [completion_streaks(habit.completion_dates, habit.periodicity) for habit in habits]
+        assert batch_streaks(habits, use_numpy=use_numpy) == expected
+
+    def test_habit_day_arrays(self, habits, use_numpy):
+        """Habit objects are read from their day ordinal arrays."""
+        compact = []
+        for habit in habits:
+            compact.append(Habit("Habit", habit.periodicity, None))
+            compact[-1].completion_dates = habit.completion_dates
+        assert batch_streaks(compact, use_numpy=use_numpy) == batch_streaks(habits, use_numpy=use_numpy)
+        assert gap_histogram(compact, use_numpy=use_numpy) == gap_histogram(habits, use_numpy=use_numpy)
+
+    def test_gap_histogram(self, use_numpy):
+        habits = [SimpleNamespace(periodicity="Daily", completion_dates=[datetime(2025, 4, d) for d in [1, 2, 5, 6]]),
+                  SimpleNamespace(periodicity="Weekly", completion_dates=[datetime(2025, 4, d) for d in [1, 2, 15]]),
+                  SimpleNamespace(periodicity="Daily", completion_dates=[])]
+        assert gap_histogram(habits, use_numpy=use_numpy) == {1: 2, 2: 1, 3: 1}
+
+    def test_engines_agree(self, habits):
+        pytest.importorskip("numpy")
+        assert batch_streaks(habits, use_numpy=True) == batch_streaks(habits, use_numpy=False)
+        assert gap_histogram(habits, use_numpy=True) == gap_histogram(habits, use_numpy=False)
+
+    def test_unknown_periodicity(self, use_numpy):
+        with pytest.raises(ValueError):
+            batch_streaks([SimpleNamespace(periodicity="Monthly", completion_dates=[datetime(2025, 4, 1)])],
+                          use_numpy=use_numpy)
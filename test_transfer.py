@@ -0,0 +1,104 @@
+from datetime import datetime
+from io import StringIO
+from db import get_db, add_habits_bulk, add_completion_dates, get_completion_dates, get_habit_data, get_streak_cache
+from transfer import import_habits, export_habits, read_records, guess_format
+import pytest
+
+
+@pytest.fixture
+def db_connect(tmp_path):
+    db_connect = get_db(str(tmp_path / "transfer.db"))
+    yield db_connect
+    db_connect.close()
+
+
+@pytest.fixture
+def history(db_connect):
+    """Fixture to provide a database with two habits with completions and one without."""
+    add_habits_bulk(db_connect, [("Study", "Daily"), ("Laundry", "Weekly"), ("Reading", "Daily")])
+    add_completion_dates(db_connect, "Study", [datetime(2025, 4, d) for d in [1, 2, 3]])
+    add_completion_dates(db_connect, "Laundry", [datetime(2025, 4, 3)])
+    return db_connect
+
+
+class TestTransfer:
+
+    @pytest.mark.parametrize("fmt", ["csv", "tsv", "jsonl"])
+    def test_round_trip(self, history, tmp_path, fmt):
+        out = StringIO()
+        assert export_habits(history, out, fmt) == 5
+
+        target = get_db(str(tmp_path / "target.db"))
+        assert import_habits(target, StringIO(out.getvalue()), fmt, chunk_size=2) == (3, 5 - 1)
+        assert get_completion_dates(target, "Study") == [datetime(2025, 4, d) for d in [1, 2, 3]]
+        assert get_habit_data(target, "Laundry") == (["2025-04-03T00:00:00"], "Weekly")
+        assert get_habit_data(target, "Reading") == ([], "Daily")
+        assert get_streak_cache(target, "Study") == (3, 3, "2025-04-03T00:00:00")
+
+        # Importing the same file again adds nothing
+        assert import_habits(target, StringIO(out.getvalue()), fmt) == (0, 0)
+        target.close()
+
+    def test_export_csv(self, history):
+        out = StringIO()
+        export_habits(history, out)
+        assert out.getvalue().splitlines() == [
+            "name,periodicity,completed_on",
+            "Study,Daily,2025-04-01",
+            "Study,Daily,2025-04-02",
+            "Study,Daily,2025-04-03",
+            "Laundry,Weekly,2025-04-03",
+            "Reading,Daily,",
+        ]
+
+    def test_import_keeps_existing_periodicity(self, history):
+        lines = ['{"name": "Study", "periodicity": "Weekly", "completed_on": "2025-04-05"}']
+        assert import_habits(history, lines, "jsonl") == (0, 1)
+        assert get_habit_data(history, "Study")[1] == "Daily"
+        assert get_streak_cache(history, "Study") == (3, 1, "2025-04-05T00:00:00")
+
+    def test_invalid_records(self, db_connect):
+        with pytest.raises(ValueError):
+            list(read_records(["habit,date", "Study,2025-04-01"], "csv"))
+        with pytest.raises(ValueError, match="Record 2"):
+            list(read_records(['{"name": "Study", "periodicity": "Daily"}', '{"name": "Laundry"}'], "jsonl"))
+        with pytest.raises(ValueError):
+            import_habits(db_connect, ["name,periodicity,completed_on", "Study,Monthly,2025-04-01"])
+        with pytest.raises(ValueError):
+            list(read_records([], "xml"))
+
+    def test_import_bad_row(self, db_connect):
+        lines = ["name,periodicity,completed_on", "Study,Daily,2025-04-01", "Study,Daily,2025-04-02",
+                 "Laundry,Weekly,2025-04-03", "Laundry,Weekly,2025-04-31"]
+        with pytest.raises(ValueError):
+            import_habits(db_connect, lines, chunk_size=2)
+        assert not db_connect.in_transaction
+
+        # The first chunk is imported with its streak cache, the failing one not at all
+        assert get_habit_data(db_connect, "Study") == (["2025-04-01T00:00:00", "2025-04-02T00:00:00"], "Daily")
+        assert get_streak_cache(db_connect, "Study") == (2, 2, "2025-04-02T00:00:00")
+        assert get_habit_data(db_connect, "Laundry")[1] is None
+
+    def test_guess_format(self):
+        assert guess_format("habits.jsonl") == "jsonl"
+        assert guess_format("habits.csv") == "csv"
+        assert guess_format("habits.tsv") == "tsv"
+        assert guess_format("-") == "csv"
+
+    def test_command_line(self, history, tmp_path, capsys):
+        from main import main
+
+        db_path = str(tmp_path / "cli.db")
+        export_path = str(tmp_path / "habits.jsonl")
+        with open(export_path, "w", encoding="utf-8") as out:
+            export_habits(history, out, "jsonl")
+
+        main(["--db", db_path, "import", export_path])
+        main(["--db", db_path, "export", "-", "--format", "csv"])
+        assert capsys.readouterr().out.splitlines()[1:] == [
+            "Study,Daily,2025-04-01",
+            "Study,Daily,2025-04-02",
+            "Study,Daily,2025-04-03",
+            "Laundry,Weekly,2025-04-03",
+            "Reading,Daily,",
+        ]
@@ -0,0 +1,87 @@
+import functools
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# Per-call timings, only collected while timing is enabled
+_timing_enabled = False
+_timings = {}
+# timed is called from pool threads and the aio executor
+_timings_lock = threading.Lock()
+
+# The habit tracker modules that log, the ones with timed functions add themselves in timed
+_loggers = {"aio", "bitmap", "cache", "pool", "storage", __name__}
+# The level set by enable_tracing, for the modules imported after it
+_tracing_level = None
+
+
+def enable_tracing(level=logging.DEBUG, timing=True):
+    """
+    Turn on the debug output of the habit tracker modules and, optionally, call timing.
+
+    Debug messages are formatted lazily by the logging module, so they cost nothing while
+    tracing is off.
+
+    :param level: logging level for the habit tracker loggers.
+    :param timing: also record how long each timed call takes.
+    """
+    global _tracing_level
+    logging.basicConfig(format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    _tracing_level = level
+    for name in sorted(_loggers):
+        logging.getLogger(name).setLevel(level)
+    enable_timing(timing)
+
+
+def enable_timing(enabled=True):
+    """Start (or stop) recording the duration of every call to a function decorated with timed."""
+    global _timing_enabled
+    _timing_enabled = enabled
+
+
+def timed(func):
+    """
+    Decorator recording the number of calls and the total time spent in a function.
+
+    While timing is disabled the wrapper only checks a flag before calling the function.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    if func.__module__ not in _loggers:
+        _loggers.add(func.__module__)
+        if _tracing_level is not None:
+            logging.getLogger(func.__module__).setLevel(_tracing_level)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _timing_enabled:
+            return func(*args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            with _timings_lock:
+                calls, total = _timings.get(name, (0, 0.0))
+                _timings[name] = (calls + 1, total + elapsed)
+            logger.debug("%s took %.6f s", name, elapsed)
+
+    return wrapper
+
+
+def get_timings():
+    """
+    Return the recorded call timings.
+
+    :return: a dict mapping the qualified function name to a tuple (calls, total_seconds).
+    """
+    with _timings_lock:
+        return dict(_timings)
+
+
+def reset_timings():
+    """Forget all recorded call timings."""
+    with _timings_lock:
+        _timings.clear()
@@ -0,0 +1,118 @@
+import csv
+import json
+import logging
+from db import DEFAULT_CHUNK_SIZE, add_history_bulk, iter_history
+from tracing import timed
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ["csv", "tsv", "jsonl"]
+
+# Column order of the CSV files, also the keys of the JSON Lines records
+FIELDS = ["name", "periodicity", "completed_on"]
+
+
+def guess_format(path, default="csv"):
+    """
+    Guess the transfer format from a file name.
+
+    :param path: file name, e.g. 'habits.jsonl'.
+    :param default: format used when the extension is not known.
+    :return: "csv", "tsv" or "jsonl".
+    """
+    if path.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if path.endswith(".tsv"):
+        return "tsv"
+    if path.endswith(".csv"):
+        return "csv"
+    return default
+
+
+def read_records(lines, fmt="csv"):
+    """
+    Parse habit records from an open text file or any iterable of lines.
+
+    Every record holds one completion; a habit without completions has one record with an
+    empty completed_on. Lines are parsed one at a time, so files of any size can be read.
+
+    :param lines: open text file or iterable of lines.
+    :param fmt: "csv" (with a name,periodicity,completed_on header), "tsv" (the same,
+                separated by tabs) or "jsonl".
+    :return: a generator of (habit_name, periodicity, date) tuples, date being None when empty.
+    """
+    if fmt in ("csv", "tsv"):
+        rows = csv.DictReader(lines, delimiter="," if fmt == "csv" else "\t")
+        if rows.fieldnames is not None and not set(FIELDS[:2]) <= set(rows.fieldnames):
+            raise ValueError(f"{fmt.upper()} header must contain the columns {', '.join(FIELDS)}.")
+        start = 2  # The first record is on the line after the header
+    elif fmt == "jsonl":
+        rows = (json.loads(line) for line in lines if line.strip())
+        start = 1
+    else:
+        raise ValueError(f"Unknown format: '{fmt}'. Expected one of {', '.join(FORMATS)}.")
+
+    for line_number, row in enumerate(rows, start):
+        try:
+            habit_name = row["name"]
+            periodicity = row["periodicity"]
+        except (KeyError, TypeError):
+            raise ValueError(f"Record {line_number} needs a name and a periodicity.") from None
+        yield habit_name, periodicity, row.get("completed_on") or None
+
+
+def write_records(records, out, fmt="csv"):
+    """
+    Write habit records to an open text file, one line per record.
+
+    :param records: iterable of (habit_name, periodicity, date) tuples, e.g. iter_history.
+    :param out: open text file.
+    :param fmt: "csv", "tsv" or "jsonl".
+    :return: the number of records written.
+    """
+    count = 0
+    if fmt in ("csv", "tsv"):
+        writer = csv.writer(out, delimiter="," if fmt == "csv" else "\t", lineterminator="\n")
+        writer.writerow(FIELDS)
+        for count, record in enumerate(records, 1):
+            writer.writerow(record)
+    elif fmt == "jsonl":
+        for count, record in enumerate(records, 1):
+            out.write(json.dumps(dict(zip(FIELDS, record))) + "\n")
+    else:
+        raise ValueError(f"Unknown format: '{fmt}'. Expected one of {', '.join(FORMATS)}.")
+    return count
+
+
+@timed
+def import_habits(db_connect, lines, fmt="csv", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Import habits and completions from a CSV, TSV or JSON Lines stream.
+
+    The records are streamed into the database in chunks, one transaction per chunk.
+
+    :param db_connect: Database connection object
+    :param lines: open text file or iterable of lines.
+    :param fmt: "csv", "tsv" or "jsonl".
+    :param chunk_size: number of records written per transaction.
+    :return: a tuple (habits_added, completions_added).
+    """
+    habits_added, completions_added = add_history_bulk(db_connect, read_records(lines, fmt), chunk_size)
+    logger.debug("Imported %d habits and %d completions", habits_added, completions_added)
+    return habits_added, completions_added
+
+
+@timed
+def export_habits(db_connect, out, fmt="csv"):
+    """
+    Export all habits and completions to a CSV, TSV or JSON Lines stream.
+
+    :param db_connect: Database connection object
+    :param out: open text file.
+    :param fmt: "csv", "tsv" or "jsonl".
+    :return: the number of records written.
+    """
+    count = write_records(iter_history(db_connect), out, fmt)
+    logger.debug("Exported %d records", count)
+    return count